@@ -0,0 +1,128 @@
+"""
+Two-tier answer cache for POST /chat.
+Tier 1: exact match on the normalized question. Tier 2: a previously answered
+question whose query embedding is at least `similarity` cosine-similar.
+Entries expire after ttl_s, the least recently used are evicted past max_entries,
+and everything is dropped when the index version changes.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.environ.get("RAG_ANSWER_CACHE", "1") != "0"
+MAX_ENTRIES = int(os.environ.get("RAG_ANSWER_CACHE_MAX_ENTRIES", "1024"))
+TTL_S = float(os.environ.get("RAG_ANSWER_CACHE_TTL_S", "3600"))
+SIMILARITY = float(os.environ.get("RAG_ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace, drop surrounding punctuation."""
+    text = re.sub(r"\s+", " ", question.lower()).strip()
+    return text.strip(" ?!.,;:\"'")
+
+
+def _numbers(text: str) -> frozenset[str]:
+    return frozenset(re.findall(r"\d+(?:\.\d+)?", text))
+
+
+class AnswerCache:
+    """In-process cache of chat responses (stored as plain dicts)."""
+
+    def __init__(
+        self,
+        max_entries: int = MAX_ENTRIES,
+        ttl_s: float = TTL_S,
+        similarity: float = SIMILARITY,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self._clock = clock
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._version = None
+        self._matrix = None
+        self._matrix_keys: list[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, index_version) -> None:
+        """Drop every entry if the index changed since they were stored."""
+        if index_version != self._version:
+            self._entries.clear()
+            self._matrix = None
+            self._version = index_version
+
+    def _live(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._clock() - entry["created"] > self.ttl_s:
+            del self._entries[key]
+            self._matrix = None
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_exact(self, question: str, index_version) -> dict | None:
+        """Tier 1: cached response for the same normalized question."""
+        with self._lock:
+            self._check_version(index_version)
+            entry = self._live(normalize_question(question))
+            return entry["response"] if entry else None
+
+    def get_similar(self, question: str, embedding: list[float], index_version) -> dict | None:
+        """
+        Tier 2: cached response for the most similar question above the threshold.
+        Questions that mention different numbers never match ("5 days" vs "10 days").
+        """
+        with self._lock:
+            self._check_version(index_version)
+            if self._matrix is None:
+                self._matrix_keys = [k for k, e in self._entries.items() if e["embedding"] is not None]
+                vectors = [self._entries[k]["embedding"] for k in self._matrix_keys]
+                self._matrix = np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+            if not self._matrix_keys:
+                return None
+            query = np.asarray(embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            scores = self._matrix @ query
+            numbers = _numbers(normalize_question(question))
+            for i in np.argsort(-scores):
+                if scores[i] < self.similarity:
+                    break
+                key = self._matrix_keys[i]
+                if _numbers(key) != numbers:
+                    continue
+                entry = self._live(key)
+                if entry is not None:
+                    return entry["response"]
+            return None
+
+    def put(self, question: str, response: dict, index_version, embedding: list[float] | None = None) -> None:
+        """Store a response; the oldest entries are evicted past max_entries."""
+        vector = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+        with self._lock:
+            self._check_version(index_version)
+            key = normalize_question(question)
+            self._entries[key] = {"response": response, "embedding": vector, "created": self._clock()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
@@ -1,30 +1,89 @@
+import asyncio
+import json
+import logging
 import os
 import re
 import time
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
+from typing import Annotated
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from starlette.templating import Jinja2Templates
-from openai import OpenAI
 from pydantic import BaseModel, Field, field_validator
 
+from app.answer_cache import ANSWER_CACHE_ENABLED, AnswerCache
+from app.metrics import METRICS_ENABLED, StageTimer, cache_tag, render_metrics
+from rag import clients
 from rag.prompts import build_messages
 from rag.retriever import (
-    _extract_keywords,
+    QueryAnalysis,
+    _aembed_queries,
+    _aembed_query,
+    aretrieve,
+    aretrieve_many,
     index_ready,
+    index_version,
     pick_verbatim_quote,
-    retrieve,
     should_refuse,
+    warm_up,
 )
 
 load_dotenv()
 
-app = FastAPI()
+# Startup warmup: heavy imports (OpenAI SDK, Chroma), index loads and a throwaway
+# search run in the background after the server starts listening, so /health answers
+# at once and /ready turns 200 when the first /chat no longer pays for them.
+# RAG_WARMUP=0 skips it (everything loads on first use; /ready is 200 immediately).
+WARMUP_ENABLED = os.environ.get("RAG_WARMUP", "1") != "0"
+readiness: dict = {"status": "warming"}
+
+
+async def _warm_up() -> None:
+    """Background startup work; its outcome and step timings are what /ready reports."""
+    start = time.perf_counter()
+    try:
+        if index_ready():
+            readiness["timings_ms"] = await asyncio.to_thread(warm_up)
+        # One pooled OpenAI client per process, closed on shutdown
+        await clients.startup()
+    except Exception as exc:
+        logging.warning(f"Startup warmup failed: {exc}")
+        readiness.update(status="failed", error=str(exc))
+    else:
+        readiness["status"] = "ready"
+    readiness["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    logging.info(f"Startup warmup: {readiness}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup = None
+    if WARMUP_ENABLED:
+        readiness.clear()
+        readiness["status"] = "warming"
+        warmup = asyncio.create_task(_warm_up())
+    else:
+        readiness["status"] = "ready"
+    yield
+    if warmup is not None:
+        warmup.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup
+    await clients.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory=Path(__file__).resolve().parent / "templates")
 MAX_ANSWER_WORDS = int(os.environ.get("RAG_MAX_ANSWER_WORDS", "140"))
 MAX_OUTPUT_TOKENS = int(os.environ.get("RAG_MAX_OUTPUT_TOKENS", "220"))
+CHAT_MODEL = "gpt-4o-mini"
+# /chat/batch: questions per request, completions in flight per batch
+BATCH_MAX_QUESTIONS = int(os.environ.get("RAG_BATCH_MAX_QUESTIONS", "64"))
+BATCH_CONCURRENCY = int(os.environ.get("RAG_BATCH_CONCURRENCY", "8"))
+answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
 
 
 # --- Schemas ---
@@ -32,6 +91,7 @@ MAX_OUTPUT_TOKENS = int(os.environ.get("RAG_MAX_OUTPUT_TOKENS", "220"))
 
 class ChatRequest(BaseModel):
     question: str = Field(..., min_length=3)
+    include_timings: bool = False
 
     @field_validator("question", mode="before")
     @classmethod
@@ -47,11 +107,37 @@ class Citation(BaseModel):
     text: str | None = None  # full chunk for eval overlap check
 
 
+class StageTiming(BaseModel):
+    stage: str
+    ms: float
+    cache: str | None = None  # "hit" / "miss" (/ "mixed" in a batch) for cache lookups and the query embedding
+    hits: int | None = None  # per-question cache hits and misses, /chat/batch only
+    misses: int | None = None
+
+
 class ChatResponse(BaseModel):
     answer: str
     citations: list[Citation]
     snippets: list[str]
     latency_ms: int
+    timings: list[StageTiming] | None = None  # only with include_timings
+    error: str | None = None  # /chat/batch only: why this question could not be answered
+
+
+class BatchChatRequest(BaseModel):
+    questions: list[Annotated[str, Field(min_length=3)]] = Field(..., min_length=1, max_length=BATCH_MAX_QUESTIONS)
+    include_timings: bool = False
+
+    @field_validator("questions", mode="before")
+    @classmethod
+    def strip_questions(cls, v: list) -> list:
+        return [q.strip() if isinstance(q, str) else q for q in v] if isinstance(v, list) else v
+
+
+class BatchChatResponse(BaseModel):
+    results: list[ChatResponse]
+    latency_ms: int
+    timings: list[StageTiming] | None = None  # stages of the whole batch, only with include_timings
 
 
 # --- Helpers ---
@@ -78,59 +164,272 @@ def truncate_words(text: str, max_words: int = MAX_ANSWER_WORDS) -> str:
     return " ".join(words[:max_words]).rstrip() + "..."
 
 
-# --- Routes ---
+def _cached_response(cached: dict, start: float) -> ChatResponse:
+    """Rebuild a cached ChatResponse with this request's latency."""
+    latency_ms = int((time.perf_counter() - start) * 1000)
+    return ChatResponse(**{**cached, "latency_ms": latency_ms})
 
 
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+def _cache_response(question: str, response: ChatResponse, version, query_embedding) -> None:
+    if answer_cache is not None:
+        answer_cache.put(question, response.model_dump(exclude={"timings"}), version, embedding=query_embedding)
 
 
-@app.get("/", response_class=HTMLResponse)
-async def root(request: Request):
-    return templates.TemplateResponse(request, "index.html")
+def _with_timings(response: ChatResponse, timer: StageTimer, include: bool) -> ChatResponse:
+    """Attach the stage breakdown if the client asked for it."""
+    if include:
+        response = response.model_copy(update={"timings": [StageTiming(**s) for s in timer.stages]})
+    return response
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
-    start = time.perf_counter()
+def _add_retrieval_timings(timer: StageTimer, timings: dict) -> None:
+    for name in ("search", "evidence"):
+        if name in timings:
+            timer.add(name, timings[name])
 
-    if not index_ready():
-        latency_ms = int((time.perf_counter() - start) * 1000)
-        return ChatResponse(
-            answer="Index not built. Run: python -m rag.ingest --rebuild",
-            citations=[],
-            snippets=[],
-            latency_ms=latency_ms,
-        )
 
-    # Retrieve
-    contexts = retrieve(req.question)
+def _sse(event: str, data: dict) -> str:
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    # Guardrail: refuse if insufficient context
+
+def _index_missing(start: float) -> ChatResponse:
+    latency_ms = int((time.perf_counter() - start) * 1000)
+    return ChatResponse(
+        answer="Index not built. Run: python -m rag.ingest --rebuild",
+        citations=[],
+        snippets=[],
+        latency_ms=latency_ms,
+    )
+
+
+def _refusal(question: str, contexts: list[dict], start: float, version, query_embedding) -> ChatResponse | None:
+    """Refusal response (cached) if the retrieved contexts are too weak to answer from, else None."""
     refuse, reason = should_refuse(contexts)
-    if refuse:
-        latency_ms = int((time.perf_counter() - start) * 1000)
-        return ChatResponse(
-            answer=f"I cannot answer that question. {reason}",
-            citations=[],
-            snippets=[],
-            latency_ms=latency_ms,
-        )
-
-    # Build messages and call OpenAI
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
+    if not refuse:
+        return None
+    latency_ms = int((time.perf_counter() - start) * 1000)
+    response = ChatResponse(
+        answer=f"I cannot answer that question. {reason}",
+        citations=[],
+        snippets=[],
+        latency_ms=latency_ms,
+    )
+    _cache_response(question, response, version, query_embedding)
+    return response
+
+
+def _check_api_key() -> None:
+    if not os.environ.get("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY must be set in .env")
 
-    client = OpenAI()
-    messages = build_messages(req.question, contexts)
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
+
+async def _prepare_answer(question: str, timer: StageTimer) -> tuple[ChatResponse | None, dict | None]:
+    """
+    Shared front half of /chat and /chat/stream: index check, answer cache, retrieval
+    and the refusal guardrail. Returns (response, None) when that already answers the
+    question, else (None, {"contexts", "version", "query_embedding", "analysis"}).
+    """
+    start = timer.start
+    with timer.stage("index_check"):
+        ready = index_ready()
+        version = index_version() if ready else None
+    if not ready:
+        timer.outcome = "index_missing"
+        return _index_missing(start), None
+
+    # Answer cache, tier 1: same normalized question
+    if answer_cache is not None:
+        with timer.stage("answer_cache_exact") as stage:
+            cached = answer_cache.get_exact(question, version)
+            stage["cache"] = "miss" if cached is None else "hit"
+        if cached is not None:
+            timer.outcome = "cache_hit"
+            return _cached_response(cached, start), None
+
+    # Answer cache, tier 2: near-duplicate question by query embedding
+    embed_stats: dict = {}
+    with timer.stage("embed") as stage:
+        query_embedding = await _aembed_query(question, stats=embed_stats)
+        stage["cache"] = cache_tag(embed_stats)
+    if answer_cache is not None:
+        with timer.stage("answer_cache_similar") as stage:
+            cached = answer_cache.get_similar(question, query_embedding, version)
+            stage["cache"] = "miss" if cached is None else "hit"
+        if cached is not None:
+            timer.outcome = "cache_hit"
+            return _cached_response(cached, start), None
+
+    # Retrieve
+    retrieval_timings: dict = {}
+    analysis = QueryAnalysis(question)
+    contexts = await aretrieve(
+        question, query_embedding=query_embedding, timings=retrieval_timings, analysis=analysis
+    )
+    _add_retrieval_timings(timer, retrieval_timings)
+
+    # Guardrail: refuse if insufficient context
+    refusal = _refusal(question, contexts, start, version, query_embedding)
+    if refusal is not None:
+        timer.outcome = "refused"
+        return refusal, None
+
+    _check_api_key()
+    return None, {"contexts": contexts, "version": version, "query_embedding": query_embedding, "analysis": analysis}
+
+
+def _tag_lookups(stage: dict, hits: int, misses: int) -> None:
+    """Record a batch stage's per-question cache hits/misses and its overall cache tag."""
+    stage.update(hits=hits, misses=misses, cache=cache_tag({"hits": hits, "misses": misses}))
+
+
+async def _prepare_answers(
+    questions: list[str], timer: StageTimer
+) -> list[tuple[ChatResponse | None, dict | None]]:
+    """
+    _prepare_answer() for a batch: cache lookups per question, then one embeddings
+    request and one index search for every question the cache did not answer.
+    Returns one (response, prepared) pair per question, in order.
+    """
+    start = timer.start
+    with timer.stage("index_check"):
+        ready = index_ready()
+        version = index_version() if ready else None
+    if not ready:
+        timer.outcome = "index_missing"
+        return [(_index_missing(start), None) for _ in questions]
+
+    out: list[tuple[ChatResponse | None, dict | None]] = [(None, None)] * len(questions)
+    pending = list(range(len(questions)))
+    if answer_cache is not None:
+        pending = []
+        with timer.stage("answer_cache_exact") as stage:
+            for i, question in enumerate(questions):
+                cached = answer_cache.get_exact(question, version)
+                if cached is not None:
+                    out[i] = (_cached_response(cached, start), None)
+                else:
+                    pending.append(i)
+            _tag_lookups(stage, len(questions) - len(pending), len(pending))
+        if not pending:
+            return out
+
+    embed_stats: dict = {}
+    with timer.stage("embed") as stage:
+        embeddings = await _aembed_queries([questions[i] for i in pending], stats=embed_stats)
+        if embed_stats:
+            _tag_lookups(stage, embed_stats.get("hits", 0), embed_stats.get("misses", 0))
+    to_retrieve = list(zip(pending, embeddings))
+    if answer_cache is not None:
+        to_retrieve = []
+        with timer.stage("answer_cache_similar") as stage:
+            for i, embedding in zip(pending, embeddings):
+                cached = answer_cache.get_similar(questions[i], embedding, version)
+                if cached is not None:
+                    out[i] = (_cached_response(cached, start), None)
+                else:
+                    to_retrieve.append((i, embedding))
+            _tag_lookups(stage, len(pending) - len(to_retrieve), len(to_retrieve))
+        if not to_retrieve:
+            return out
+
+    retrieval_timings: dict = {}
+    analyses = [QueryAnalysis(questions[i]) for i, _ in to_retrieve]
+    all_contexts = await aretrieve_many(
+        [questions[i] for i, _ in to_retrieve],
+        query_embeddings=[embedding for _, embedding in to_retrieve],
+        timings=retrieval_timings,
+        analyses=analyses,
+    )
+    _add_retrieval_timings(timer, retrieval_timings)
+    for (i, embedding), contexts, analysis in zip(to_retrieve, all_contexts, analyses):
+        refusal = _refusal(questions[i], contexts, start, version, embedding)
+        if refusal is not None:
+            out[i] = (refusal, None)
+        else:
+            _check_api_key()
+            out[i] = (None, {
+                "contexts": contexts, "version": version, "query_embedding": embedding, "analysis": analysis,
+            })
+    return out
+
+
+async def _complete(question: str, contexts: list[dict]) -> str:
+    """Raw completion text for question grounded in contexts."""
+    response = await clients.get_async_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=build_messages(question, contexts),
         max_tokens=MAX_OUTPUT_TOKENS,
     )
-    answer = response.choices[0].message.content or ""
+    return response.choices[0].message.content or ""
+
+
+async def _answer(question: str, prepared: dict, timer: StageTimer) -> ChatResponse:
+    """Completion + finalize_answer for a prepared question; the response is cached."""
+    contexts = prepared["contexts"]
+    with timer.stage("llm"):
+        answer = await _complete(question, contexts)
+    with timer.stage("quote"):
+        answer, citations, snippets = finalize_answer(question, answer, contexts, prepared.get("analysis"))
+
+    latency_ms = int((time.perf_counter() - timer.start) * 1000)
+
+    response = ChatResponse(
+        answer=answer,
+        citations=citations,
+        snippets=snippets,
+        latency_ms=latency_ms,
+    )
+    _cache_response(question, response, prepared["version"], prepared["query_embedding"])
+    return response
+
+
+async def answer_batch(
+    questions: list[str], concurrency: int | None = None, timer: StageTimer | None = None
+) -> list[ChatResponse]:
+    """
+    Answer several questions, in order: one embeddings request and one index search
+    for the whole batch, then at most `concurrency` completions in flight.
+    latency_ms of each answer is measured from the start of the batch.
+    concurrency defaults to BATCH_CONCURRENCY (RAG_BATCH_CONCURRENCY).
+    A question whose completion fails gets an answer with `error` set; the others
+    are still returned (and the batch's metrics outcome is "error").
+    """
+    timer = timer if timer is not None else StageTimer("batch")
+    semaphore = asyncio.Semaphore(max(1, concurrency or BATCH_CONCURRENCY))
+
+    async def one(question: str, early: ChatResponse | None, prepared: dict | None) -> ChatResponse:
+        if early is not None:
+            return early
+        async with semaphore:
+            try:
+                return await _answer(question, prepared, timer)
+            except Exception as exc:
+                logging.warning(f"Batch question failed: {type(exc).__name__}: {exc}")
+                timer.outcome = "error"
+                return ChatResponse(
+                    answer="I cannot answer that question right now. Please try again.",
+                    citations=[],
+                    snippets=[],
+                    latency_ms=int((time.perf_counter() - timer.start) * 1000),
+                    error=f"{type(exc).__name__}: {exc}",
+                )
+
+    prepared_all = await _prepare_answers(questions, timer)
+    return list(await asyncio.gather(*(
+        one(question, early, prepared) for question, (early, prepared) in zip(questions, prepared_all)
+    )))
+
+
+def finalize_answer(
+    question: str, answer: str, contexts: list[dict], analysis: QueryAnalysis | None = None
+) -> tuple[str, list[Citation], list[str]]:
+    """
+    Turn raw completion text into the final answer: truncate to MAX_ANSWER_WORDS,
+    append the deterministic Quote: line, and keep only the citations the answer references.
+    analysis is the request's QueryAnalysis of question (built here if not given).
+    Returns (answer, citations, snippets).
+    """
     answer = truncate_words(answer, max_words=MAX_ANSWER_WORDS)
 
     # Deterministic quote injection: append Quote line if not already present
@@ -142,8 +441,11 @@ async def chat(req: ChatRequest):
         ctx = contexts[primary_idx - 1]
         source_text = ctx.get("text") or ctx.get("snippet") or ""
         if source_text:
-            question_keywords = _extract_keywords(req.question)
-            quote = pick_verbatim_quote(source_text, question_keywords=question_keywords)
+            # Ingest-time sentence index of the chunk text (retrieval results only)
+            sentences = getattr(ctx, "sentences", None) if ctx.get("text") else None
+            quote = pick_verbatim_quote(
+                source_text, analysis=analysis or QueryAnalysis(question), sentences=sentences
+            )
             if quote:
                 # Remove any internal double quotes to avoid breaking eval regex
                 clean_quote = quote.replace('"', "")
@@ -182,12 +484,123 @@ async def chat(req: ChatRequest):
             for i in valid_indices
         ]
         snippets = [contexts[i - 1]["snippet"] for i in valid_indices]
+    return answer, citations, snippets
 
-    latency_ms = int((time.perf_counter() - start) * 1000)
 
-    return ChatResponse(
-        answer=answer,
-        citations=citations,
-        snippets=snippets,
-        latency_ms=latency_ms,
+# --- Routes ---
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once startup warmup is done and an index exists, else 503."""
+    body = dict(readiness)
+    if body["status"] == "ready" and not index_ready():
+        body["status"] = "index_missing"
+    return JSONResponse(body, status_code=200 if body["status"] == "ready" else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage and per-request latency histograms (Prometheus text format); RAG_METRICS=0 disables."""
+    if not METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled (RAG_METRICS=0)\n", status_code=404)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    return templates.TemplateResponse(request, "index.html")
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest):
+    with StageTimer("chat") as timer:
+        early, prepared = await _prepare_answer(req.question, timer)
+        if early is None:
+            early = await _answer(req.question, prepared, timer)
+        return _with_timings(early, timer, req.include_timings)
+
+
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(req: BatchChatRequest):
+    """
+    Many questions in one request (up to RAG_BATCH_MAX_QUESTIONS). Answers come back
+    in question order and match what /chat returns for each question.
+    """
+    with StageTimer("batch") as timer:
+        results = await answer_batch(req.questions, timer=timer)
+        response = BatchChatResponse(results=results, latency_ms=int((time.perf_counter() - timer.start) * 1000))
+        if req.include_timings:
+            response.timings = [StageTiming(**s) for s in timer.stages]
+        return response
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Server-sent events version of /chat. Events, in order:
+      citations  retrieved sources ([n] in the answer refers to item n), sent right after retrieval;
+                 doc_id, title and section only, so uncited chunks never compute a snippet
+      token      answer text as it is generated ({"text": ...}); may run past the word limit
+      final      the complete ChatResponse (truncated answer, Quote: line, cited sources with snippets)
+    Cache hits and refusals send only `final`. Failures after streaming started send `error`.
+    """
+    timer = StageTimer("stream")
+    try:
+        early, prepared = await _prepare_answer(req.question, timer)
+    except Exception:
+        timer.outcome = "error"
+        timer.finish()
+        raise
+
+    async def events():
+        with timer:
+            if early is not None:
+                yield _sse("final", _with_timings(early, timer, req.include_timings).model_dump())
+                return
+            contexts = prepared["contexts"]
+            yield _sse("citations", {"citations": [
+                {"doc_id": c["doc_id"], "title": c["title"], "section": c.get("section")} for c in contexts
+            ]})
+            try:
+                parts = []
+                with timer.stage("llm"):
+                    stream = await clients.get_async_client().chat.completions.create(
+                        model=CHAT_MODEL,
+                        messages=build_messages(req.question, contexts),
+                        max_tokens=MAX_OUTPUT_TOKENS,
+                        stream=True,
+                    )
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            yield _sse("token", {"text": delta})
+
+                with timer.stage("quote"):
+                    answer, citations, snippets = finalize_answer(
+                        req.question, "".join(parts), contexts, prepared.get("analysis")
+                    )
+                response = ChatResponse(
+                    answer=answer,
+                    citations=citations,
+                    snippets=snippets,
+                    latency_ms=int((time.perf_counter() - timer.start) * 1000),
+                )
+                _cache_response(req.question, response, prepared["version"], prepared["query_embedding"])
+                yield _sse("final", _with_timings(response, timer, req.include_timings).model_dump())
+            except Exception as exc:
+                timer.outcome = "error"
+                logging.exception("Streaming chat failed")
+                yield _sse("error", {"detail": f"{type(exc).__name__}: {exc}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
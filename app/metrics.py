@@ -0,0 +1,161 @@
+"""
+Per-stage latency metrics for the chat endpoints, in Prometheus text format (GET /metrics).
+Histograms are kept in process memory, so each uvicorn worker reports its own.
+
+Stages (label `stage`):
+  index_check         index_ready()
+  answer_cache_exact  answer cache tier 1 (cache="hit"/"miss"; not recorded with the cache off)
+  embed               query embedding (cache="hit" when served by the embedding cache)
+  answer_cache_similar answer cache tier 2 (cache="hit"/"miss"; not recorded with the cache off)
+  search              vector + BM25 search and fusion
+  evidence            keyword rerank of the retrieved chunks
+  llm                 completion call (whole stream for /chat/stream)
+  quote               finalize_answer: quote picking, truncation, citation filtering,
+                      evidence snippets of the cited chunks (computed on first use)
+
+A /chat/batch stage that looks up several questions is tagged cache="mixed" when
+only some of them hit.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.environ.get("RAG_METRICS", "1") != "0"
+
+# Seconds; covers sub-millisecond index lookups up to slow completions
+LATENCY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Histogram:
+    """Prometheus-style histogram with a fixed label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=LATENCY_BUCKETS_S):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["counts"][i] += 1
+            series["sum"] += value
+
+    def count(self, **labels: str) -> int:
+        """Observations for one label combination (0 if none)."""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            return sum(series["counts"]) if series else 0
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(s["counts"]), s["sum"]) for key, s in sorted(self._series.items())}
+        for key, (counts, total) in series.items():
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            cumulative = 0
+            for le, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{_format_value(le)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total!r}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent per chat pipeline stage.", ("endpoint", "stage", "cache")
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds", "End-to-end chat request time by outcome.", ("endpoint", "outcome")
+)
+HISTOGRAMS = (REQUEST_SECONDS, STAGE_SECONDS)
+
+
+def render_metrics() -> str:
+    """All histograms in Prometheus text exposition format."""
+    return "".join(h.render() for h in HISTOGRAMS)
+
+
+def clear_metrics() -> None:
+    for h in HISTOGRAMS:
+        h.clear()
+
+
+class StageTimer:
+    """
+    Stage timings for one request. Each stage is recorded for the response's
+    `timings` field and observed in STAGE_SECONDS. Used as a context manager, the
+    whole request is observed in REQUEST_SECONDS on exit under `outcome`
+    (answered unless changed; error or cancelled if the block raised).
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.stages: list[dict] = []
+        self.outcome = "answered"
+
+    def __enter__(self) -> "StageTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.outcome = "error" if issubclass(exc_type, Exception) else "cancelled"
+        self.finish()
+
+    @contextmanager
+    def stage(self, name: str, cache: str | None = None):
+        """Time the block as stage `name`. Set record["cache"] inside the block once hit/miss is known."""
+        record = {"stage": name, "ms": 0.0, "cache": cache}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.add(name, time.perf_counter() - start, record["cache"], record)
+
+    def add(self, name: str, seconds: float, cache: str | None = None, record: dict | None = None) -> None:
+        """Record a stage measured elsewhere (e.g. inside retrieve())."""
+        record = record if record is not None else {"stage": name, "cache": cache}
+        record["ms"] = round(seconds * 1000, 3)
+        self.stages.append(record)
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe(seconds, endpoint=self.endpoint, stage=name, cache=cache or "none")
+
+    def finish(self) -> None:
+        """Observe the whole request under self.outcome (answered, cache_hit, refused, ...)."""
+        if METRICS_ENABLED:
+            REQUEST_SECONDS.observe(time.perf_counter() - self.start, endpoint=self.endpoint, outcome=self.outcome)
+
+
+def cache_tag(stats: dict) -> str | None:
+    """
+    Cache tag from hit/miss counts (e.g. cached_embed stats): 'hit' if nothing missed,
+    'miss' if nothing hit, 'mixed' otherwise; None if unknown.
+    """
+    if not stats:
+        return None
+    if not stats.get("misses"):
+        return "hit"
+    return "mixed" if stats.get("hits") else "miss"
@@ -0,0 +1,231 @@
+"""
+Microbenchmarks for the text processing on the request path (rag.retriever) and
+the chunking and sentence indexing on the ingest path (rag.ingest, rag.sentences),
+with regression thresholds.
+Run: python -m eval.bench_hotpaths [--scale 100] [--repeat 3] [--check] [--check-budgets]
+                                  [--update-thresholds] [--json PATH]
+
+Workloads:
+- real:   data/policies, chunked as at ingest; every chunk is paired with every
+          question in eval/questions.jsonl.
+- scaled: the same documents copied --scale times, with every number shifted per
+          copy so no two copies are identical; each chunk is paired with one question.
+
+Each benchmark reports the cost per unit (one chunk, sentence, question or document),
+best of --repeat passes on both corpora. The scaled per-unit cost should stay close to
+the real one. If it grows with corpus size, something on the path has gone superlinear.
+
+--check fails (exit code 1) if scaled/real exceeds max_scaling_ratio in
+eval/bench_thresholds.json. Both sides run on the same machine, so this holds on any
+runner and is what CI gates on.
+--check-budgets also fails if a per-unit cost exceeds its absolute budget. Budgets
+are relative to the machine that wrote them, so this is a local check only.
+--update-thresholds rewrites the budgets as HEADROOM x the current measurements.
+"""
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Callable
+
+from rag import ingest
+from rag.sentences import sentence_index
+from rag.retriever import (
+    DEFAULT_K,
+    QueryAnalysis,
+    _rerank_by_keywords,
+    _rule_bonus,
+    extract_evidence_sentences,
+    pick_verbatim_quote,
+    split_sentences,
+)
+
+EVAL_DIR = Path(__file__).resolve().parent
+QUESTIONS_PATH = EVAL_DIR / "questions.jsonl"
+THRESHOLDS_PATH = EVAL_DIR / "bench_thresholds.json"
+
+DEFAULT_SCALE = 100
+# Passes per benchmark, best kept; the same on both corpora so their ratio is fair
+REPEAT = 3
+# Budgets written by --update-thresholds, relative to the measuring machine
+HEADROOM = 4.0
+MAX_SCALING_RATIO = 3.0
+
+
+def load_questions() -> list[str]:
+    with open(QUESTIONS_PATH, encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+def synthetic_docs(docs: list[dict], scale: int) -> list[dict]:
+    """scale copies of docs; copy k has every number shifted by k (same structure, different text)."""
+    out = []
+    for k in range(scale):
+        for doc in docs:
+            text = re.sub(r"\d+", lambda m: str(int(m.group()) + k), doc["text"]) if k else doc["text"]
+            out.append({**doc, "filename": f"{k}-{doc['filename']}", "text": text})
+    return out
+
+
+def build_workload(docs: list[dict], questions: list[str], all_pairs: bool) -> dict:
+    """
+    Inputs for every benchmark. all_pairs pairs each chunk with every question, else round-robin.
+    Questions are analysed once up front, as a request does before retrieval, and each
+    chunk carries its ingest-time sentence index, as retrieval results do.
+    """
+    chunks = ingest.build_chunks(docs)[0]
+    texts = [c["text"] for c in chunks]
+    sentences = {text: sentence_index(text) for text in texts}
+    # Result lists as retrieve() reranks them: DEFAULT_K chunks each
+    groups = [
+        [{"text": text, "distance": 0.1 * j} for j, text in enumerate(texts[i:i + DEFAULT_K])]
+        for i in range(0, len(texts), DEFAULT_K)
+    ]
+    analyses = [QueryAnalysis(q) for q in questions]
+    if all_pairs:
+        pairs = [(text, a, sentences[text]) for a in analyses for text in texts]
+        rerank = [(group, a) for a in analyses for group in groups]
+    else:
+        pairs = [(text, analyses[i % len(analyses)], sentences[text]) for i, text in enumerate(texts)]
+        rerank = [(group, analyses[i % len(analyses)]) for i, group in enumerate(groups)]
+    return {
+        "docs": docs,
+        "texts": texts,
+        "sentences": [s for text in texts for s in split_sentences(text)],
+        "pairs": pairs,
+        "rerank": rerank,
+    }
+
+
+# name -> (unit, inputs key, function applied to one input)
+BENCHMARKS: dict[str, tuple[str, str, Callable]] = {
+    "split_sentences": ("chunk", "texts", split_sentences),
+    "sentence_index": ("chunk", "texts", sentence_index),
+    "_rule_bonus": ("sentence", "sentences", _rule_bonus),
+    "extract_evidence_sentences": (
+        "chunk", "pairs", lambda p: extract_evidence_sentences(p[0], p[1].question, analysis=p[1], sentences=p[2])
+    ),
+    "pick_verbatim_quote": ("chunk", "pairs", lambda p: pick_verbatim_quote(p[0], analysis=p[1], sentences=p[2])),
+    "_rerank_by_keywords": ("question", "rerank", lambda p: _rerank_by_keywords(list(p[0]), p[1].question, p[1])),
+    "chunk_text": ("document", "docs", lambda doc: ingest.chunk_text(doc["text"])),
+}
+
+
+def _time_all(fn: Callable, inputs: list) -> float:
+    start = time.perf_counter()
+    for item in inputs:
+        fn(item)
+    return time.perf_counter() - start
+
+
+def run_benchmarks(workload: dict, repeat: int = 1) -> dict:
+    """{name: {"unit", "units", "per_unit_us", "total_ms"}}; best of `repeat` passes."""
+    results = {}
+    for name, (unit, key, fn) in BENCHMARKS.items():
+        inputs = workload[key]
+        best = min(_time_all(fn, inputs) for _ in range(repeat))
+        results[name] = {
+            "unit": unit,
+            "units": len(inputs),
+            "per_unit_us": round(best / max(1, len(inputs)) * 1e6, 3),
+            "total_ms": round(best * 1000, 2),
+        }
+    # Whole-corpus ingest chunking (tokenize + window), per document
+    docs = workload["docs"]
+    best = min(_time_all(lambda d: ingest.build_chunks(d), [docs]) for _ in range(repeat))
+    results["build_chunks"] = {
+        "unit": "document",
+        "units": len(docs),
+        "per_unit_us": round(best / max(1, len(docs)) * 1e6, 3),
+        "total_ms": round(best * 1000, 2),
+    }
+    return results
+
+
+def check(results: dict, thresholds: dict, budgets: bool = False) -> list[str]:
+    """Scaling violations, plus absolute budget violations with budgets=True; one message each."""
+    failures = []
+    max_ratio = thresholds.get("max_scaling_ratio", MAX_SCALING_RATIO)
+    for corpus, by_name in results.items():
+        for name, r in by_name.items():
+            budget = thresholds.get("per_unit_us", {}).get(name) if budgets else None
+            if budget is not None and r["per_unit_us"] > budget:
+                failures.append(f"{name} ({corpus}): {r['per_unit_us']:.1f} us/{r['unit']} > budget {budget:.1f}")
+    if "real" in results and "scaled" in results:
+        for name, real in results["real"].items():
+            scaled = results["scaled"].get(name)
+            if scaled and real["per_unit_us"] > 0:
+                ratio = scaled["per_unit_us"] / real["per_unit_us"]
+                if ratio > max_ratio:
+                    failures.append(f"{name}: scaled/real per-unit cost {ratio:.2f}x > {max_ratio:.2f}x")
+    return failures
+
+
+def thresholds_from(results: dict, headroom: float = HEADROOM) -> dict:
+    worst = {}
+    for by_name in results.values():
+        for name, r in by_name.items():
+            worst[name] = max(worst.get(name, 0.0), r["per_unit_us"])
+    return {
+        "max_scaling_ratio": MAX_SCALING_RATIO,
+        "per_unit_us": {name: round(value * headroom, 1) for name, value in worst.items()},
+    }
+
+
+def _print_table(results: dict, thresholds: dict) -> None:
+    budgets = thresholds.get("per_unit_us", {})
+    print(f"{'benchmark':<28} {'corpus':<7} {'units':>8} {'us/unit':>10} {'total ms':>10} {'budget':>8}")
+    for corpus, by_name in results.items():
+        for name, r in by_name.items():
+            budget = budgets.get(name)
+            print(
+                f"{name:<28} {corpus:<7} {r['units']:>8} {r['per_unit_us']:>10.2f} "
+                f"{r['total_ms']:>10.1f} {budget if budget is not None else '-':>8}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for retriever and ingest hot paths.")
+    parser.add_argument("--scale", type=int, default=DEFAULT_SCALE, help="Synthetic corpus size multiplier (0 skips it)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help=f"Passes per benchmark, best kept (default: {REPEAT})")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a cost grows with corpus size")
+    parser.add_argument(
+        "--check-budgets", action="store_true", help="Also exit 1 if a cost exceeds its budget (this machine only)"
+    )
+    parser.add_argument("--update-thresholds", action="store_true", help=f"Rewrite {THRESHOLDS_PATH.name}")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    docs, _, _ = ingest.load_documents(ingest.DATA_DIR)
+    if not docs:
+        raise SystemExit(f"No documents found in {ingest.DATA_DIR}")
+    questions = load_questions()
+
+    results = {"real": run_benchmarks(build_workload(docs, questions, all_pairs=True), repeat=args.repeat)}
+    if args.scale > 1:
+        scaled = build_workload(synthetic_docs(docs, args.scale), questions, all_pairs=False)
+        results["scaled"] = run_benchmarks(scaled, repeat=args.repeat)
+
+    thresholds = json.loads(THRESHOLDS_PATH.read_text(encoding="utf-8")) if THRESHOLDS_PATH.exists() else {}
+    if args.update_thresholds:
+        thresholds = thresholds_from(results)
+        THRESHOLDS_PATH.write_text(json.dumps(thresholds, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote {THRESHOLDS_PATH}")
+
+    _print_table(results, thresholds)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    if args.check or args.check_budgets:
+        failures = check(results, thresholds, budgets=args.check_budgets)
+        if failures:
+            print("\nThreshold violations:")
+            print("\n".join(f"  {f}" for f in failures))
+            raise SystemExit(1)
+        print("\nAll hot paths within budget." if args.check_budgets else "\nNo hot path cost grows with corpus size.")
+
+
+if __name__ == "__main__":
+    main()
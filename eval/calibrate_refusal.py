@@ -0,0 +1,65 @@
+"""
+Calibrate an embedding backend's refusal distance on held-out questions.
+Run: python -m eval.calibrate_refusal [--backend local] [--questions eval/refusal_calibration.jsonl]
+
+Builds a scratch index of data/policies with the backend, retrieves every question
+and prints its best-hit distance, then the threshold that best separates answerable
+from unanswerable questions (balanced accuracy; ties go to the lower threshold).
+The questions are held out from eval/questions.jsonl, so the eval still measures a
+threshold it was not fitted to. Needs OPENAI_API_KEY for the openai backend only.
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from rag import embedding_backends, ingest, retriever
+
+CALIBRATION_PATH = Path(__file__).resolve().parent / "refusal_calibration.jsonl"
+
+
+def best_threshold(answerable: list[float], unanswerable: list[float]) -> tuple[float, float]:
+    """
+    Distance threshold (refuse above it) with the best balanced accuracy: a midpoint
+    between two adjacent observed distances. Returns (threshold, balanced_accuracy).
+    """
+    points = sorted(set(answerable) | set(unanswerable))
+    candidates = [points[0] - 0.01] + [(a + b) / 2 for a, b in zip(points, points[1:])] + [points[-1] + 0.01]
+    best = (candidates[0], -1.0)
+    for t in candidates:
+        score = (sum(d <= t for d in answerable) / len(answerable)
+                 + sum(d > t for d in unanswerable) / len(unanswerable)) / 2
+        if score > best[1]:
+            best = (t, score)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=tuple(embedding_backends.BACKENDS), default="local")
+    parser.add_argument("--questions", type=Path, default=CALIBRATION_PATH)
+    args = parser.parse_args()
+
+    questions = [json.loads(line) for line in args.questions.read_text(encoding="utf-8").splitlines() if line.strip()]
+    # Retrieval embeds queries with the default backend
+    embedding_backends.EMBED_BACKEND = args.backend
+    with tempfile.TemporaryDirectory(prefix="rag-calibrate-") as tmp:
+        ingest.INDEX_DIR = Path(tmp) / "index"
+        ingest.run(rebuild=True, embed_backend=args.backend)
+        scored = []
+        for q in questions:
+            results = retriever.retrieve(q["question"], persist_dir=ingest.INDEX_DIR)
+            scored.append((min((r["distance"] for r in results), default=float("inf")), q))
+
+    for distance, q in sorted(scored, key=lambda s: s[0]):
+        print(f"{distance:6.3f}  {q['type']:<12} {q['question']}")
+    threshold, accuracy = best_threshold(
+        [d for d, q in scored if q["type"] == "answerable"],
+        [d for d, q in scored if q["type"] != "answerable"],
+    )
+    print(f"Refuse above {threshold:.3f} (balanced accuracy {accuracy:.0%} on {len(scored)} questions)")
+
+
+if __name__ == "__main__":
+    main()
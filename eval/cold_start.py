@@ -0,0 +1,121 @@
+"""
+Cold-start benchmark: how long a fresh server process takes to import, to answer
+/health, to report ready on /ready, and to serve its first /chat requests.
+Run: python -m eval.cold_start [--runs 3] [--latency-ms 50] [--chat-latency-ms 200]
+
+Like eval.load_test it needs no API key: it starts eval.fake_openai, builds a scratch
+index through it, then starts uvicorn on that index `runs` times (answer cache off)
+and reports the median of each measurement. A server without /ready reports no
+ready time. The first /chat is sent as soon as /health answers, as a load balancer
+that only checks liveness would do; --wait-ready sends it after /ready instead.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from eval.fake_openai import FakeOpenAIServer
+from eval.load_test import REPO_DIR, STARTUP_TIMEOUT_S, _free_port, index_questions
+
+
+def import_time_s(env: dict) -> float:
+    """Seconds to import app.main in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, env=env, check=True,
+                         capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _poll(url: str, proc: subprocess.Popen, started: float) -> float | None:
+    """Seconds from started until url answers 200; None if it answers 404 (no such route)."""
+    deadline = started + STARTUP_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"Server exited with code {proc.returncode}")
+        try:
+            status = httpx.get(url, timeout=1.0).status_code
+            if status == 200:
+                return time.monotonic() - started
+            if status == 404:
+                return None
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise SystemExit(f"{url} did not answer within {STARTUP_TIMEOUT_S:.0f} s")
+
+
+def one_run(env: dict, question: str, wait_ready: bool) -> dict:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", "1", "--log-level", "warning"],
+        cwd=REPO_DIR, env=env,
+    )
+    try:
+        run = {"health_s": _poll(f"{base_url}/health", proc, started)}
+        if wait_ready:
+            run["ready_s"] = _poll(f"{base_url}/ready", proc, started)
+        with httpx.Client(base_url=base_url, timeout=60.0) as client:
+            for key in ("first_chat_ms", "second_chat_ms"):
+                t = time.perf_counter()
+                client.post("/chat", json={"question": question}).raise_for_status()
+                run[key] = (time.perf_counter() - t) * 1000
+        if not wait_ready:
+            run["ready_s"] = _poll(f"{base_url}/ready", proc, started)
+        return run
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake embeddings latency")
+    parser.add_argument("--chat-latency-ms", type=float, default=200.0, help="fake completion latency")
+    parser.add_argument("--wait-ready", action="store_true", help="send the first /chat after /ready")
+    args = parser.parse_args()
+
+    with FakeOpenAIServer(latency_ms=args.latency_ms, chat_latency_ms=args.chat_latency_ms) as fake, \
+            tempfile.TemporaryDirectory(prefix="rag-cold-") as tmp:
+        index_dir = Path(tmp) / "index"
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "RAG_INDEX_DIR": str(index_dir),
+            "RAG_EMBED_CACHE": "0",
+            "RAG_ANSWER_CACHE": "0",
+        }
+        subprocess.run(
+            [sys.executable, "-m", "rag.ingest", "--rebuild"],
+            cwd=REPO_DIR, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        # A chunk text retrieves an exact match, so /chat goes through the completion call
+        question = index_questions(index_dir)[0]
+        imports = [import_time_s(env) for _ in range(args.runs)]
+        runs = [one_run(env, question, args.wait_ready) for _ in range(args.runs)]
+
+    print(f"import app.main   {statistics.median(imports) * 1000:8.0f} ms")
+    for key, label, scale, unit in [
+        ("health_s", "/health up", 1000, "ms"),
+        ("ready_s", "/ready green", 1000, "ms"),
+        ("first_chat_ms", "first /chat", 1, "ms"),
+        ("second_chat_ms", "second /chat", 1, "ms"),
+    ]:
+        values = [r[key] for r in runs if r.get(key) is not None]
+        shown = f"{statistics.median(values) * scale:8.0f} {unit}" if values else "       - (no endpoint)"
+        print(f"{label:<17} {shown}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions APIs, for tests,
+load tests and offline benchmarks. Vectors are deterministic (seeded by the input
+text) and unit-normalized; completions are a fixed answer citing source [1].
+Run: python -m eval.fake_openai [--port 8100] [--latency-ms 50] [--chat-latency-ms 500] [--jitter-ms 20] [--fail-first N]
+Then point the app at it: OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+DEFAULT_DIM = 256
+FAKE_ANSWER = "Per the policy, requests follow the documented approval process [1]."
+
+
+def fake_embedding(text: str, dim: int = DEFAULT_DIM) -> np.ndarray:
+    """Deterministic unit vector for text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class FakeOpenAIServer:
+    """
+    Threaded HTTP server speaking the /v1/embeddings and /v1/chat/completions protocols.
+    latency_ms delays every response (chat_latency_ms, if set, overrides it for
+    completions) and varies by up to +/- jitter_ms, uniformly; streamed completions
+    (stream=true) also wait token_latency_ms between chunks. The first fail_first
+    requests get a 429.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        fail_first: int = 0,
+        dim: int = DEFAULT_DIM,
+        chat_latency_ms: float | None = None,
+        token_latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chat_latency_ms = chat_latency_ms
+        self.token_latency_ms = token_latency_ms
+        self.fail_first = fail_first
+        self.dim = dim
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.batch_sizes = []
+        self.chat_requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _embeddings(self, body: dict) -> dict:
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = []
+        for i, text in enumerate(inputs):
+            vec = fake_embedding(text, self.dim)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vec.tobytes()).decode("ascii")
+            else:
+                embedding = vec.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(t.split()) for t in inputs)
+        with self._lock:
+            self.batch_sizes.append(len(inputs))
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def _chat_completion(self, body: dict) -> dict:
+        with self._lock:
+            self.chat_requests += 1
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        completion_tokens = len(FAKE_ANSWER.split())
+        return {
+            "id": f"chatcmpl-fake-{self.chat_requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": FAKE_ANSWER},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _chat_chunks(self, body: dict):
+        """Streamed completion (stream=true): one chunk per word, then a stop chunk."""
+        with self._lock:
+            self.chat_requests += 1
+            chunk_id = f"chatcmpl-fake-{self.chat_requests}"
+        base = {"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "fake")}
+        words = FAKE_ANSWER.split(" ")
+        for i, word in enumerate(words):
+            text = word if i == len(words) - 1 else word + " "
+            delta = {"role": "assistant", "content": text} if i == 0 else {"content": text}
+            yield {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+    def _latency_s(self, path: str) -> float:
+        if self.chat_latency_ms is not None and path.endswith("/chat/completions"):
+            latency_ms = self.chat_latency_ms
+        else:
+            latency_ms = self.latency_ms
+        if self.jitter_ms:
+            latency_ms += random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, latency_ms) / 1000
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, like the real API, so client connection pooling is observable
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; with Nagle on, delayed ACKs add ~40 ms per response
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict, headers: dict | None = None) -> None:
+                raw = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _send_stream(self, chunks) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for i, chunk in enumerate(chunks):
+                    if i and server.token_latency_ms:
+                        time.sleep(server.token_latency_ms / 1000)
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    fail = server.failures < server.fail_first
+                    if fail:
+                        server.failures += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                path = self.path.rstrip("/")
+                try:
+                    delay = server._latency_s(path)
+                    if delay:
+                        time.sleep(delay)
+                    if fail:
+                        self._send(
+                            429,
+                            {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            {"Retry-After": "0"},
+                        )
+                    elif path.endswith("/embeddings"):
+                        self._send(200, server._embeddings(body))
+                    elif path.endswith("/chat/completions") and body.get("stream"):
+                        self._send_stream(server._chat_chunks(body))
+                    elif path.endswith("/chat/completions"):
+                        self._send(200, server._chat_completion(body))
+                    else:
+                        self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI embeddings/chat server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    parser.add_argument(
+        "--chat-latency-ms",
+        type=float,
+        default=None,
+        help="Delay for chat completions (default: --latency-ms)",
+    )
+    parser.add_argument(
+        "--token-latency-ms", type=float, default=0.0, help="Delay between streamed completion chunks"
+    )
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Vary each delay by up to +/- this much")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N requests with 429")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="Embedding dimensions")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        fail_first=args.fail_first,
+        dim=args.dim,
+        chat_latency_ms=args.chat_latency_ms,
+        token_latency_ms=args.token_latency_ms,
+        jitter_ms=args.jitter_ms,
+    )
+    print(f"Fake OpenAI server at {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Load test / benchmark for POST /chat.
+Run: python -m eval.load_test [--requests 200] [--concurrency 32] [--rps 20] [--duration-s 30]
+                              [--latency-ms 50] [--chat-latency-ms 500] [--jitter-ms 0]
+
+By default it runs the whole stack locally, with no API key or network needed:
+- starts eval.fake_openai with the given latencies;
+- builds a scratch index from data/policies through it;
+- starts uvicorn (one worker) on that index, with the answer cache off;
+- fires concurrent /chat requests.
+Questions are chunk texts from the scratch index, so every request retrieves an
+exact match and goes through the completion call. With a non-blocking request
+path, throughput scales with concurrency instead of being capped at about one
+request per model round trip.
+
+Without --rps the load is closed-loop: `concurrency` clients send back to back.
+With --rps requests start on a fixed schedule (open loop), and latency is measured
+from each request's scheduled start, so a server falling behind shows up as
+latency instead of silently lowering the offered load. Open-loop requests are not
+capped unless --concurrency is given; with a cap, the time a request waits for a
+free slot is client-side queueing, reported separately as queue_p95_ms and left
+out of effective_concurrency.
+
+Each run is appended to eval/load_results.jsonl (--output) with the git commit,
+parameters and summary, and compared with the last run that used the same parameters.
+
+Use --url to target an already running server instead; questions then come from
+eval/questions.jsonl (disable the answer cache there with RAG_ANSWER_CACHE=0).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from eval.fake_openai import FakeOpenAIServer
+
+EVAL_DIR = Path(__file__).resolve().parent
+REPO_DIR = EVAL_DIR.parent
+QUESTIONS_PATH = EVAL_DIR / "questions.jsonl"
+RESULTS_PATH = EVAL_DIR / "load_results.jsonl"
+
+REQUEST_TIMEOUT_S = 60.0
+STARTUP_TIMEOUT_S = 60.0
+# Closed-loop clients when --concurrency is not given
+CLOSED_LOOP_CONCURRENCY = 32
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(base_url: str, proc: subprocess.Popen, path: str = "/health") -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"Server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}{path}", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {base_url} did not become healthy")
+
+
+@contextlib.contextmanager
+def local_stack(latency_ms: float, chat_latency_ms: float | None, jitter_ms: float = 0.0):
+    """Fake model server + scratch index + one uvicorn worker. Yields (base_url, index_dir, fake)."""
+    with FakeOpenAIServer(latency_ms=latency_ms, chat_latency_ms=chat_latency_ms, jitter_ms=jitter_ms) as fake, \
+            tempfile.TemporaryDirectory(prefix="rag-load-") as tmp:
+        index_dir = Path(tmp) / "index"
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": fake.base_url,
+            "OPENAI_API_KEY": "fake",
+            "RAG_INDEX_DIR": str(index_dir),
+            "RAG_EMBED_CACHE": "0",
+            "RAG_ANSWER_CACHE": "0",
+        }
+        print(f"Fake OpenAI server at {fake.base_url}; building scratch index in {index_dir}")
+        subprocess.run(
+            [sys.executable, "-m", "rag.ingest", "--rebuild"],
+            cwd=REPO_DIR, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+             "--workers", "1", "--log-level", "warning"],
+            cwd=REPO_DIR, env=env,
+        )
+        try:
+            # After the startup warmup, so the first requests measured do not load the index
+            _wait_healthy(base_url, proc, "/ready")
+            yield base_url, index_dir, fake
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+def index_questions(index_dir: Path) -> list[str]:
+    """Chunk texts of a scratch index, used as questions that retrieve an exact match."""
+    from rag.vector_index import EXPORT_DIR_NAME, VectorIndex
+
+    index = VectorIndex.from_export(index_dir / EXPORT_DIR_NAME)
+    # /chat strips the question, so only chunks without surrounding whitespace match exactly
+    return [text for text in index.texts if len(text) >= 20 and text == text.strip()]
+
+
+def eval_questions() -> list[str]:
+    with open(QUESTIONS_PATH, encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+async def fire(
+    base_url: str,
+    questions: list[str],
+    n_requests: int,
+    concurrency: int | None,
+    rps: float | None = None,
+) -> tuple[list[dict], float]:
+    """
+    Send n_requests /chat requests, at most `concurrency` in flight (None: no cap). With
+    rps, request i is scheduled at i / rps seconds and its latency counts from then.
+    Each result's queue_s is the time from its start until it was sent. Returns (results, wall_s).
+    """
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else contextlib.nullcontext()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=REQUEST_TIMEOUT_S, limits=limits) as client:
+        async def one(i: int) -> dict:
+            if rps:
+                scheduled = begin + i / rps
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            if not rps:
+                scheduled = time.perf_counter()
+            async with semaphore:
+                start = scheduled if rps else time.perf_counter()
+                queue_s = time.perf_counter() - start
+                try:
+                    resp = await client.post("/chat", json={"question": questions[i % len(questions)]})
+                    ok = resp.status_code == 200
+                    status = resp.status_code
+                except httpx.HTTPError as exc:
+                    ok, status = False, type(exc).__name__
+                return {"ok": ok, "status": status, "latency_s": time.perf_counter() - start, "queue_s": queue_s}
+
+        begin = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(n_requests)))
+        return list(results), time.perf_counter() - begin
+
+
+def _percentile_ms(latencies: np.ndarray, q: float) -> float | None:
+    return round(float(np.percentile(latencies, q)), 1) if len(latencies) else None
+
+
+def summarize(results: list[dict], wall_s: float) -> dict:
+    latencies = np.array([r["latency_s"] for r in results if r["ok"]]) * 1000
+    queued = np.array([r.get("queue_s", 0.0) for r in results if r["ok"]]) * 1000
+    errors = sum(1 for r in results if not r["ok"])
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "wall_s": round(wall_s, 2),
+        "throughput_rps": round(len(results) / wall_s, 1) if wall_s else 0.0,
+        "latency_p50_ms": _percentile_ms(latencies, 50),
+        "latency_p95_ms": _percentile_ms(latencies, 95),
+        "latency_p99_ms": _percentile_ms(latencies, 99),
+        "latency_max_ms": round(float(latencies.max()), 1) if len(latencies) else None,
+        # Client-side wait for a free --concurrency slot (open loop); included in latency
+        "queue_p95_ms": _percentile_ms(queued, 95),
+        # Average requests in flight (sent, not queued): close to --concurrency when the server never blocks
+        "effective_concurrency": round(
+            sum(r["latency_s"] - r.get("queue_s", 0.0) for r in results) / wall_s, 1
+        ) if wall_s else 0.0,
+    }
+
+
+def git_revision() -> dict:
+    """Commit of the code under test: {"git_sha", "git_dirty"} (None if git is unavailable)."""
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"git_sha": None, "git_dirty": None}
+    return {"git_sha": sha, "git_dirty": bool(status.strip())}
+
+
+def save_result(path: Path, params: dict, summary: dict) -> dict | None:
+    """Append this run to the JSONL results file. Returns the previous run with the same params, if any."""
+    previous = None
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("params") == params:
+                        previous = record
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **git_revision(),
+        "params": params,
+        "summary": summary,
+    }
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    return previous
+
+
+def compare(previous: dict, summary: dict) -> list[str]:
+    """One line per headline metric: previous -> current."""
+    lines = []
+    for key in ("throughput_rps", "latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "error_rate"):
+        before, after = previous["summary"].get(key), summary.get(key)
+        if before is not None and after is not None:
+            change = f" ({(after - before) / before:+.0%})" if before else ""
+            lines.append(f"  {key:<16} {before} -> {after}{change}")
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test / benchmark for /chat.")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests (default: 200)")
+    parser.add_argument(
+        "--concurrency", type=int,
+        help=f"Max requests in flight (default: {CLOSED_LOOP_CONCURRENCY}; with --rps: no cap)",
+    )
+    parser.add_argument("--rps", type=float, help="Target request rate (open loop); default: closed loop")
+    parser.add_argument("--duration-s", type=float, help="With --rps: run this long (overrides --requests)")
+    parser.add_argument("--warmup", type=int, default=4, help="Untimed requests sent first (default: 4)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake embeddings latency (default: 50)")
+    parser.add_argument(
+        "--chat-latency-ms", type=float, default=500.0, help="Fake completion latency (default: 500)"
+    )
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Fake latency jitter, +/- (default: 0)")
+    parser.add_argument("--url", help="Target a running server instead of starting a local stack")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH, help=f"Results JSONL (default: {RESULTS_PATH})")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to --output")
+    args = parser.parse_args()
+
+    if args.concurrency is None and not args.rps:
+        args.concurrency = CLOSED_LOOP_CONCURRENCY
+    if args.duration_s:
+        if not args.rps:
+            raise SystemExit("--duration-s needs --rps")
+        args.requests = max(1, int(args.rps * args.duration_s))
+
+    def run(base_url: str, questions: list[str]) -> tuple[list[dict], float]:
+        if args.warmup:
+            asyncio.run(fire(base_url, questions, args.warmup, args.concurrency))
+        return asyncio.run(fire(base_url, questions, args.requests, args.concurrency, rps=args.rps))
+
+    if args.url:
+        results, wall_s = run(args.url, eval_questions())
+        fake = None
+    else:
+        with local_stack(args.latency_ms, args.chat_latency_ms, args.jitter_ms) as (base_url, index_dir, fake):
+            results, wall_s = run(base_url, index_questions(index_dir))
+
+    summary = summarize(results, wall_s)
+    if fake is not None:
+        summary["completions"] = fake.chat_requests
+    print(json.dumps(summary, indent=2))
+    if summary["errors"]:
+        statuses = sorted({str(r["status"]) for r in results if not r["ok"]})
+        print(f"Errors: {summary['errors']} ({', '.join(statuses)})")
+
+    if not args.no_save:
+        params = {
+            "target": args.url or "local",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "rps": args.rps,
+        }
+        if not args.url:
+            params.update(latency_ms=args.latency_ms, chat_latency_ms=args.chat_latency_ms, jitter_ms=args.jitter_ms)
+        previous = save_result(args.output, params, summary)
+        print(f"Saved to {args.output}")
+        if previous is not None:
+            print(f"Compared with {(previous.get('git_sha') or 'unknown')[:10]} ({previous['timestamp']}):")
+            print("\n".join(compare(previous, summary)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 """
 Evaluation runner for Policy RAG /chat endpoint.
-Run: python -m eval.run_eval [--overwrite]
+Run: python -m eval.run_eval [--overwrite] [--batch 16]
 Requires: server running at http://127.0.0.1:8000
+
+With --batch, a question's latency_ms runs from the start of its batch, so it is
+reported as time to completion within a batch, next to each batch's wall time,
+and not as per-request latency comparable with single /chat calls.
 """
 
 import argparse
 import json
 import re
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -18,6 +23,7 @@ EVAL_DIR = Path(__file__).resolve().parent
 QUESTIONS_PATH = EVAL_DIR / "questions.jsonl"
 RESULTS_PATH = EVAL_DIR / "results.jsonl"
 CHAT_URL = "http://127.0.0.1:8000/chat"
+BATCH_URL = "http://127.0.0.1:8000/chat/batch"
 
 INDEXED_QUOTE_RE = re.compile(r'Quote:\s*"([^"]+)"\s*\[(\d+)\]', re.IGNORECASE)
 
@@ -62,7 +68,7 @@ def call_chat(question: str) -> dict:
     try:
         resp = requests.post(
             CHAT_URL,
-            json={"question": question},
+            json={"question": question, "include_timings": True},
             headers={"Content-Type": "application/json"},
             timeout=60,
         )
@@ -77,6 +83,46 @@ def call_chat(question: str) -> dict:
         raise SystemExit(f"Error calling /chat: {e}") from e
 
 
+def call_chat_batch(questions: list[str]) -> list[dict]:
+    """Call the /chat/batch endpoint. Returns one /chat result per question, in order."""
+    try:
+        resp = requests.post(
+            BATCH_URL,
+            json={"questions": questions},
+            headers={"Content-Type": "application/json"},
+            timeout=300,
+        )
+        resp.raise_for_status()
+        return resp.json()["results"]
+    except requests.exceptions.ConnectionError as e:
+        raise SystemExit(
+            f"Error: Cannot connect to server at {BATCH_URL}. "
+            "Ensure the server is running: uvicorn app.main:app --reload"
+        ) from e
+    except requests.exceptions.RequestException as e:
+        raise SystemExit(f"Error calling /chat/batch: {e}") from e
+
+
+def stage_report(results: list[dict]) -> list[str]:
+    """Per-stage p50/p95 (ms) and cache hit counts from the results' `timings` breakdowns."""
+    by_stage: dict[str, list[float]] = {}
+    hits: dict[str, list[int]] = {}
+    for result in results:
+        for t in result.get("timings") or []:
+            by_stage.setdefault(t["stage"], []).append(t["ms"])
+            if t.get("cache"):
+                counts = hits.setdefault(t["stage"], [0, 0])
+                counts[0 if t["cache"] == "hit" else 1] += 1
+    lines = []
+    for stage, values in by_stage.items():
+        line = (f"  {stage:<22} n={len(values):<4} p50 {np.percentile(values, 50):8.1f} ms"
+                f"   p95 {np.percentile(values, 95):8.1f} ms")
+        if stage in hits:
+            line += f"   hit/miss {hits[stage][0]}/{hits[stage][1]}"
+        lines.append(line)
+    return lines
+
+
 def _word_count(text: str) -> int:
     """Count words (length >= 1)."""
     return len(re.findall(r"\b\w+\b", text))
@@ -134,8 +180,8 @@ def score_unanswerable(result: dict) -> tuple[bool, bool]:
     return ok, ok
 
 
-def run_eval(overwrite: bool = False) -> None:
-    """Run evaluation and append results to results.jsonl."""
+def run_eval(overwrite: bool = False, batch_size: int = 0) -> None:
+    """Run evaluation and append results to results.jsonl. batch_size > 0 sends questions via /chat/batch."""
     questions = load_questions()
     if not questions:
         raise SystemExit(f"No questions found in {QUESTIONS_PATH}")
@@ -143,22 +189,37 @@ def run_eval(overwrite: bool = False) -> None:
     if overwrite:
         RESULTS_PATH.write_text("", encoding="utf-8")
 
-    print(f"Evaluating {len(questions)} questions against {CHAT_URL}...")
+    batch_results: list[dict] = []
+    batch_walls: list[float] = []  # wall time of each /chat/batch call, ms
+    batch_ms: list[float] = []  # per question: wall time of its batch
+    wall_start = time.perf_counter()
+    if batch_size > 0:
+        print(f"Evaluating {len(questions)} questions against {BATCH_URL} (batches of {batch_size})...")
+        for b in range(0, len(questions), batch_size):
+            batch = questions[b:b + batch_size]
+            start = time.perf_counter()
+            batch_results.extend(call_chat_batch([q.get("question", "") for q in batch]))
+            batch_walls.append((time.perf_counter() - start) * 1000)
+            batch_ms.extend([batch_walls[-1]] * len(batch))
+    else:
+        print(f"Evaluating {len(questions)} questions against {CHAT_URL}...")
 
     grounded_ok_count = 0
     citation_ok_count = 0
     latencies = []
+    results = []
 
     for i, q in enumerate(questions):
         qid = q.get("id", f"q{i+1:02d}")
         qtype = q.get("type", "answerable")
         question = q.get("question", "")
 
-        result = call_chat(question)
+        result = batch_results[i] if batch_results else call_chat(question)
         answer = result.get("answer", "")
         citations = result.get("citations", [])
         snippets = result.get("snippets", [])
         latency_ms = result.get("latency_ms", 0)
+        results.append(result)
 
         if qtype == "answerable":
             grounded_ok, citation_ok = score_answerable(result)
@@ -185,6 +246,7 @@ def run_eval(overwrite: bool = False) -> None:
             "citations": citations_data,
             "snippets": snippets,
             "latency_ms": latency_ms,
+            **({"batch_ms": round(batch_ms[i])} if batch_ms else {}),
             "grounded_ok": grounded_ok,
             "citation_ok": citation_ok,
             "timestamp": datetime.now(timezone.utc).isoformat(),
@@ -194,7 +256,9 @@ def run_eval(overwrite: bool = False) -> None:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
         status = "OK" if (grounded_ok and citation_ok) else ("WARN" if grounded_ok else "X")
-        print(f"  [{i+1}/{len(questions)}] {qid} {status} ({latency_ms}ms)")
+        print(f"  [{i+1}/{len(questions)}] {qid} {status} ({latency_ms}ms{' in batch' if batch_ms else ''})")
+
+    wall_s = time.perf_counter() - wall_start
 
     # Metrics
     total = len(questions)
@@ -208,8 +272,21 @@ def run_eval(overwrite: bool = False) -> None:
     print(f"Total questions: {total}")
     print(f"Groundedness: {groundedness_pct:.1f}%")
     print(f"Citation accuracy: {citation_accuracy_pct:.1f}%")
-    print(f"Latency p50: {latency_p50:.0f} ms")
-    print(f"Latency p95: {latency_p95:.0f} ms")
+    if batch_size > 0:
+        print(f"Batch wall time p50: {float(np.percentile(batch_walls, 50)):.0f} ms ({len(batch_walls)} batches)")
+        print(f"Batch wall time p95: {float(np.percentile(batch_walls, 95)):.0f} ms")
+        print(f"Time to completion within batch p50: {latency_p50:.0f} ms")
+        print(f"Time to completion within batch p95: {latency_p95:.0f} ms")
+    else:
+        print(f"Latency p50: {latency_p50:.0f} ms")
+        print(f"Latency p95: {latency_p95:.0f} ms")
+    print(f"Wall time: {wall_s:.1f} s")
+    stages = stage_report(results)
+    if stages:
+        print("Stages:")
+        print("\n".join(stages))
+    elif batch_size > 0:
+        print("Stages: not reported per question for /chat/batch (see /metrics)")
     print(f"\nResults appended to {RESULTS_PATH}")
 
 
@@ -220,8 +297,15 @@ def main() -> None:
         action="store_true",
         help="Overwrite eval/results.jsonl before writing this run",
     )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Send questions N at a time to /chat/batch instead of one /chat call each",
+    )
     args = parser.parse_args()
-    run_eval(overwrite=args.overwrite)
+    run_eval(overwrite=args.overwrite, batch_size=args.batch)
 
 
 if __name__ == "__main__":
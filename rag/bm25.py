@@ -0,0 +1,202 @@
+"""
+BM25 keyword index over every chunk, built at ingest time.
+Stored next to the vector index as bm25.npz: a term dictionary plus flat postings
+(row, term frequency), so a lookup is a few array slices and one bincount.
+The file also records the digest of the ingest manifest it was built from, so
+rag.ingest can tell a BM25 index left behind by an interrupted run.
+"""
+
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+BM25_FILE_NAME = "bm25.npz"
+BM25_FORMAT_VERSION = 1
+
+# Standard Okapi BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens. Numbers are kept (day counts, form numbers); IDF handles stopwords."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index with precomputed per-posting BM25 weights."""
+
+    def __init__(
+        self,
+        ids: list[str],
+        terms: list[str],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        version: tuple | None = None,
+        source_digest: str | None = None,
+    ):
+        self.ids = ids
+        self.terms = terms
+        self.term_index = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.version = version
+        # Digest of the ingest manifest this index was built from (None if unknown)
+        self.source_digest = source_digest
+        n = len(ids)
+        avgdl = float(doc_len.mean()) if n else 0.0
+        df = np.diff(offsets).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        posting_idf = np.repeat(idf, np.diff(offsets))
+        dl = doc_len[rows].astype(np.float32)
+        norm = K1 * (1 - B + B * dl / avgdl) if avgdl else np.full_like(dl, K1)
+        tf = tfs.astype(np.float32)
+        self.weights = posting_idf * tf * (K1 + 1) / (tf + norm)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: list[str], texts, source_digest: str | None = None) -> "BM25Index":
+        """Build from chunk ids and texts (row i of the index is ids[i])."""
+        postings: dict[str, list[tuple[int, int]]] = {}
+        doc_len = np.zeros(len(ids), dtype=np.int32)
+        for row, text in enumerate(texts):
+            counts: dict[str, int] = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            doc_len[row] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[t]) for t in terms])
+        rows = np.fromiter((r for t in terms for r, _ in postings[t]), dtype=np.int32, count=int(offsets[-1]))
+        tfs = np.fromiter((f for t in terms for _, f in postings[t]), dtype=np.int32, count=int(offsets[-1]))
+        return cls(list(ids), terms, offsets, rows, tfs, doc_len, source_digest=source_digest)
+
+    def save(self, path: str | Path) -> None:
+        """Write atomically to path (temp file + rename)."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                format_version=np.array(BM25_FORMAT_VERSION),
+                ids=np.array(self.ids, dtype=str),
+                terms=np.array(self.terms, dtype=str),
+                offsets=self.offsets,
+                rows=self.rows,
+                tfs=self.tfs,
+                doc_len=self.doc_len,
+                source_digest=np.array(self.source_digest or ""),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "BM25Index":
+        """Load an index written by save()."""
+        path = Path(path)
+        st = path.stat()
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format_version"]) != BM25_FORMAT_VERSION:
+                raise ValueError(f"Unsupported BM25 index version {int(data['format_version'])} in {path}")
+            return cls(
+                ids=data["ids"].tolist(),
+                terms=data["terms"].tolist(),
+                offsets=data["offsets"],
+                rows=data["rows"],
+                tfs=data["tfs"],
+                doc_len=data["doc_len"],
+                version=(st.st_mtime_ns, st.st_size),
+                source_digest=_source_digest(data),
+            )
+
+    def search(self, query: str, k: int, terms=None) -> list[tuple[int, float]]:
+        """
+        Top-k rows by BM25 score for query. Returns [(row, score)] best first, score > 0 only.
+        Pass terms (the set of tokenize(query)) if the caller already has them.
+        """
+        spans = []
+        for term in set(tokenize(query)) if terms is None else terms:
+            i = self.term_index.get(term)
+            if i is not None:
+                spans.append((int(self.offsets[i]), int(self.offsets[i + 1])))
+        if not spans or k <= 0:
+            return []
+        rows = np.concatenate([self.rows[s:e] for s, e in spans])
+        weights = np.concatenate([self.weights[s:e] for s, e in spans])
+        scores = np.bincount(rows, weights=weights, minlength=len(self.ids))
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(row), float(scores[row])) for row in hits]
+
+
+def _source_digest(data) -> str | None:
+    """Stored manifest digest of an open bm25.npz (None for files written before it was recorded)."""
+    if "source_digest" not in data.files:
+        return None
+    return str(data["source_digest"]) or None
+
+
+def read_source_digest(persist_dir: str | Path) -> str | None:
+    """Manifest digest recorded in persist_dir's BM25 index, without loading the postings."""
+    try:
+        with np.load(Path(persist_dir) / BM25_FILE_NAME, allow_pickle=False) as data:
+            return _source_digest(data)
+    except (OSError, ValueError):
+        return None
+
+
+def write_bm25(persist_dir: str | Path, ids: list[str], texts, source_digest: str | None = None) -> BM25Index:
+    """Build the BM25 index for a collection snapshot and save it under persist_dir."""
+    index = BM25Index.build(ids, texts, source_digest=source_digest)
+    index.save(Path(persist_dir) / BM25_FILE_NAME)
+    return index
+
+
+_indexes: dict[str, BM25Index] = {}
+_lock = threading.Lock()
+
+
+def get_bm25_index(persist_dir: str | Path) -> BM25Index | None:
+    """
+    Shared in-process BM25 index for persist_dir, reloaded when the file changes.
+    None if the index was built before BM25 support (re-run python -m rag.ingest).
+    """
+    path = Path(persist_dir) / BM25_FILE_NAME
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    key = str(path.resolve())
+    index = _indexes.get(key)
+    if index is not None and index.version == (st.st_mtime_ns, st.st_size):
+        return index
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None and index.version == (st.st_mtime_ns, st.st_size):
+            return index
+        index = BM25Index.load(path)
+        _indexes[key] = index
+    logging.info(f"Loaded BM25 index: {len(index)} chunks, {len(index.terms)} terms")
+    return index
+
+
+def clear_indexes() -> None:
+    """Drop every loaded BM25 index (next lookup reloads from disk)."""
+    with _lock:
+        _indexes.clear()
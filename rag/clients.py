@@ -0,0 +1,119 @@
+"""
+Shared OpenAI clients: one sync and one async client per process, each with a
+keep-alive connection pool, instead of a new client (and TLS setup) per call.
+Created at app startup, closed at shutdown; created on first use elsewhere.
+The openai SDK (about half a second to import) is only imported with the first
+client, so importing this module stays cheap.
+
+Settings (env):
+  RAG_OPENAI_MAX_CONNECTIONS   pool size per client (default 100)
+  RAG_OPENAI_MAX_KEEPALIVE     idle keep-alive connections kept open (default 20)
+  RAG_OPENAI_TIMEOUT_S         request timeout in seconds (default 30)
+  RAG_OPENAI_MAX_RETRIES       SDK retries on 429/5xx/connection errors (default 2)
+"""
+
+import asyncio
+import os
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+MAX_CONNECTIONS = int(os.environ.get("RAG_OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.environ.get("RAG_OPENAI_MAX_KEEPALIVE", "20"))
+TIMEOUT_S = float(os.environ.get("RAG_OPENAI_TIMEOUT_S", "30"))
+MAX_RETRIES = int(os.environ.get("RAG_OPENAI_MAX_RETRIES", "2"))
+
+_client: "OpenAI | None" = None
+_async_client: "AsyncOpenAI | None" = None
+_async_loop: asyncio.AbstractEventLoop | None = None
+_lock = threading.Lock()
+
+
+def _limits():
+    import httpx
+    import openai
+
+    # Newer SDK releases ship their own httpx build; pool limits must come from it
+    http = getattr(openai, "_httpx", httpx)
+    return http.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE)
+
+
+def get_client() -> "OpenAI":
+    """Process-wide sync OpenAI client (thread-safe; the pool is shared by all threads)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import openai
+                from openai import OpenAI
+
+                _client = OpenAI(
+                    timeout=TIMEOUT_S,
+                    max_retries=MAX_RETRIES,
+                    http_client=openai.DefaultHttpxClient(limits=_limits(), timeout=TIMEOUT_S),
+                )
+    return _client
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    Process-wide async OpenAI client. Connections belong to an event loop, so a
+    new client is made if called from a different loop than the current one
+    (only happens outside the app, e.g. repeated asyncio.run in scripts); the
+    replaced client is closed on its own loop if that loop is still running.
+    """
+    global _async_client, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        with _lock:
+            if _async_client is None or _async_loop is not loop:
+                import openai
+                from openai import AsyncOpenAI
+
+                replaced, replaced_loop = _async_client, _async_loop
+                _async_client = AsyncOpenAI(
+                    timeout=TIMEOUT_S,
+                    max_retries=MAX_RETRIES,
+                    http_client=openai.DefaultAsyncHttpxClient(limits=_limits(), timeout=TIMEOUT_S),
+                )
+                _async_loop = loop
+                _close_on_loop(replaced, replaced_loop)
+    return _async_client
+
+
+def _close_on_loop(client: "AsyncOpenAI | None", loop: asyncio.AbstractEventLoop | None) -> None:
+    """
+    Close an async client on the loop its connections belong to. A closed (or
+    stopped) loop has nothing left to run the close on; its sockets are released
+    when the client is garbage collected.
+    """
+    if client is not None and loop is not None and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.close(), loop)
+
+
+async def startup() -> None:
+    """
+    Create both clients up front so the first request does not pay for setup.
+    The SDK import runs in a worker thread so the event loop keeps serving meanwhile.
+    """
+    if os.environ.get("OPENAI_API_KEY"):
+        await asyncio.to_thread(get_client)
+        get_async_client()
+
+
+async def shutdown() -> None:
+    """Close both clients and their connection pools."""
+    global _client, _async_client, _async_loop
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+    with _lock:
+        async_client, loop = _async_client, _async_loop
+        _async_client, _async_loop = None, None
+    if async_client is not None and loop is asyncio.get_running_loop():
+        await async_client.close()
+    else:
+        _close_on_loop(async_client, loop)
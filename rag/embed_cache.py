@@ -0,0 +1,244 @@
+"""
+Persistent, content-addressed embedding cache shared by ingest and retrieval.
+Entries are keyed by (model, sha256(text)) and stored as float32 blobs in SQLite.
+The cache is size-bounded: least recently used entries are evicted past max_entries.
+Inserts keep a running row count instead of counting the table; it is recounted
+exactly when it passes max_entries and every RECOUNT_INSERTS inserts, which also
+picks up rows other processes added.
+Hits do not write: their last_used times are buffered in memory and written in
+one batch every TOUCH_FLUSH_S seconds or TOUCH_FLUSH_ENTRIES hits, and before eviction.
+Vectors are returned as float32 values whether or not they came from the cache,
+so a text embeds identically in every cache state.
+Disable with RAG_EMBED_CACHE=0; RAG_EMBED_CACHE_PATH moves the SQLite file.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "data" / "cache" / "embeddings.sqlite"
+MAX_ENTRIES = int(os.environ.get("RAG_EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+# Evict down to this fraction of max_entries so eviction doesn't run on every insert
+EVICT_TO_FRACTION = 0.9
+
+# Inserts between exact row counts (the running count misses other processes' inserts)
+RECOUNT_INSERTS = 1000
+
+# Buffered last_used updates from cache hits are written when either limit is reached
+TOUCH_FLUSH_S = 60.0
+TOUCH_FLUSH_ENTRIES = 512
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+)
+"""
+
+
+def text_key(text: str) -> str:
+    """Content hash used as the cache key for a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store. Safe to share across threads and processes."""
+
+    def __init__(self, path: str | Path = DEFAULT_CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        # (model, text_hash) -> last hit time, not yet written
+        self._touched: dict[tuple[str, str], float] = {}
+        self._touched_since = time.monotonic()
+        # Upper bound on the row count (replaced rows are counted as new)
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._inserts_since_count = 0
+
+    def _flush_touches(self) -> None:
+        """Write buffered last_used times (caller holds the lock and commits)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(used, model, h) for (model, h), used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_since = time.monotonic()
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        """Look up texts; returns a vector or None per text, in input order."""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                batch = unique[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._touched.update(((model, h), now) for h in found)
+                if (
+                    len(self._touched) >= TOUCH_FLUSH_ENTRIES
+                    or time.monotonic() - self._touched_since >= TOUCH_FLUSH_S
+                ):
+                    self._flush_touches()
+                    self._conn.commit()
+        return [
+            np.frombuffer(found[k], dtype=np.float32).tolist() if k in found else None
+            for k in keys
+        ]
+
+    def flush(self) -> None:
+        """Write buffered last_used times now."""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store vectors for texts, then evict least recently used entries if over capacity."""
+        now = time.time()
+        rows = [
+            (model, text_key(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._count += len(rows)
+            self._inserts_since_count += len(rows)
+            if self._count > self.max_entries or self._inserts_since_count >= RECOUNT_INSERTS:
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                self._inserts_since_count = 0
+            count = self._count
+            if count > self.max_entries:
+                # Recent hits must count before choosing what to evict
+                self._flush_touches()
+                keep = int(self.max_entries * EVICT_TO_FRACTION)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC, rowid ASC LIMIT ?)",
+                    (count - keep,),
+                )
+                self._count = keep
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
+
+
+# Process-wide cache (lazy)
+_cache = None
+
+
+def get_cache() -> EmbeddingCache | None:
+    """Shared cache instance, or None when disabled via RAG_EMBED_CACHE=0."""
+    global _cache
+    if os.environ.get("RAG_EMBED_CACHE", "1").lower() in ("0", "false", "off"):
+        return None
+    if _cache is None:
+        _cache = EmbeddingCache(os.environ.get("RAG_EMBED_CACHE_PATH", DEFAULT_CACHE_PATH))
+    return _cache
+
+
+def _as_float32(vectors: list[list[float]]) -> list[list[float]]:
+    """Vectors rounded to float32 values, as the cache stores and returns them."""
+    return np.asarray(vectors, dtype=np.float32).tolist() if len(vectors) else []
+
+
+def _count(stats: dict | None, hits: int, misses: int) -> None:
+    if stats is not None:
+        stats["hits"] = stats.get("hits", 0) + hits
+        stats["misses"] = stats.get("misses", 0) + misses
+
+
+def cached_embed(
+    texts: list[str],
+    model: str,
+    embed_fn: Callable[[list[str]], list[list[float]]],
+    cache: EmbeddingCache | None = None,
+    stats: dict | None = None,
+) -> list[list[float]]:
+    """
+    Read-through embedding: serve hits from the cache and call embed_fn once
+    with the unique misses. Returns float32-valued vectors in input order.
+    If stats is given, its "hits" and "misses" counts are incremented.
+    """
+    cache = cache if cache is not None else get_cache()
+    if cache is None:
+        _count(stats, 0, len(texts))
+        return _as_float32(embed_fn(texts))
+
+    vectors = cache.get_many(model, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    # Per input text: a repeat of an uncached text is a miss too
+    misses = sum(1 for v in vectors if v is None)
+    _count(stats, len(texts) - misses, misses)
+    if missing:
+        fresh = _as_float32(embed_fn(missing))
+        cache.put_many(model, missing, fresh)
+        by_text = dict(zip(missing, fresh))
+        vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+    return vectors
+
+
+async def acached_embed(
+    texts: list[str],
+    model: str,
+    embed_fn: Callable[[list[str]], Awaitable[list[list[float]]]],
+    cache: EmbeddingCache | None = None,
+    stats: dict | None = None,
+) -> list[list[float]]:
+    """
+    Async cached_embed: embed_fn is awaited, and SQLite reads/writes run in a
+    worker thread so the event loop never blocks on the cache.
+    """
+    cache = cache if cache is not None else get_cache()
+    if cache is None:
+        _count(stats, 0, len(texts))
+        return _as_float32(await embed_fn(texts))
+
+    vectors = await asyncio.to_thread(cache.get_many, model, texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    # Per input text: a repeat of an uncached text is a miss too
+    misses = sum(1 for v in vectors if v is None)
+    _count(stats, len(texts) - misses, misses)
+    if missing:
+        fresh = _as_float32(await embed_fn(missing))
+        await asyncio.to_thread(cache.put_many, model, missing, fresh)
+        by_text = dict(zip(missing, fresh))
+        vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+    return vectors
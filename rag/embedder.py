@@ -0,0 +1,194 @@
+"""
+Concurrent, rate-limit-aware batch embedding.
+Batches are sized by token budget, sent with bounded concurrency, retried with
+exponential backoff on 429/5xx/connection errors, and returned in input order.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
+
+from rag.clients import get_client
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+EMBED_MODEL = "text-embedding-3-small"
+
+# Batching: OpenAI allows 2048 inputs and 300k tokens per request; stay well below
+MAX_BATCH_TOKENS = 20_000
+MAX_BATCH_ITEMS = 512
+
+# Concurrency and retry policy
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 6
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 30.0
+
+
+def _approx_tokens(text: str) -> int:
+    """Cheap upper-bound token estimate (~3 chars/token) when no tokenizer is supplied."""
+    return len(text) // 3 + 1
+
+
+def make_batches(
+    token_counts: list[int],
+    max_batch_tokens: int = MAX_BATCH_TOKENS,
+    max_batch_items: int = MAX_BATCH_ITEMS,
+) -> list[list[int]]:
+    """
+    Group consecutive input indices into batches under the token and item budgets.
+    An input larger than max_batch_tokens gets a batch of its own.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for i, n in enumerate(token_counts):
+        if current and (current_tokens + n > max_batch_tokens or len(current) >= max_batch_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """429s, 5xx, timeouts and dropped connections are worth retrying."""
+    import openai
+
+    if isinstance(exc, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def _retry_after_s(exc: Exception) -> float | None:
+    """Server-suggested wait from a Retry-After header, if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class EmbeddingStats:
+    """Cumulative throughput counters for an EmbeddingExecutor."""
+
+    def __init__(self):
+        self.texts = 0
+        self.tokens = 0
+        self.requests = 0
+        self.retries = 0
+        self.elapsed_s = 0.0
+
+    @property
+    def texts_per_s(self) -> float:
+        return self.texts / self.elapsed_s if self.elapsed_s else 0.0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.tokens / self.elapsed_s if self.elapsed_s else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "texts": self.texts,
+            "tokens": self.tokens,
+            "requests": self.requests,
+            "retries": self.retries,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "texts_per_s": round(self.texts_per_s, 1),
+            "tokens_per_s": round(self.tokens_per_s, 1),
+        }
+
+
+class EmbeddingExecutor:
+    """
+    Embeds lists of texts through a bounded pool of concurrent requests.
+    Usage: EmbeddingExecutor().embed(texts) -> vectors in input order.
+    """
+
+    def __init__(
+        self,
+        model: str = EMBED_MODEL,
+        client: "OpenAI | None" = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_items: int = MAX_BATCH_ITEMS,
+        max_retries: int = MAX_RETRIES,
+        count_tokens: Callable[[str], int] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.model = model
+        # Retries are handled here so backoff is shared across the whole pool;
+        # the shared client's connection pool is reused, only its retry policy differs
+        self.client = client if client is not None else get_client().with_options(max_retries=0)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_retries = max_retries
+        self.count_tokens = count_tokens or _approx_tokens
+        self.stats = EmbeddingStats()
+        self._sleep = sleep
+        self._stats_lock = threading.Lock()
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed one batch, retrying retryable errors with exponential backoff and jitter."""
+        attempt = 0
+        while True:
+            try:
+                resp = self.client.embeddings.create(model=self.model, input=texts)
+                with self._stats_lock:
+                    self.stats.requests += 1
+                data = sorted(resp.data, key=lambda item: item.index)
+                return [item.embedding for item in data]
+            except Exception as exc:
+                if attempt >= self.max_retries or not _is_retryable(exc):
+                    raise
+                delay = _retry_after_s(exc)
+                if delay is None:
+                    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** attempt))
+                    delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                with self._stats_lock:
+                    self.stats.retries += 1
+                logging.warning(
+                    f"Embedding request failed ({type(exc).__name__}); "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                self._sleep(delay)
+
+    def embed(self, texts: list[str], token_counts: list[int] | None = None) -> list[list[float]]:
+        """Embed texts concurrently. Returns one vector per text, in input order."""
+        if not texts:
+            return []
+        if token_counts is None:
+            token_counts = [self.count_tokens(t) for t in texts]
+        batches = make_batches(token_counts, self.max_batch_tokens, self.max_batch_items)
+
+        start = time.perf_counter()
+        results: list[list[float] | None] = [None] * len(texts)
+        workers = min(self.max_concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (batch, pool.submit(self._embed_batch, [texts[i] for i in batch]))
+                for batch in batches
+            ]
+            for batch, future in futures:
+                for i, vector in zip(batch, future.result()):
+                    results[i] = vector
+
+        with self._stats_lock:
+            self.stats.texts += len(texts)
+            self.stats.tokens += sum(token_counts)
+            self.stats.elapsed_s += time.perf_counter() - start
+        return results
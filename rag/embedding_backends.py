@@ -0,0 +1,173 @@
+"""
+Embedding backends shared by rag.ingest and rag.retriever, chosen with RAG_EMBED_BACKEND:
+  openai  text-embedding-3-small through the OpenAI API (default)
+  local   hashed word and character n-gram counts projected to LOCAL_EMBED_DIM
+          dimensions: CPU only, no network, no model files, ~0.1 ms per question
+A backend's model_id names its embedding space. Ingest records it in the index
+(manifest, export meta.json, Chroma collection metadata) and retrieval refuses to
+search an index built with a different one, so two spaces are never compared.
+"""
+
+import abc
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Callable
+
+import numpy as np
+
+from rag.clients import get_async_client, get_client
+from rag.embedder import EMBED_MODEL, MAX_CONCURRENCY, EmbeddingExecutor
+
+EMBED_BACKEND = os.environ.get("RAG_EMBED_BACKEND", "openai")
+LOCAL_EMBED_DIM = int(os.environ.get("RAG_LOCAL_EMBED_DIM", "512"))
+# Hashed features spread distances higher than learned embeddings. Fitted with
+# eval.calibrate_refusal on eval/refusal_calibration.jsonl (held out from the eval
+# questions); answerable and unanswerable questions overlap, so tune it per corpus
+LOCAL_REFUSE_DISTANCE = float(os.environ.get("RAG_LOCAL_REFUSE_DISTANCE", "1.55"))
+
+# Local backend features: words, adjacent word pairs, and character n-grams of each
+# word (so "approve" and "approval" share dimensions); weights per feature kind
+LOCAL_CHAR_NGRAMS = (3, 4)
+LOCAL_WEIGHTS = {"w": 1.0, "b": 0.5, "c": 0.25}
+_WORD_RE = re.compile(r"\w+")
+
+
+class EmbeddingBackend(abc.ABC):
+    """Turns texts into vectors. model_id identifies the embedding space."""
+
+    model_id: str = ""
+    # Needs OPENAI_API_KEY (ingest refuses to start without it)
+    needs_api_key = False
+    # Slow or billed enough to be worth the on-disk embedding cache
+    cacheable = False
+    # Best-hit distance above which retrieval refuses (None: rag.retriever's default)
+    refuse_distance: float | None = None
+
+    @abc.abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """One vector per text, in order."""
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        """embed() for async callers."""
+        return self.embed(texts)
+
+    def warm_up(self) -> None:
+        """One-time setup the first embed() would otherwise pay for (app startup)."""
+        self.embed(["warm up"])
+
+    def embed_documents(
+        self,
+        texts: list[str],
+        max_concurrency: int = MAX_CONCURRENCY,
+        token_counts: list[int] | None = None,
+        count_tokens: Callable[[str], int] | None = None,
+    ) -> list[list[float]]:
+        """Bulk embedding for ingest; batching hints are ignored by local backends."""
+        return self.embed(texts)
+
+
+class OpenAIBackend(EmbeddingBackend):
+    """OpenAI embeddings API through the shared pooled clients (rag.clients)."""
+
+    needs_api_key = True
+    cacheable = True
+
+    def __init__(self, model: str = EMBED_MODEL):
+        # Same id the index and embedding cache used before backends existed
+        self.model_id = model
+
+    @staticmethod
+    def _check_api_key() -> None:
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise ValueError("OPENAI_API_KEY must be set for OpenAI embeddings")
+
+    def warm_up(self) -> None:
+        """Import the SDK and create the shared client; no request is sent."""
+        if os.environ.get("OPENAI_API_KEY"):
+            get_client()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts in a single request."""
+        self._check_api_key()
+        resp = get_client().embeddings.create(model=self.model_id, input=texts)
+        return [item.embedding for item in resp.data]
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with the async client in a single request."""
+        self._check_api_key()
+        resp = await get_async_client().embeddings.create(model=self.model_id, input=texts)
+        return [item.embedding for item in resp.data]
+
+    def embed_documents(
+        self,
+        texts: list[str],
+        max_concurrency: int = MAX_CONCURRENCY,
+        token_counts: list[int] | None = None,
+        count_tokens: Callable[[str], int] | None = None,
+    ) -> list[list[float]]:
+        """Token-budget batches in parallel, with retries (rag.embedder)."""
+        executor = EmbeddingExecutor(model=self.model_id, max_concurrency=max_concurrency, count_tokens=count_tokens)
+        embeddings = executor.embed(texts, token_counts=token_counts)
+        logging.info(f"Embedding stats: {executor.stats.as_dict()}")
+        return embeddings
+
+
+class LocalHashingBackend(EmbeddingBackend):
+    """
+    Feature hashing: every word, word pair and word character n-gram is hashed (crc32)
+    to a dimension and a sign, counts are damped (1 + log tf) and weighted by kind,
+    and the vector is L2-normalized. Deterministic across processes and platforms.
+    """
+
+    refuse_distance = LOCAL_REFUSE_DISTANCE
+
+    def __init__(self, dim: int = LOCAL_EMBED_DIM):
+        self.dim = dim
+        self.model_id = f"local-hash-v1-d{dim}"
+
+    @staticmethod
+    def features(text: str) -> Counter:
+        words = _WORD_RE.findall(text.lower())
+        feats = Counter(f"w {w}" for w in words)
+        feats.update(f"b {a} {b}" for a, b in zip(words, words[1:]))
+        for w in words:
+            padded = f"<{w}>"
+            for n in LOCAL_CHAR_NGRAMS:
+                feats.update(f"c {padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return feats
+
+    def embed_one(self, text: str) -> np.ndarray:
+        feats = self.features(text)
+        if not feats:
+            return np.zeros(self.dim, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.uint32, count=len(feats))
+        weights = np.fromiter(
+            (LOCAL_WEIGHTS[f[0]] * (1.0 + math.log(tf)) for f, tf in feats.items()), dtype=np.float64, count=len(feats)
+        )
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+        vec = np.bincount(hashes % self.dim, weights=weights * signs, minlength=self.dim)
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).astype(np.float32)
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_one(t).tolist() for t in texts]
+
+
+BACKENDS: dict[str, type[EmbeddingBackend]] = {"openai": OpenAIBackend, "local": LocalHashingBackend}
+
+_backends: dict[str, EmbeddingBackend] = {}
+
+
+def get_backend(name: str | None = None) -> EmbeddingBackend:
+    """Shared backend instance for name (default: RAG_EMBED_BACKEND)."""
+    name = name or EMBED_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend {name!r}; expected one of {', '.join(BACKENDS)}")
+        backend = _backends[name] = BACKENDS[name]()
+    return backend
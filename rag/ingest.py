@@ -1,30 +1,64 @@
 """
 Policy document ingestion pipeline: load, chunk, embed, and persist to Chroma.
-Run: python -m rag.ingest [--rebuild] [--chunk-tokens N] [--overlap-tokens N]
+Run: python -m rag.ingest [--rebuild] [--chunk-mode window|structure] [--chunk-tokens N] [--overlap-tokens N] [--workers N]
+                          [--embed-concurrency N] [--window-chunks N] [--export-dtype float32|float16|int8|none]
+                          [--embed-backend openai|local]
+
+Runs are incremental: a manifest of per-file content hashes and chunking
+parameters is kept next to the index, and only new or changed files are
+re-chunked, re-embedded and upserted. Chunks of removed files, and of files that
+now fail extraction, are deleted.
+
+Documents stream through load -> chunk -> embed -> upsert in bounded windows,
+and the manifest is saved after every window, so it doubles as a checkpoint:
+after a crash, re-running (without --rebuild) resumes with the files not yet indexed.
+
+After indexing, the collection is also exported to a compact memory-mappable
+format (see rag.vector_index) that the retriever can serve from without Chroma,
+and a BM25 inverted index over every chunk is rebuilt (see rag.bm25).
 """
 
 import argparse
+import bisect
+import hashlib
+import itertools
+import json
 import logging
+import multiprocessing
 import os
 import re
 import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Iterator
 
 import chromadb
+from chromadb.api.client import SharedSystemClient
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from openai import OpenAI
 from pypdf import PdfReader
 import tiktoken
 
+from rag.bm25 import read_source_digest, write_bm25
+from rag.embed_cache import cached_embed
+from rag.embedding_backends import BACKENDS, EmbeddingBackend, get_backend
+from rag.sentences import SENTENCE_SCORING, SENTENCES_KEY, dump_sentence_index
+from rag.vector_index import EXPORT_DIR_NAME, EXPORT_DTYPES, VectorIndex, read_export_meta, write_export
+
 # Default paths
 DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "policies"
-INDEX_DIR = Path(__file__).resolve().parent.parent / "data" / "index"
+INDEX_DIR = Path(os.environ.get("RAG_INDEX_DIR") or Path(__file__).resolve().parent.parent / "data" / "index")
 COLLECTION_NAME = "policies"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
 
 # Chunking defaults
 CHUNK_TOKENS = 300
 OVERLAP_TOKENS = 60
+# "window": fixed token windows with overlap; "structure": pack sections/paragraphs/sentences
+CHUNK_MODES = ("window", "structure")
+CHUNK_MODE = "window"
 
 # File filtering
 ALLOWED_EXTENSIONS = (".md", ".txt", ".html", ".htm", ".pdf")
@@ -34,8 +68,15 @@ EXCLUDED_FILENAMES = frozenset({"README.md", "readme.md"})
 MIN_TEXT_CHARS = 500
 
 # Embedding config
-EMBED_MODEL = "text-embedding-3-small"
-BATCH_SIZE = 100
+EMBED_CONCURRENCY = 4
+
+# Streaming: chunks are embedded and upserted in windows of about this many chunks
+WINDOW_CHUNKS = 256
+# Documents tokenized per tiktoken batch encode (serial extraction)
+ENCODE_BATCH_DOCS = 16
+
+# Vector dtype of the memory-mapped index export ("none" skips the export)
+EXPORT_DTYPE = "float32"
 
 # Tokenizer (cached)
 _tiktoken_enc = None
@@ -65,14 +106,14 @@ def _strip_html(html: str) -> str:
     return text.strip()
 
 
-def load_documents(data_dir: Path) -> tuple[list[dict], int, int]:
+def discover_files(data_dir: Path) -> tuple[list[Path], int]:
     """
-    Load .md, .txt, .html, and .pdf files from data_dir.
+    List policy files in data_dir (sorted by name).
     Skips hidden files/folders and excluded filenames.
-    Returns (docs, discovered_count, ingested_count).
+    Returns (paths, discovered_count).
     """
     data_dir = Path(data_dir)
-    docs = []
+    paths = []
     discovered = 0
 
     for path in sorted(data_dir.iterdir()):
@@ -85,66 +126,411 @@ def load_documents(data_dir: Path) -> tuple[list[dict], int, int]:
         discovered += 1
         if path.name in EXCLUDED_FILENAMES:
             continue
+        paths.append(path)
+
+    return paths, discovered
+
+
+_HTML_BLOCK_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "tr", "pre", "blockquote", "dt", "dd", "caption")
+
+
+def _html_to_structured_text(html: str) -> str:
+    """
+    Extract HTML as Markdown-like text: h1-h6 become '#' headings, and paragraphs,
+    list items and table rows become blank-line separated blocks.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style"]):
+        tag.decompose()
+    blocks = []
+    for el in soup.find_all(_HTML_BLOCK_TAGS):
+        if el.find_parent(_HTML_BLOCK_TAGS):
+            continue  # nested block (e.g. <p> inside <li>) is part of its parent's text
+        if el.name == "tr":
+            text = " | ".join(cell.get_text(" ", strip=True) for cell in el.find_all(["td", "th"]))
+        else:
+            text = el.get_text(" ", strip=True)
+        # get_text(" ") also pads inline tags: "<b>PTO</b>: ..." -> "PTO : ..."
+        text = re.sub(r"\s+([,.;:!?])", r"\1", re.sub(r"\s+", " ", text)).strip()
+        if not text:
+            continue
+        if el.name in ("h1", "h2", "h3", "h4", "h5", "h6"):
+            text = "#" * int(el.name[1]) + " " + text
+        blocks.append(text)
+    return "\n\n".join(blocks) if blocks else _strip_html(html)
+
+
+def extract_document(path: Path, structured: bool = False) -> dict:
+    """
+    Extract a .md, .txt, .html, or .pdf file into {"filename", "text", "pages"}.
+    pages is a list of (char_offset, page_number) for PDFs, else [].
+    structured=True keeps HTML headings/blocks and separates PDF pages with blank lines.
+    """
+    path = Path(path)
+    pages = []
+    if path.suffix in (".html", ".htm"):
+        html = path.read_text(encoding="utf-8")
+        text = _html_to_structured_text(html) if structured else _strip_html(html)
+    elif path.suffix == ".pdf":
+        reader = PdfReader(path)
+        separator = "\n\n" if structured else "\n"
+        page_texts = []
+        offset = 0
+        for page_number, page in enumerate(reader.pages, start=1):
+            extracted = page.extract_text()
+            if extracted:
+                pages.append((offset, page_number))
+                page_texts.append(extracted)
+                offset += len(extracted) + len(separator)
+        text = separator.join(page_texts)
+    else:
+        text = path.read_text(encoding="utf-8")
+    return {"filename": path.name, "text": text, "pages": pages}
+
 
-        if path.suffix in (".md", ".txt"):
-            text = path.read_text(encoding="utf-8")
-            docs.append({"filename": path.name, "text": text})
-        elif path.suffix in (".html", ".htm"):
-            html = path.read_text(encoding="utf-8")
-            text = _strip_html(html)
-            docs.append({"filename": path.name, "text": text})
-        elif path.suffix == ".pdf":
-            reader = PdfReader(path)
-            page_texts = []
-            for page in reader.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    page_texts.append(extracted)
-            text = "\n".join(page_texts)
-            docs.append({"filename": path.name, "text": text})
+def extract_text(path: Path) -> str:
+    """Extract plain text from a .md, .txt, .html, or .pdf file."""
+    return extract_document(path)["text"]
 
+
+def load_documents(data_dir: Path) -> tuple[list[dict], int, int]:
+    """
+    Load .md, .txt, .html, and .pdf files from data_dir.
+    Skips hidden files/folders and excluded filenames.
+    Returns (docs, discovered_count, ingested_count).
+    """
+    paths, discovered = discover_files(data_dir)
+    docs = list(iter_documents(paths))
     return docs, discovered, len(docs)
 
 
+def iter_documents(paths: Iterable[Path]) -> Iterator[dict]:
+    """Yield {"filename", "text"} one file at a time, so only one document is held in memory."""
+    for path in paths:
+        yield {"filename": path.name, "text": extract_text(path)}
+
+
+def _token_windows(
+    n_tokens: int,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> list[tuple[int, int]]:
+    """(start, end) token index pairs of the overlapping chunk windows."""
+    windows = []
+    start = 0
+    while start < n_tokens:
+        end = start + chunk_tokens
+        windows.append((start, min(end, n_tokens)))
+        start = end - overlap_tokens
+    return windows
+
+
+def _window_bytes(
+    tokens: list[int],
+    windows: list[tuple[int, int]],
+) -> tuple[bytes, dict[int, int]]:
+    """
+    Decode the token array once, segment by segment between window boundaries.
+    Returns (utf-8 bytes of the text, {token index: byte offset}) for every boundary.
+    """
+    enc = _get_encoder()
+    boundaries = sorted({0, len(tokens), *(i for window in windows for i in window)})
+    segments = [enc.decode_bytes(tokens[a:b]) for a, b in zip(boundaries, boundaries[1:])]
+    offsets = dict(zip(boundaries, [0, *itertools.accumulate(len(seg) for seg in segments)]))
+    return b"".join(segments), offsets
+
+
 def chunk_text(
     text: str,
     chunk_tokens: int = CHUNK_TOKENS,
     overlap_tokens: int = OVERLAP_TOKENS,
+    tokens: list[int] | None = None,
 ) -> list[str]:
-    """Split text into token-based chunks with overlap."""
-    enc = _get_encoder()
-    tokens = enc.encode(text)
-    chunks = []
-    start = 0
+    """Split text into token-based chunks with overlap. Pass `tokens` to reuse an existing encoding."""
+    if tokens is None:
+        tokens = _get_encoder().encode(text)
+    windows = _token_windows(len(tokens), chunk_tokens, overlap_tokens)
+    data, offsets = _window_bytes(tokens, windows)
+    # Same bytes and error handling as decoding each window's tokens separately
+    return [
+        data[offsets[start] : offsets[end]].decode("utf-8", errors="replace")
+        for start, end in windows
+    ]
 
-    while start < len(tokens):
-        end = start + chunk_tokens
-        chunk_tok = tokens[start:end]
-        chunk_str = enc.decode(chunk_tok)
-        chunks.append(chunk_str)
-        start = end - overlap_tokens
-        if start >= len(tokens):
-            break
 
-    return chunks
+_HEADING_RE = re.compile(r"^#+\s+(.+)$", re.MULTILINE)
+_HEADING_RE_BYTES = re.compile(rb"^#+\s+(.+)$", re.MULTILINE)
 
 
 def _first_heading(text: str) -> str | None:
     """Extract the first Markdown heading from text."""
-    m = re.search(r"^#+\s+(.+)$", text.strip(), re.MULTILINE)
+    m = _HEADING_RE.search(text.strip())
     return m.group(1).strip() if m else None
 
 
-def _section_in_chunk(chunk_text: str) -> str | None:
-    """Extract the last heading in a chunk (section context)."""
-    matches = list(re.finditer(r"^#+\s+(.+)$", chunk_text, re.MULTILINE))
-    return matches[-1].group(1).strip() if matches else None
+def _chunk_document(
+    doc: dict,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+    tokens: list[int] | None = None,
+    chunk_mode: str = CHUNK_MODE,
+) -> tuple[list[dict], int, int]:
+    """
+    Chunk one document, encoding its text once (or reusing `tokens`).
+    Heading positions are found once over the whole document and looked up by byte
+    offset, so each chunk's section is the last heading fully inside that chunk.
+    chunk_mode="structure" uses _structure_chunks instead (overlap_tokens is ignored).
+    Returns (chunks, extracted_chars, extracted_tokens).
+    """
+    if chunk_mode == "structure":
+        chunks, n_tokens = _structure_chunks(doc, chunk_tokens=chunk_tokens)
+        return chunks, len(doc["text"]), n_tokens
+
+    filename = doc["filename"]
+    text = doc["text"]
+    title = _first_heading(text) or filename
+
+    if tokens is None:
+        tokens = _get_encoder().encode(text)
+    windows = _token_windows(len(tokens), chunk_tokens, overlap_tokens)
+    data, offsets = _window_bytes(tokens, windows)
+    headings = [(m.start(), m.end(), m.group(1)) for m in _HEADING_RE_BYTES.finditer(data)]
+    heading_ends = [end for _, end, _ in headings]
+
+    chunks = []
+    for i, (start, end) in enumerate(windows):
+        b0, b1 = offsets[start], offsets[end]
+        section = None
+        h = bisect.bisect_right(heading_ends, b1) - 1
+        if h >= 0 and headings[h][0] >= b0:
+            section = headings[h][2].decode("utf-8", errors="replace").strip()
+        chunks.append({
+            "doc_id": filename,
+            "title": title,
+            "section": section,
+            "text": data[b0:b1].decode("utf-8", errors="replace"),
+            "chunk_id": i,
+            "tokens": end - start,
+        })
+    return chunks, len(text), len(tokens)
+
+
+_BLOCK_SPLIT_RE = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_HEADING_LINE_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*$")
+
+
+def _structure_units(text: str, chunk_tokens: int) -> list[dict]:
+    """
+    Split text into packable units, each a dict with start/end char offsets, tokens,
+    heading_path and, for heading lines, level/title.
+    Units are headings and blank-line separated blocks; a block over the token budget
+    is split into sentences, and a sentence still over budget into word runs.
+    """
+    # 1) Heading lines and paragraphs (runs of non-heading lines), with offsets into text
+    raw = []
+    block_start = 0
+    for m in itertools.chain(_BLOCK_SPLIT_RE.finditer(text), [None]):
+        block_end = m.start() if m else len(text)
+        para = None
+        line_start = block_start
+        for line in text[block_start:block_end].split("\n"):
+            line_end = line_start + len(line)
+            heading = _HEADING_LINE_RE.match(line)
+            if heading:
+                if para:
+                    raw.append((*para, 0, None))
+                    para = None
+                raw.append((line_start, line_end, len(heading.group(1)), heading.group(2)))
+            elif line.strip():
+                para = (para[0] if para else line_start, line_end)
+            line_start = line_end + 1
+        if para:
+            raw.append((*para, 0, None))
+        block_start = m.end() if m else len(text)
+
+    # 2) Heading paths and token counts
+    units = []
+    stack: list[tuple[int, str]] = []
+    token_counts = [len(t) for t in _encode_batch([text[a:b] for a, b, _, _ in raw])] if raw else []
+    for (start, end, level, title), n_tokens in zip(raw, token_counts):
+        if level:
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, title.strip()))
+        path = [t for _, t in stack]
+        if level or n_tokens <= chunk_tokens:
+            units.append({"start": start, "end": end, "tokens": n_tokens, "heading_path": path,
+                          "level": level, "title": title.strip() if level else None})
+            continue
+        # 3) Oversized block: sentences, then word runs
+        sentences = []
+        s_start = start
+        for sm in _SENTENCE_END_RE.finditer(text, start, end):
+            sentences.append((s_start, sm.start()))
+            s_start = sm.end()
+        sentences.append((s_start, end))
+        sentence_tokens = [len(t) for t in _encode_batch([text[a:b] for a, b in sentences])]
+        for (a, b), n in zip(sentences, sentence_tokens):
+            if n <= chunk_tokens:
+                units.append({"start": a, "end": b, "tokens": n, "heading_path": path, "level": 0, "title": None})
+                continue
+            for run_start, run_end, run_tokens in _word_runs(text, a, b, chunk_tokens):
+                units.append({"start": run_start, "end": run_end, "tokens": run_tokens, "heading_path": path,
+                              "level": 0, "title": None})
+    return units
+
+
+def _word_runs(text: str, start: int, end: int, chunk_tokens: int) -> list[tuple[int, int, int]]:
+    """
+    Split text[start:end] at whitespace into the longest runs of at most chunk_tokens
+    tokens (exact counts, binary search per run). A single word over the budget is a
+    run of its own. Returns [(start, end, tokens)].
+    """
+    words = [(start + m.start(), start + m.end()) for m in re.finditer(r"\S+", text[start:end])]
+    runs = []
+    i = 0
+    while i < len(words):
+        best = (i + 1, count_tokens(text[words[i][0]:words[i][1]]))
+        lo, hi = i + 2, len(words)
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            n = count_tokens(text[words[i][0]:words[mid - 1][1]])
+            if n <= chunk_tokens:
+                best, lo = (mid, n), mid + 1
+            else:
+                hi = mid - 1
+        j, n = best
+        runs.append((words[i][0], words[j - 1][1], n))
+        i = j
+    return runs
+
+
+def _fit_groups(text: str, groups: list[list[dict]], chunk_tokens: int) -> list[tuple[list[dict], int]]:
+    """
+    Exact token count of every packed group's text (separators included). A group
+    over chunk_tokens is re-packed unit by unit against exact counts, so no chunk
+    exceeds the budget unless a single unit does. Returns [(group, tokens)].
+    """
+    counts = [len(t) for t in _encode_batch([text[g[0]["start"]:g[-1]["end"]] for g in groups])] if groups else []
+    fitted = []
+    for group, n in zip(groups, counts):
+        if n <= chunk_tokens or len(group) == 1:
+            fitted.append((group, n))
+            continue
+        current, current_n = [group[0]], group[0]["tokens"]
+        for unit in group[1:]:
+            n = count_tokens(text[current[0]["start"]:unit["end"]])
+            if n > chunk_tokens:
+                fitted.append((current, count_tokens(text[current[0]["start"]:current[-1]["end"]])))
+                current, n = [unit], unit["tokens"]
+            else:
+                current.append(unit)
+            current_n = n
+        fitted.append((current, current_n))
+    return fitted
+
+
+def _page_range(pages: list[tuple[int, int]], start: int, end: int) -> str:
+    """Pages overlapping the char range [start, end), as "3" or "3-4" ("" without page info)."""
+    if not pages:
+        return ""
+    offsets = [offset for offset, _ in pages]
+    first = pages[max(0, bisect.bisect_right(offsets, start) - 1)][1]
+    last = pages[max(0, bisect.bisect_left(offsets, end) - 1)][1]
+    return str(first) if first == last else f"{first}-{last}"
+
+
+def _structure_chunks(doc: dict, chunk_tokens: int = CHUNK_TOKENS) -> tuple[list[dict], int]:
+    """
+    Structure-aware chunking: greedily pack whole sections, then paragraphs, then sentences
+    up to chunk_tokens, without overlap. A heading starts a new chunk unless its whole
+    section still fits, and stays with the body that follows it unless together they
+    are over budget. Chunk text is a verbatim slice of the document, and at most
+    chunk_tokens tokens long (a single word or heading line over budget is kept whole).
+    Returns (chunks, extracted_tokens).
+    """
+    filename = doc["filename"]
+    text = doc["text"]
+    title = _first_heading(text) or filename
+    units = _structure_units(text, chunk_tokens)
+
+    # Token size of each heading's section (up to the next heading at the same or higher level)
+    section_tokens = {}
+    for i, unit in enumerate(units):
+        if unit["level"]:
+            total = 0
+            for later in units[i:]:
+                if later is not unit and later["level"] and later["level"] <= unit["level"]:
+                    break
+                total += later["tokens"]
+            section_tokens[i] = total
+
+    groups = []
+    current = []
+    current_tokens = 0
+    for i, unit in enumerate(units):
+        # +1: units are joined by at least one separator token
+        needed = section_tokens.get(i, unit["tokens"]) + 1
+        if current and current_tokens + needed > chunk_tokens:
+            if not all(u["level"] for u in current):
+                groups.append(current)
+                current, current_tokens = [], 0
+            else:
+                # A run of headings stays with the body that follows it; headings that
+                # would push the chunk over budget are split off, outermost first
+                leading = []
+                while current and current_tokens + unit["tokens"] + 1 > chunk_tokens:
+                    heading = current.pop(0)
+                    leading.append(heading)
+                    current_tokens -= heading["tokens"] + 1
+                if leading:
+                    groups.append(leading)
+        current.append(unit)
+        current_tokens += unit["tokens"] + 1
+    if current:
+        groups.append(current)
+
+    chunks = []
+    for i, (group, n_tokens) in enumerate(_fit_groups(text, groups, chunk_tokens)):
+        start, end = group[0]["start"], group[-1]["end"]
+        headings = [u["title"] for u in group if u["level"]]
+        path = group[-1]["heading_path"]
+        chunks.append({
+            "doc_id": filename,
+            "title": title,
+            "section": headings[-1] if headings else (path[-1] if path else None),
+            "text": text[start:end],
+            "chunk_id": i,
+            "tokens": n_tokens,
+            "heading_path": " > ".join(path),
+            "pages": _page_range(doc.get("pages") or [], start, end),
+        })
+    return chunks, sum(u["tokens"] for u in units)
+
+
+def _log_document_stats(filename: str, chars: int, tokens: int, n_chunks: int) -> list[str]:
+    """Log one per-document stats line. Returns warnings for the document."""
+    logging.info(f"  {filename}: {chars} chars, {tokens} tokens, {n_chunks} chunks")
+    if chars < MIN_TEXT_CHARS:
+        return [f"WARNING: very little text extracted from {filename}"]
+    return []
+
+
+def _encode_batch(texts: list[str]) -> list[list[int]]:
+    """Encode several documents in one multi-threaded tiktoken call (plain loop on one core)."""
+    enc = _get_encoder()
+    threads = min(8, os.cpu_count() or 1)
+    if len(texts) == 1 or threads == 1:
+        return [enc.encode(text) for text in texts]
+    return enc.encode_batch(texts, num_threads=threads)
 
 
 def build_chunks(
     docs: list[dict],
     chunk_tokens: int = CHUNK_TOKENS,
     overlap_tokens: int = OVERLAP_TOKENS,
+    chunk_mode: str = CHUNK_MODE,
 ) -> tuple[list[dict], list[str]]:
     """
     Build chunk dicts with doc_id, title, section, text.
@@ -156,67 +542,211 @@ def build_chunks(
     total_tokens = 0
     total_chunks = 0
 
-    for doc in docs:
-        filename = doc["filename"]
-        text = doc["text"]
-        title = _first_heading(text) or filename
-
-        extracted_chars = len(text)
-        extracted_tokens = count_tokens(text)
-        text_chunks = chunk_text(text, chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
-        chunks_created = len(text_chunks)
-
+    if chunk_mode == "window" and docs:
+        token_lists = _encode_batch([doc["text"] for doc in docs])
+    else:
+        token_lists = [None] * len(docs)
+    for doc, tokens in zip(docs, token_lists):
+        doc_chunks, extracted_chars, extracted_tokens = _chunk_document(
+            doc,
+            chunk_tokens=chunk_tokens,
+            overlap_tokens=overlap_tokens,
+            tokens=tokens,
+            chunk_mode=chunk_mode,
+        )
         total_chars += extracted_chars
         total_tokens += extracted_tokens
-        total_chunks += chunks_created
+        total_chunks += len(doc_chunks)
+        warnings.extend(
+            _log_document_stats(doc["filename"], extracted_chars, extracted_tokens, len(doc_chunks))
+        )
+        chunks.extend(doc_chunks)
 
-        if extracted_chars < MIN_TEXT_CHARS:
-            warnings.append(f"WARNING: very little text extracted from {filename}")
+    return chunks, warnings, total_chars, total_tokens, total_chunks
 
-        logging.info(
-            f"  {filename}: {extracted_chars} chars, {extracted_tokens} tokens, "
-            f"{chunks_created} chunks"
-        )
 
-        for i, chunk_str in enumerate(text_chunks):
-            section = _section_in_chunk(chunk_str)
-            chunks.append({
-                "doc_id": filename,
-                "title": title,
-                "section": section,
-                "text": chunk_str,
-                "chunk_id": i,
-            })
+def _failed_file(filename: str, exc: Exception) -> dict:
+    return {"filename": filename, "error": f"{type(exc).__name__}: {exc}"}
 
-    return chunks, warnings, total_chars, total_tokens, total_chunks
 
+def _chunk_files(
+    paths: list[Path],
+    chunk_tokens: int,
+    overlap_tokens: int,
+    chunk_mode: str = CHUNK_MODE,
+) -> list[dict]:
+    """
+    Extract and chunk a group of files, tokenizing them with one batch encode.
+    Runs in worker processes too, so it never raises: each failed file comes back as
+    {"filename", "error"} and the rest of the group (and run) continues.
+    Returns one result per path, in order.
+    """
+    results: list[dict | None] = []
+    docs = []
+    for path in paths:
+        try:
+            docs.append(extract_document(path, structured=chunk_mode == "structure"))
+            results.append(None)
+        except Exception as exc:
+            results.append(_failed_file(path.name, exc))
+
+    try:
+        if chunk_mode == "window" and docs:
+            token_lists = _encode_batch([doc["text"] for doc in docs])
+        else:
+            token_lists = [None] * len(docs)
+    except Exception:
+        # One bad text (e.g. a special token) shouldn't fail the group; encode one by one
+        token_lists = [None] * len(docs)
+
+    pending = iter(zip(docs, token_lists))
+    for i, result in enumerate(results):
+        if result is not None:
+            continue
+        doc, tokens = next(pending)
+        try:
+            chunks, chars, n_tokens = _chunk_document(
+                doc,
+                chunk_tokens=chunk_tokens,
+                overlap_tokens=overlap_tokens,
+                tokens=tokens,
+                chunk_mode=chunk_mode,
+            )
+        except Exception as exc:
+            results[i] = _failed_file(doc["filename"], exc)
+            continue
+        results[i] = {
+            "filename": doc["filename"],
+            "chunks": chunks,
+            "chars": chars,
+            "tokens": n_tokens,
+            "error": None,
+        }
+    return results
+
+
+def iter_chunked_files(
+    paths: list[Path],
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+    workers: int = 1,
+    chunk_mode: str = CHUNK_MODE,
+) -> Iterator[dict]:
+    """
+    Extract and chunk files, yielding one _chunk_files result per path in input order.
+    Serially, files are read in groups of ENCODE_BATCH_DOCS and tokenized with one batch
+    encode. With workers > 1 a process pool does the PDF/HTML parsing and tokenization
+    file by file; at most 2 * workers files are in flight, so memory stays bounded.
+    """
+    if workers <= 1:
+        remaining = iter(paths)
+        while group := list(itertools.islice(remaining, ENCODE_BATCH_DOCS)):
+            yield from _chunk_files(group, chunk_tokens, overlap_tokens, chunk_mode)
+        return
+
+    pending = deque()
+    remaining = iter(paths)
+    # spawn, not fork: the parent already runs Chroma/HTTP threads that fork() can deadlock on
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for path in itertools.islice(remaining, 2 * workers):
+            pending.append(pool.submit(_chunk_files, [path], chunk_tokens, overlap_tokens, chunk_mode))
+        while pending:
+            results = pending.popleft().result()
+            for path in itertools.islice(remaining, 1):
+                pending.append(pool.submit(_chunk_files, [path], chunk_tokens, overlap_tokens, chunk_mode))
+            yield from results
+
+
+def iter_chunk_windows(
+    files: Iterable[dict],
+    window_chunks: int = WINDOW_CHUNKS,
+    totals: dict | None = None,
+    failed: list[str] | None = None,
+) -> Iterator[tuple[list[str], list[dict]]]:
+    """
+    Group chunked files (from iter_chunked_files) into windows of about window_chunks chunks.
+    A document's chunks never straddle two windows, so each window is a checkpoint unit.
+    Failed files are logged and left out. Yields (filenames, chunks).
+    Running chars/tokens/chunks/failed totals are added to `totals`, and the names of
+    failed files are appended to `failed`.
+    """
+    totals = totals if totals is not None else {}
+    failed = failed if failed is not None else []
+    filenames = []
+    window = []
+    for result in files:
+        if result["error"]:
+            logging.error(f"  {result['filename']}: FAILED ({result['error']})")
+            totals["failed"] = totals.get("failed", 0) + 1
+            failed.append(result["filename"])
+            continue
+        chunks = result["chunks"]
+        for w in _log_document_stats(result["filename"], result["chars"], result["tokens"], len(chunks)):
+            logging.warning(w)
+        totals["chars"] = totals.get("chars", 0) + result["chars"]
+        totals["tokens"] = totals.get("tokens", 0) + result["tokens"]
+        totals["chunks"] = totals.get("chunks", 0) + len(chunks)
 
-def embed_chunks(chunks: list[dict]) -> list[list[float]]:
-    """Get OpenAI embeddings for chunk texts. Returns list of embedding vectors."""
-    client = OpenAI()
+        filenames.append(result["filename"])
+        window.extend(chunks)
+        if len(window) >= window_chunks:
+            yield filenames, window
+            filenames, window = [], []
+
+    if filenames:
+        yield filenames, window
+
+
+def embed_chunks(
+    chunks: list[dict],
+    max_concurrency: int = EMBED_CONCURRENCY,
+    backend: EmbeddingBackend | None = None,
+) -> list[list[float]]:
+    """
+    Embed chunk texts with backend (default: RAG_EMBED_BACKEND). Returns list of embedding vectors.
+    API-backed embeddings read through the on-disk embedding cache, so only unseen chunk texts hit the API.
+    """
+    backend = backend or get_backend()
     texts = [c["text"] for c in chunks]
-    embeddings = []
+    # Chunk token counts are known from chunking; don't re-encode just to size batches
+    known_tokens = {c["text"]: c["tokens"] for c in chunks if "tokens" in c}
 
-    for i in range(0, len(texts), BATCH_SIZE):
-        batch = texts[i : i + BATCH_SIZE]
-        resp = client.embeddings.create(model=EMBED_MODEL, input=batch)
-        for item in resp.data:
-            embeddings.append(item.embedding)
+    def embed(missing: list[str]) -> list[list[float]]:
+        return backend.embed_documents(
+            missing,
+            max_concurrency=max_concurrency,
+            token_counts=[known_tokens.get(t) or count_tokens(t) for t in missing],
+            count_tokens=count_tokens,
+        )
+
+    if not backend.cacheable:
+        return backend.embed(texts)
+    return cached_embed(texts, backend.model_id, embed)
 
-    return embeddings
+
+def _get_collection(index_dir: Path, embed_model: str | None = None):
+    """
+    Open (or create) the policies collection at index_dir. A new collection records
+    embed_model in its metadata (Chroma keeps the metadata it was created with).
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    client = chromadb.PersistentClient(path=str(index_dir))
+    metadata = {"embed_model": embed_model} if embed_model else None
+    return client.get_or_create_collection(name=COLLECTION_NAME, metadata=metadata)
 
 
 def persist_to_chroma(
     chunks: list[dict],
     embeddings: list[list[float]],
     index_dir: Path,
+    embed_model: str | None = None,
 ) -> None:
-    """Persist chunks and embeddings to Chroma at index_dir."""
-    index_dir = Path(index_dir)
-    index_dir.mkdir(parents=True, exist_ok=True)
-
-    client = chromadb.PersistentClient(path=str(index_dir))
-    collection = client.get_or_create_collection(name=COLLECTION_NAME)
+    """Upsert chunks and embeddings (from embed_model) into Chroma at index_dir."""
+    if not chunks:
+        return
+    collection = _get_collection(index_dir, embed_model)
 
     ids = [f"{c['doc_id']}:{c['chunk_id']}" for c in chunks]
     documents = [c["text"] for c in chunks]
@@ -226,11 +756,15 @@ def persist_to_chroma(
             "title": c["title"],
             "section": c["section"] if c["section"] is not None else "",
             "chunk_id": c["chunk_id"],
+            # Structure-aware chunks only
+            **{key: c[key] for key in ("heading_path", "pages") if key in c},
+            # Sentence offsets and rule scores, so queries skip re-splitting (rag.sentences)
+            SENTENCES_KEY: dump_sentence_index(c["text"]),
         }
         for c in chunks
     ]
 
-    collection.add(
+    collection.upsert(
         ids=ids,
         documents=documents,
         metadatas=metadatas,
@@ -238,45 +772,261 @@ def persist_to_chroma(
     )
 
 
+def delete_from_chroma(doc_ids: list[str], index_dir: Path) -> None:
+    """Delete every chunk belonging to the given doc_ids from Chroma at index_dir."""
+    if not doc_ids or not Path(index_dir).exists():
+        return
+    client = chromadb.PersistentClient(path=str(index_dir))
+    if COLLECTION_NAME not in {c.name for c in client.list_collections()}:
+        return
+    collection = client.get_collection(name=COLLECTION_NAME)
+    for doc_id in doc_ids:
+        collection.delete(where={"doc_id": doc_id})
+
+
+# --- Manifest (incremental ingestion) ---
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of the raw file bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def ingest_params(
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+    chunk_mode: str = CHUNK_MODE,
+    embed_backend: str | None = None,
+) -> dict:
+    """Parameters that, when changed, invalidate every indexed chunk."""
+    return {
+        "embed_model": get_backend(embed_backend).model_id,
+        "chunk_mode": chunk_mode,
+        "chunk_tokens": chunk_tokens,
+        "overlap_tokens": overlap_tokens,
+        # Rule scores stored per sentence (rag.sentences) are only valid under the same rules
+        "sentence_scoring": SENTENCE_SCORING,
+    }
+
+
+def load_manifest(index_dir: Path) -> dict:
+    """Load the ingest manifest from index_dir. Returns an empty manifest if missing or unreadable."""
+    path = Path(index_dir) / MANIFEST_NAME
+    empty = {"version": MANIFEST_VERSION, "params": {}, "files": {}}
+    if not path.exists():
+        return empty
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logging.warning(f"Ignoring unreadable manifest at {path}")
+        return empty
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty
+    return manifest
+
+
+def save_manifest(manifest: dict, index_dir: Path) -> None:
+    """Atomically write the ingest manifest to index_dir."""
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    path = index_dir / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def manifest_digest(manifest: dict) -> str:
+    """
+    Digest of what an index snapshot contains (params and file hashes). Recorded in
+    the export and the BM25 index, so a run that stopped before rewriting them is
+    detected on the next run.
+    """
+    content = {
+        "params": manifest.get("params", {}),
+        "files": {name: entry.get("sha256") for name, entry in manifest.get("files", {}).items()},
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def plan_changes(
+    paths: list[Path],
+    manifest: dict,
+    params: dict,
+) -> tuple[list[Path], list[str], dict[str, str]]:
+    """
+    Compare files on disk against the manifest.
+    Returns (changed_paths, removed_doc_ids, hashes) where hashes maps filename -> sha256.
+    A change of chunking/embedding params marks every file as changed.
+    """
+    indexed = manifest.get("files", {})
+    params_changed = manifest.get("params") != params
+    hashes = {path.name: file_sha256(path) for path in paths}
+
+    changed = [
+        path for path in paths
+        if params_changed or indexed.get(path.name, {}).get("sha256") != hashes[path.name]
+    ]
+    removed = sorted(set(indexed) - set(hashes))
+    return changed, removed, hashes
+
+
+def _derived_indexes_stale(export_dtype: str, digest: str) -> bool:
+    """True if the BM25 index or the export is missing or was not built from the manifest with this digest."""
+    if read_source_digest(INDEX_DIR) != digest:
+        return True
+    export_meta = read_export_meta(INDEX_DIR)
+    if export_dtype == "none":
+        # A leftover export would still be served by the auto backend
+        return export_meta is not None and export_meta.get("source_digest") != digest
+    return (export_meta or {}).get("dtype") != export_dtype or export_meta.get("source_digest") != digest
+
+
+def _write_derived_indexes(export_dtype: str, embed_model: str, digest: str) -> None:
+    """Rebuild the BM25 index and the memory-mappable export from one snapshot of the collection."""
+    source = VectorIndex.from_chroma(INDEX_DIR, COLLECTION_NAME)
+    bm25 = write_bm25(INDEX_DIR, source.ids, source.texts, source_digest=digest)
+    logging.info(f"BM25 index: {len(bm25)} chunks, {len(bm25.terms)} terms")
+    export_meta = read_export_meta(INDEX_DIR)
+    if export_dtype == "none":
+        if export_meta is not None and export_meta.get("source_digest") != digest:
+            shutil.rmtree(INDEX_DIR / EXPORT_DIR_NAME)
+            logging.info(f"Removed stale export at {INDEX_DIR / EXPORT_DIR_NAME}")
+    else:
+        meta = write_export(
+            INDEX_DIR, COLLECTION_NAME, dtype=export_dtype, embed_model=embed_model, source=source,
+            source_digest=digest,
+        )
+        logging.info(
+            f"Exported {meta['count']} vectors ({export_dtype}, dim {meta['dim']}) to {INDEX_DIR / 'export'}"
+        )
+
+
 def run(
     rebuild: bool = False,
     chunk_tokens: int = CHUNK_TOKENS,
     overlap_tokens: int = OVERLAP_TOKENS,
+    embed_concurrency: int = EMBED_CONCURRENCY,
+    window_chunks: int = WINDOW_CHUNKS,
+    workers: int = 1,
+    chunk_mode: str = CHUNK_MODE,
+    export_dtype: str = EXPORT_DTYPE,
+    embed_backend: str | None = None,
 ) -> None:
-    """Run the full ingestion pipeline."""
+    """Run the ingestion pipeline (incremental unless rebuild=True)."""
     logging.basicConfig(level=logging.INFO, format="%(message)s")
     load_dotenv()
 
-    if not os.environ.get("OPENAI_API_KEY"):
+    if embed_backend is not None and embed_backend not in BACKENDS:
+        raise SystemExit(f"Unknown embedding backend {embed_backend!r}; expected one of {', '.join(BACKENDS)}")
+    backend = get_backend(embed_backend)
+    if chunk_mode not in CHUNK_MODES:
+        raise SystemExit(f"Unknown chunk mode {chunk_mode!r}; expected one of {', '.join(CHUNK_MODES)}")
+    # Vectors of two embedding models can't share a collection (or even its dimension)
+    previous_model = load_manifest(INDEX_DIR).get("params", {}).get("embed_model")
+    if not rebuild and previous_model and previous_model != backend.model_id:
+        logging.info(f"Embedding model changed ({previous_model} -> {backend.model_id}); rebuilding the index")
+        rebuild = True
+
+    paths, discovered = discover_files(DATA_DIR)
+    if not paths:
+        raise SystemExit(f"No documents found in {DATA_DIR}")
+    logging.info(f"Discovered {discovered} files")
+
+    # A rebuild re-embeds every file: fail before the old index is wiped, not after
+    if rebuild and backend.needs_api_key and not os.environ.get("OPENAI_API_KEY"):
         raise SystemExit("OPENAI_API_KEY must be set in .env")
 
     if rebuild and INDEX_DIR.exists():
         shutil.rmtree(INDEX_DIR)
+        # Chroma caches one client per path; drop it so this process reopens the new database
+        SharedSystemClient.clear_system_cache()
         logging.info(f"Removed existing index at {INDEX_DIR}")
 
-    docs, discovered, ingested = load_documents(DATA_DIR)
-    if not docs:
-        raise SystemExit(f"No documents found in {DATA_DIR}")
+    params = ingest_params(
+        chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens, chunk_mode=chunk_mode, embed_backend=embed_backend
+    )
+    manifest = load_manifest(INDEX_DIR)
+    if manifest["files"] and manifest.get("params") != params:
+        logging.info("Chunking/embedding parameters changed; re-indexing all files")
+    changed, removed, hashes = plan_changes(paths, manifest, params)
+    logging.info(
+        f"Unchanged {len(paths) - len(changed)}, changed/new {len(changed)}, "
+        f"removed {len(removed)}"
+    )
 
-    logging.info(f"Discovered {discovered} files")
-    logging.info(f"Ingested {ingested} documents")
+    if not changed and not removed:
+        logging.info("Index is up to date.")
+        digest = manifest_digest(manifest)
+        if _derived_indexes_stale(export_dtype, digest):
+            logging.info("BM25 index or export does not match the manifest; rebuilding them")
+            _write_derived_indexes(export_dtype, backend.model_id, digest)
+        return
+
+    if changed and backend.needs_api_key and not os.environ.get("OPENAI_API_KEY"):
+        raise SystemExit("OPENAI_API_KEY must be set in .env")
+
+    # Checkpoint before any work: removed files are dropped, and a params change forgets every file
+    files = {
+        name: entry for name, entry in manifest.get("files", {}).items()
+        if name in hashes and manifest.get("params") == params
+    }
+    delete_from_chroma(removed, INDEX_DIR)
+    save_manifest({"version": MANIFEST_VERSION, "params": params, "files": files}, INDEX_DIR)
+
+    logging.info(f"Ingesting {len(changed)} documents")
     logging.info("Per-document stats:")
-    chunks, warnings, total_chars, total_tokens, total_chunks = build_chunks(
-        docs,
+    totals = {}
+    failed = []
+    done = 0
+    files_chunked = iter_chunked_files(
+        changed,
         chunk_tokens=chunk_tokens,
         overlap_tokens=overlap_tokens,
+        workers=workers,
+        chunk_mode=chunk_mode,
     )
-    logging.info(f"Total tokens: {total_tokens:,}")
-    logging.info(f"Built {len(chunks)} chunks")
+    windows = iter_chunk_windows(files_chunked, window_chunks=window_chunks, totals=totals, failed=failed)
+    for filenames, chunks in windows:
+        # Stale chunks go first, so re-chunking to fewer chunks leaves no orphans
+        delete_from_chroma(filenames, INDEX_DIR)
+        if chunks:
+            embeddings = embed_chunks(chunks, max_concurrency=embed_concurrency, backend=backend)
+            persist_to_chroma(chunks, embeddings, INDEX_DIR, embed_model=backend.model_id)
 
-    for w in warnings:
-        logging.warning(w)
+        chunk_counts = {}
+        for c in chunks:
+            chunk_counts[c["doc_id"]] = chunk_counts.get(c["doc_id"], 0) + 1
+        for name in filenames:
+            files[name] = {"sha256": hashes[name], "chunks": chunk_counts.get(name, 0)}
+        save_manifest({"version": MANIFEST_VERSION, "params": params, "files": files}, INDEX_DIR)
+        done += len(filenames)
+        logging.info(f"Checkpoint: {done}/{len(changed)} documents indexed ({len(chunks)} chunks in window)")
 
-    logging.info("Embedding chunks...")
-    embeddings = embed_chunks(chunks)
+    # A previously indexed file that now fails extraction must not keep serving its old
+    # chunks; after a params change `files` starts empty, so check the manifest it came from
+    stale = [name for name in failed if name in manifest["files"]]
+    if stale:
+        delete_from_chroma(stale, INDEX_DIR)
+        for name in stale:
+            files.pop(name, None)
+        save_manifest({"version": MANIFEST_VERSION, "params": params, "files": files}, INDEX_DIR)
+        logging.info(f"Removed stale chunks of {len(stale)} document(s) that failed to extract")
 
-    logging.info(f"Persisting to {INDEX_DIR}...")
-    persist_to_chroma(chunks, embeddings, INDEX_DIR)
+    logging.info(f"Total tokens: {totals.get('tokens', 0):,}")
+    logging.info(f"Built {totals.get('chunks', 0)} chunks")
+    logging.info(f"Persisted to {INDEX_DIR}")
+    _write_derived_indexes(
+        export_dtype, backend.model_id, manifest_digest({"params": params, "files": files})
+    )
+    if totals.get("failed"):
+        logging.warning(
+            f"{totals['failed']} document(s) failed to extract and were skipped; "
+            "they will be retried on the next run"
+        )
     logging.info("Done.")
 
 
@@ -285,7 +1035,7 @@ def main() -> None:
     parser.add_argument(
         "--rebuild",
         action="store_true",
-        help="Delete existing index before indexing",
+        help="Delete existing index before indexing (default: only re-index changed files)",
     )
     parser.add_argument(
         "--chunk-tokens",
@@ -299,11 +1049,56 @@ def main() -> None:
         default=OVERLAP_TOKENS,
         help=f"Overlap between chunks in tokens (default: {OVERLAP_TOKENS})",
     )
+    parser.add_argument(
+        "--embed-concurrency",
+        type=int,
+        default=EMBED_CONCURRENCY,
+        help=f"Concurrent embedding requests (default: {EMBED_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--window-chunks",
+        type=int,
+        default=WINDOW_CHUNKS,
+        help=f"Chunks embedded and upserted per checkpoint window (default: {WINDOW_CHUNKS})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes for document extraction and tokenization (default: 1, no pool)",
+    )
+    parser.add_argument(
+        "--chunk-mode",
+        choices=CHUNK_MODES,
+        default=CHUNK_MODE,
+        help=(
+            "window: fixed token windows with overlap; structure: pack whole sections, "
+            f"paragraphs and sentences up to --chunk-tokens, no overlap (default: {CHUNK_MODE})"
+        ),
+    )
+    parser.add_argument(
+        "--export-dtype",
+        choices=EXPORT_DTYPES + ("none",),
+        default=EXPORT_DTYPE,
+        help=f"Vector dtype of the memory-mapped index export, or none to skip it (default: {EXPORT_DTYPE})",
+    )
+    parser.add_argument(
+        "--embed-backend",
+        choices=tuple(BACKENDS),
+        default=None,
+        help="Embedding backend; queries must use the same one (default: RAG_EMBED_BACKEND, else openai)",
+    )
     args = parser.parse_args()
     run(
         rebuild=args.rebuild,
         chunk_tokens=args.chunk_tokens,
         overlap_tokens=args.overlap_tokens,
+        embed_concurrency=args.embed_concurrency,
+        window_chunks=args.window_chunks,
+        workers=args.workers,
+        chunk_mode=args.chunk_mode,
+        export_dtype=args.export_dtype,
+        embed_backend=args.embed_backend,
     )
 
 
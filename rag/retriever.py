@@ -1,25 +1,49 @@
 """
-Chroma-based retrieval for policy documents.
+Retrieval for policy documents: the in-process vector index (rag.vector_index),
+fused with BM25 (rag.bm25) in hybrid mode, then keyword reranking and lazily
+computed evidence snippets and quotes.
 """
 
+import asyncio
 import os
 import re
+import time
 from pathlib import Path
 
-import chromadb
-from openai import OpenAI
-
-# Default paths
-DEFAULT_PERSIST_DIR = Path(__file__).resolve().parent.parent / "data" / "index"
+import numpy as np
+
+from rag.bm25 import get_bm25_index, tokenize
+from rag.embed_cache import acached_embed, cached_embed
+from rag.embedding_backends import get_backend
+from rag.sentences import (
+    RULE_TERMS,
+    SENTENCES_KEY,
+    _DIGIT_RE,
+    _rule_bonus,
+    load_sentence_index,
+    sentence_spans,
+)
+from rag.term_matcher import TermMatcher, term_matcher
+from rag.vector_index import current_version, get_index, similarity_to_distance
+
+# Default paths (RAG_INDEX_DIR overrides, e.g. for load tests against a scratch index)
+DEFAULT_PERSIST_DIR = Path(
+    os.environ.get("RAG_INDEX_DIR") or Path(__file__).resolve().parent.parent / "data" / "index"
+)
 COLLECTION_NAME = "policies"
 
 # Retrieval
 DEFAULT_K = 6
 EVIDENCE_MAX_CHARS = 350
 EVIDENCE_MAX_SENTENCES = 2
-EMBED_MODEL = "text-embedding-3-small"
 
-# Refusal threshold: best (lowest) distance above this = weak evidence, refuse
+# Hybrid search: vector and BM25 candidates fused with reciprocal rank fusion
+HYBRID_SEARCH = os.environ.get("RAG_HYBRID", "1") != "0"
+FUSION_CANDIDATES = 20
+RRF_K = 60
+
+# Refusal threshold: best (lowest) distance above this = weak evidence, refuse.
+# Calibrated for OpenAI embeddings; other backends may set their own refuse_distance
 DISTANCE_REFUSE_THRESHOLD = 1.2
 
 # Lightweight stopwords for keyword extraction
@@ -48,24 +72,61 @@ def _keyword_score(text: str, keywords: set[str]) -> int:
     """Count keyword hits in text (case-insensitive)."""
     if not keywords:
         return 0
-    text_lower = text.lower()
-    return sum(1 for kw in keywords if kw in text_lower)
+    return term_matcher(frozenset(keywords)).count(text)
 
 
 # Rule-like terms for quote scoring (policy language)
 QUOTE_RULE_TERMS = ("must", "required", "prohibited", "up to", "within", "days", "approval")
 
+# RULE_TERMS and _rule_bonus (the question-independent part of a sentence score) live
+# in rag.sentences, so ingest can precompute them per sentence
+_RULE_TERM_SET = frozenset(RULE_TERMS)
+_QUOTE_RULE_MATCHER = TermMatcher(QUOTE_RULE_TERMS)
+
+
+def _sentence_scorer(keywords: set[str]):
+    """
+    text -> _keyword_score(text, keywords) + _rule_bonus(text), with the keywords and
+    rule terms compiled into one matcher so each sentence is lowercased and scanned once.
+    """
+    keywords = frozenset(keywords)
+    matcher = term_matcher(keywords | _RULE_TERM_SET)
+
+    def score(text: str) -> int:
+        found = matcher.matches(text)
+        return len(found & keywords) + len(found & _RULE_TERM_SET) + (1 if _DIGIT_RE.search(text) else 0)
+
+    return score
 
-RULE_TERMS = ("up to", "within", "must", "required", "prohibited",
-              "may", "cannot", "days", "hours", "approval")
 
+class QueryAnalysis:
+    """
+    Everything derived from the question text alone, computed once per request and
+    shared by retrieval (BM25 terms), evidence extraction, keyword reranking and
+    quote selection, instead of each re-tokenizing the question.
+    """
 
-def _rule_bonus(text: str) -> int:
-    """Bonus points for digits and rule-like keywords (policy language)."""
-    text_lower = text.lower()
-    bonus = 1 if re.search(r"\d", text) else 0
-    bonus += sum(1 for term in RULE_TERMS if term in text_lower)
-    return bonus
+    def __init__(self, question: str):
+        self.question = question
+        self.keywords = frozenset(_extract_keywords(question))
+        self.terms = frozenset(tokenize(question))
+        self.keyword_matcher = term_matcher(self.keywords)
+        self.sentence_score = _sentence_scorer(self.keywords)
+
+
+def _scored_sentences(
+    text: str, analysis: QueryAnalysis, sentences: list[tuple[int, int, int]] | None = None
+) -> list[tuple[str, int]]:
+    """
+    (sentence, keyword hits + rule bonus) for every sentence of text. sentences is the
+    ingest-time index of text (offsets and rule bonus), if stored; then only the keyword
+    hits are computed here.
+    """
+    if sentences is None:
+        score = analysis.sentence_score
+        return [(text[s:e], score(text[s:e])) for s, e in sentence_spans(text)]
+    count = analysis.keyword_matcher.count
+    return [(text[s:e], bonus + count(text[s:e])) for s, e, bonus in sentences]
 
 
 def split_sentences(text: str) -> list[str]:
@@ -81,10 +142,8 @@ def split_sentences(text: str) -> list[str]:
 
 def _quote_span_score(span: str) -> int:
     """Score a span for digits/policy keywords (used to prefer certain spans)."""
-    score = 1 if re.search(r"\d", span) else 0
-    span_lower = span.lower()
-    score += sum(1 for t in QUOTE_RULE_TERMS if t in span_lower)
-    return score
+    score = 1 if _DIGIT_RE.search(span) else 0
+    return score + _QUOTE_RULE_MATCHER.count(span)
 
 
 def extract_evidence_sentences(
@@ -92,21 +151,19 @@ def extract_evidence_sentences(
     question: str,
     max_sentences: int = EVIDENCE_MAX_SENTENCES,
     max_chars: int = EVIDENCE_MAX_CHARS,
+    analysis: QueryAnalysis | None = None,
+    sentences: list[tuple[int, int, int]] | None = None,
 ) -> str:
     """
     Extract evidence sentences: choose sentences with highest keyword hit count.
     Return joined sentences as snippet (<= max_chars).
+    Pass analysis (QueryAnalysis of question) to reuse it across chunks, and
+    sentences (the chunk's ingest-time sentence index) to skip re-splitting it.
     """
-    keywords = _extract_keywords(question)
-    # Better split: same as split_sentences but keep punctuation
-    raw_sentences = re.split(r"(?<=[.!?])\s+|\n+", chunk_text)
-    sentences = [s.strip() for s in raw_sentences if s.strip()]
-
-    if not sentences:
-        return _clean_whitespace(chunk_text)[:max_chars]
-
     # Score each sentence by keyword hits + rule bonus (digits, policy keywords)
-    scored = [(s, _keyword_score(s, keywords) + _rule_bonus(s)) for s in sentences]
+    scored = _scored_sentences(chunk_text, analysis or QueryAnalysis(question), sentences)
+    if not scored:
+        return _clean_whitespace(chunk_text)[:max_chars]
     # Sort by score desc, then by length (prefer shorter for diversity)
     scored.sort(key=lambda x: (-x[1], len(x[0])))
 
@@ -126,23 +183,25 @@ def pick_verbatim_quote(
     question_keywords: set[str] | None = None,
     min_words: int = 5,
     max_words: int = 15,
+    analysis: QueryAnalysis | None = None,
+    sentences: list[tuple[int, int, int]] | None = None,
 ) -> str:
     """
     Pick a verbatim quote from text. Returns "" if nothing suitable.
     Ensures the returned string is a literal substring of the input text.
+    Keywords come from analysis when given, else from question_keywords; sentences
+    (text's ingest-time sentence index) is only used together with analysis.
     """
     if not text or not text.strip():
         return ""
 
-    sentences = split_sentences(text)
-    if not sentences:
+    if analysis is not None:
+        scored = [(s, score) for s, score in _scored_sentences(text, analysis, sentences) if len(s) >= 20]
+    else:
+        score = _sentence_scorer(question_keywords or set())
+        scored = [(s, score(s)) for s in split_sentences(text)]
+    if not scored:
         return ""
-
-    keywords = question_keywords or set()
-    scored = [
-        (s, _keyword_score(s, keywords) + _rule_bonus(s))
-        for s in sentences
-    ]
     # Sort by score desc, then by length (prefer medium length around 60 chars)
     scored.sort(key=lambda x: (-x[1], abs(len(x[0]) - 60)))
     best_sentence = scored[0][0]
@@ -151,36 +210,148 @@ def pick_verbatim_quote(
     words = list(re.finditer(r"\b\w+\b", best_sentence))
     if len(words) < min_words:
         return ""
+    return _best_quote_span(best_sentence, words, min_words, max_words).strip()
 
-    best_spans = []
-    for start in range(len(words)):
-        max_n = min(max_words, len(words) - start)
-        for n in range(min_words, max_n + 1):
-            end_idx = start + n - 1
-            if end_idx >= len(words):
-                continue
-            first = words[start]
-            last = words[end_idx]
-            # Take the slice from the original sentence to ensure literal substring
-            span = best_sentence[first.start() : last.end()]
-            best_spans.append((span, _quote_span_score(span)))
-
-    if not best_spans:
-        return ""
 
-    # Sort by score desc, then by length (prefer longer within max_words)
-    best_spans.sort(key=lambda x: (-x[1], -len(x[0])))
-    return best_spans[0][0].strip()
+def _best_quote_span(sentence: str, words: list[re.Match], min_words: int, max_words: int) -> str:
+    """
+    Span of min_words..max_words whole words with the highest _quote_span_score,
+    longest on ties, earliest start after that ("" if none fits).
+    Extending a span never lowers its score and always makes it longer, so only the
+    longest span from each start word can win: one pass over start words, with a
+    pointer per rule term (and one for digits) to the next occurrence at or after
+    the span start, instead of scoring every span.
+    """
+    n_words = len(words)
+    if min_words > max_words or n_words < min_words:
+        return ""
+    lowered = sentence.lower()
+    # Rare case mappings change the length (e.g. "İ"); then offsets differ, so score spans directly
+    direct = len(lowered) != len(sentence)
+
+    digit_words = [i for i, w in enumerate(words) if _DIGIT_RE.search(w.group())]
+    term_starts = []
+    if not direct:
+        for term in QUOTE_RULE_TERMS:
+            starts, at = [], lowered.find(term)
+            while at != -1:
+                starts.append(at)
+                at = lowered.find(term, at + 1)
+            term_starts.append(starts)
+    term_ptrs = [0] * len(term_starts)
+    digit_ptr = 0
+
+    best, best_key = (0, 0), None
+    for i in range(n_words - min_words + 1):
+        j = min(i + max_words, n_words) - 1
+        s, e = words[i].start(), words[j].end()
+        if direct:
+            score = _quote_span_score(sentence[s:e])
+        else:
+            while digit_ptr < len(digit_words) and digit_words[digit_ptr] < i:
+                digit_ptr += 1
+            score = 1 if digit_ptr < len(digit_words) and digit_words[digit_ptr] <= j else 0
+            for t, starts in enumerate(term_starts):
+                k = term_ptrs[t]
+                while k < len(starts) and starts[k] < s:
+                    k += 1
+                term_ptrs[t] = k
+                if k < len(starts) and starts[k] + len(QUOTE_RULE_TERMS[t]) <= e:
+                    score += 1
+        key = (score, e - s)
+        if best_key is None or key > best_key:
+            best, best_key = (s, e), key
+    return sentence[best[0]:best[1]]
+
+
+def _embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed texts with the configured backend (RAG_EMBED_BACKEND) in a single request."""
+    return get_backend().embed(texts)
 
 
 def _embed_query(query: str) -> list[float]:
-    """Embed query using OpenAI (matches ingest model)."""
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY must be set for retrieval")
-    client = OpenAI()
-    resp = client.embeddings.create(model=EMBED_MODEL, input=[query])
-    return resp.data[0].embedding
+    """Embed query (same backend as ingest). Repeated questions are served from the embedding cache."""
+    return _embed_queries([query])[0]
+
+
+def _embed_queries(queries: list[str]) -> list[list[float]]:
+    """Embed several queries with one request (cache hits are skipped)."""
+    backend = get_backend()
+    if not backend.cacheable:
+        return _embed_texts(list(queries))
+    return cached_embed(list(queries), backend.model_id, _embed_texts)
+
+
+async def _aembed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed texts with the configured backend's async path in a single request."""
+    return await get_backend().aembed(texts)
+
+
+async def _aembed_query(query: str, stats: dict | None = None) -> list[float]:
+    """Async _embed_query: does not block the event loop. stats gets embedding cache hits/misses."""
+    return (await _aembed_queries([query], stats=stats))[0]
+
+
+async def _aembed_queries(queries: list[str], stats: dict | None = None) -> list[list[float]]:
+    """Async _embed_queries: one embeddings request for all cache misses."""
+    backend = get_backend()
+    if not backend.cacheable:
+        return await _aembed_texts(list(queries))
+    return await acached_embed(list(queries), backend.model_id, _aembed_texts, stats=stats)
+
+
+def check_embed_model(index) -> None:
+    """
+    Raise ValueError if index was built with a different embedding model than queries
+    are embedded with (vectors from two spaces are not comparable). Indexes that do
+    not record their model are trusted.
+    """
+    model = get_backend().model_id
+    if index.embed_model and index.embed_model != model:
+        raise ValueError(
+            f"Index was built with embedding model {index.embed_model!r} but queries use {model!r}; "
+            "set RAG_EMBED_BACKEND to match, or re-run python -m rag.ingest"
+        )
+
+
+def warm_up(
+    persist_dir: str | Path = DEFAULT_PERSIST_DIR,
+    collection_name: str = COLLECTION_NAME,
+) -> dict[str, float]:
+    """
+    Pay the first request's one-time costs up front: embedding backend setup (the
+    OpenAI SDK import and client for the default backend), vector and BM25 index
+    loads, and one throwaway search through ranking and evidence extraction.
+    Blocking. Returns milliseconds per step; raises as retrieve() would.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    def step(name: str) -> None:
+        nonlocal start
+        now = time.perf_counter()
+        timings[name] = round((now - start) * 1000, 1)
+        start = now
+
+    get_backend().warm_up()
+    step("embedder")
+    index = get_index(persist_dir, collection_name)
+    check_embed_model(index)
+    step("index")
+    if HYBRID_SEARCH:
+        get_bm25_index(persist_dir)
+        step("bm25")
+    if len(index):
+        probe = [0.0] * index.matrix.shape[1]
+        probe[0] = 1.0
+        results = retrieve_many(
+            ["warm up: approval required within days"],
+            persist_dir=persist_dir, collection_name=collection_name, query_embeddings=[probe],
+        )
+        for result in results[0][:1]:
+            result["snippet"]
+        step("search")
+    return timings
 
 
 def index_ready(persist_dir: str | Path = DEFAULT_PERSIST_DIR) -> bool:
@@ -188,66 +359,245 @@ def index_ready(persist_dir: str | Path = DEFAULT_PERSIST_DIR) -> bool:
     return Path(persist_dir).exists()
 
 
-def get_chroma_collection(
-    persist_dir: str | Path = DEFAULT_PERSIST_DIR,
-    name: str = COLLECTION_NAME,
-):
-    """Get the Chroma collection for policy documents (no embedding fn; we provide embeddings)."""
-    client = chromadb.PersistentClient(path=str(persist_dir))
-    return client.get_collection(name=name)
+def index_version(persist_dir: str | Path = DEFAULT_PERSIST_DIR) -> tuple | None:
+    """Version of the index retrieve() serves; changes whenever the index is rebuilt."""
+    return current_version(persist_dir)
 
 
-def _rerank_by_keywords(results: list[dict], question: str) -> list[dict]:
+def _rerank_by_keywords(results: list[dict], question: str, analysis: QueryAnalysis | None = None) -> list[dict]:
     """Rerank by keyword_score desc, then distance asc."""
-    keywords = _extract_keywords(question)
+    matcher = (analysis or QueryAnalysis(question)).keyword_matcher
     for r in results:
-        r["_keyword_score"] = _keyword_score(r.get("text", ""), keywords)
+        r["_keyword_score"] = matcher.count(r.get("text", ""))
     results.sort(key=lambda x: (-x["_keyword_score"], x.get("distance", 0)))
     for r in results:
         r.pop("_keyword_score", None)
     return results
 
 
+def _rrf_fuse(rankings: list[list[int]], rrf_k: int = RRF_K) -> list[int]:
+    """Reciprocal rank fusion: rows ordered by sum of 1 / (rrf_k + rank) over rankings."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=lambda row: -scores[row])
+
+
+def _hybrid_rows(
+    index, query: str, query_embedding: list[float] | None, k: int, persist_dir, similarities=None, analysis=None
+) -> list[tuple[int, float]]:
+    """
+    Top-k rows fusing the vector ranking with a BM25 ranking over the whole corpus,
+    so exact-term matches (policy names, form numbers, day counts) are not lost when
+    the vector search misses them. Pass similarities if already computed for the
+    query (batched search), and analysis to reuse its BM25 terms. Returns [(row, distance)].
+    """
+    if len(index) == 0 or k <= 0:
+        return []
+    if similarities is None:
+        similarities = index.similarities(query_embedding)
+    candidates = min(max(k, FUSION_CANDIDATES), len(index))
+    vector_rows = np.argpartition(-similarities, candidates - 1)[:candidates]
+    vector_rows = vector_rows[np.argsort(-similarities[vector_rows], kind="stable")].tolist()
+
+    bm25 = get_bm25_index(persist_dir) if HYBRID_SEARCH else None
+    rankings = [vector_rows]
+    if bm25 is not None:
+        keyword_rows = [index.row_of(bm25.ids[row]) for row, _ in bm25.search(query, candidates, terms=analysis.terms if analysis else None)]
+        rankings.append([row for row in keyword_rows if row is not None])
+    rows = _rrf_fuse(rankings)[:k]
+    return [(row, similarity_to_distance(similarities[row])) for row in rows]
+
+
+class RetrievalResult(dict):
+    """
+    Result dict whose "snippet" (evidence sentences for the query) is computed on
+    first access and then stored, so refusals and uncited chunks never pay for it.
+    Whole-dict views (iteration, items(), ==, copies, JSON) compute it first, so
+    the result reads like a plain dict with every key.
+    """
+
+    def __init__(self, fields: dict, analysis: QueryAnalysis, sentences: str | None = None):
+        super().__init__(fields)
+        self._analysis = analysis
+        self._sentences = sentences
+
+    @property
+    def sentences(self) -> list[tuple[int, int, int]] | None:
+        """Ingest-time sentence index of "text" (rag.sentences), or None if not stored."""
+        if isinstance(self._sentences, str):
+            self._sentences = load_sentence_index(self._sentences, dict.get(self, "text", ""))
+        return self._sentences
+
+    def _snippet(self) -> str:
+        analysis, self._analysis = self._analysis, None
+        snippet = extract_evidence_sentences(
+            self.get("text", ""), analysis.question, analysis=analysis, sentences=self.sentences
+        )
+        dict.__setitem__(self, "snippet", snippet)
+        return snippet
+
+    def _fill(self) -> "RetrievalResult":
+        if self._analysis is not None and not dict.__contains__(self, "snippet"):
+            self._snippet()
+        return self
+
+    def __missing__(self, key):
+        if key == "snippet" and self._analysis is not None:
+            return self._snippet()
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or (key == "snippet" and self._analysis is not None)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        return dict.__iter__(self._fill())
+
+    def __len__(self) -> int:
+        return dict.__len__(self._fill())
+
+    def keys(self):
+        return dict.keys(self._fill())
+
+    def values(self):
+        return dict.values(self._fill())
+
+    def items(self):
+        return dict.items(self._fill())
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict.__eq__(self._fill(), other._fill() if isinstance(other, RetrievalResult) else other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return dict.__repr__(self._fill())
+
+
+def _results(index, analysis: QueryAnalysis, hits: list[tuple[int, float]]) -> list[dict]:
+    """Result dicts for index hits (lazy evidence snippets), reranked by keywords."""
+    out = []
+    for row, dist in hits:
+        text = index.texts[row]
+        meta = index.metadatas[row]
+        out.append(RetrievalResult({
+            "doc_id": meta.get("doc_id", ""),
+            "title": meta.get("title", ""),
+            "section": meta.get("section") or None,
+            "chunk_id": meta.get("chunk_id", 0),
+            "text": text,
+            "distance": dist,
+        }, analysis, meta.get(SENTENCES_KEY)))
+
+    out = _rerank_by_keywords(out, analysis.question, analysis)
+    return out
+
+
 def retrieve(
     query: str,
     k: int = DEFAULT_K,
     persist_dir: str | Path = DEFAULT_PERSIST_DIR,
     collection_name: str = COLLECTION_NAME,
+    query_embedding: list[float] | None = None,
+    timings: dict | None = None,
+    analysis: QueryAnalysis | None = None,
 ) -> list[dict]:
     """
-    Retrieve top-k chunks by similarity, rerank by keywords, return with evidence snippets.
+    Retrieve top-k chunks by similarity fused with BM25 (RAG_HYBRID=0 for vector only),
+    rerank by keywords, return with evidence snippets (computed when first read).
+    Similarity search runs against the in-process index (loaded once, reloaded when the
+    index on disk changes), not a fresh Chroma client per call.
+    Pass query_embedding if the caller already embedded the query.
+    If timings is given, seconds spent in "search" and "evidence" are added to it.
+    Pass analysis (QueryAnalysis of query) if the caller reuses it later, e.g. for quotes.
     Returns list of dicts: doc_id, title, section, chunk_id, snippet, text, distance.
     """
-    collection = get_chroma_collection(persist_dir, collection_name)
-    query_embedding = _embed_query(query)
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=k,
-        include=["documents", "metadatas", "distances"],
-    )
-    ids = results["ids"][0] if results["ids"] else []
-    docs = results["documents"][0] if results["documents"] else []
-    metas = results["metadatas"][0] if results["metadatas"] else []
-    dists = results["distances"][0] if results["distances"] else []
+    if query_embedding is None:
+        query_embedding = _embed_query(query)
+    analyses = [analysis] if analysis is not None else None
+    return retrieve_many([query], k, persist_dir, collection_name, [query_embedding], timings, analyses)[0]
 
-    out = []
-    for id_, text, meta, dist in zip(ids, docs, metas, dists):
-        text = text or ""
-        meta = meta or {}
-        out.append({
-            "doc_id": meta.get("doc_id", ""),
-            "title": meta.get("title", ""),
-            "section": meta.get("section") or None,
-            "chunk_id": meta.get("chunk_id", 0),
-            "snippet": extract_evidence_sentences(text, query),
-            "text": text,
-            "distance": float(dist) if dist is not None else 0.0,
-        })
 
-    out = _rerank_by_keywords(out, query)
+def retrieve_many(
+    queries: list[str],
+    k: int = DEFAULT_K,
+    persist_dir: str | Path = DEFAULT_PERSIST_DIR,
+    collection_name: str = COLLECTION_NAME,
+    query_embeddings: list[list[float]] | None = None,
+    timings: dict | None = None,
+    analyses: list[QueryAnalysis] | None = None,
+) -> list[list[dict]]:
+    """
+    retrieve() for several queries: one embeddings request for all of them and one
+    matrix product against the index. Returns one result list per query, in order.
+    """
+    if query_embeddings is None:
+        query_embeddings = _embed_queries(queries) if queries else []
+    start = time.perf_counter()
+    if analyses is None:
+        analyses = [QueryAnalysis(query) for query in queries]
+    index = get_index(persist_dir, collection_name)
+    check_embed_model(index)
+    similarities = index.similarities_many(query_embeddings)
+    hits = [
+        _hybrid_rows(index, query, None, k, persist_dir, similarities=sims, analysis=analysis)
+        for query, sims, analysis in zip(queries, similarities, analyses)
+    ]
+    searched = time.perf_counter()
+    out = [_results(index, analysis, query_hits) for analysis, query_hits in zip(analyses, hits)]
+    if timings is not None:
+        timings["search"] = timings.get("search", 0.0) + searched - start
+        timings["evidence"] = timings.get("evidence", 0.0) + time.perf_counter() - searched
     return out
 
 
+async def aretrieve(
+    query: str,
+    k: int = DEFAULT_K,
+    persist_dir: str | Path = DEFAULT_PERSIST_DIR,
+    collection_name: str = COLLECTION_NAME,
+    query_embedding: list[float] | None = None,
+    timings: dict | None = None,
+    analysis: QueryAnalysis | None = None,
+) -> list[dict]:
+    """
+    Async retrieve(): the query is embedded with the async client, and the index
+    lookup (which may load the index from disk) runs in a worker thread.
+    """
+    if query_embedding is None:
+        query_embedding = await _aembed_query(query)
+    return await asyncio.to_thread(
+        retrieve, query, k, persist_dir, collection_name, query_embedding, timings, analysis
+    )
+
+
+async def aretrieve_many(
+    queries: list[str],
+    k: int = DEFAULT_K,
+    persist_dir: str | Path = DEFAULT_PERSIST_DIR,
+    collection_name: str = COLLECTION_NAME,
+    query_embeddings: list[list[float]] | None = None,
+    timings: dict | None = None,
+    analyses: list[QueryAnalysis] | None = None,
+) -> list[list[dict]]:
+    """Async retrieve_many(): one async embeddings request, index lookup in a worker thread."""
+    if query_embeddings is None:
+        query_embeddings = await _aembed_queries(queries) if queries else []
+    return await asyncio.to_thread(
+        retrieve_many, queries, k, persist_dir, collection_name, query_embeddings, timings, analyses
+    )
+
+
 def should_refuse(results: list[dict]) -> tuple[bool, str]:
     """
     Refuse if retrieval quality is insufficient.
@@ -261,6 +611,7 @@ def should_refuse(results: list[dict]) -> tuple[bool, str]:
     if combined_len < 800:
         return True, "Retrieved content too short to answer reliably."
     best_distance = min(r.get("distance", float("inf")) for r in results)
-    if best_distance > DISTANCE_REFUSE_THRESHOLD:
+    threshold = get_backend().refuse_distance or DISTANCE_REFUSE_THRESHOLD
+    if best_distance > threshold:
         return True, "No sufficiently relevant policy documents found."
     return False, ""
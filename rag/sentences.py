@@ -0,0 +1,83 @@
+"""
+Sentence segmentation and question-independent sentence scores.
+Ingest stores both per chunk (metadata key "sentences", a JSON string since Chroma
+metadata values are scalars), so the retriever only adds the keyword part of a
+sentence's score at query time instead of re-splitting and re-scoring every chunk.
+The stored JSON names the rule scoring that produced it (SENTENCE_SCORING); an index
+scored under other rules is ignored, so those chunks are scored per request until
+the next ingest, which re-indexes everything because ingest_params() includes it.
+"""
+
+import hashlib
+import json
+import re
+
+from rag.term_matcher import TermMatcher
+
+SENTENCES_KEY = "sentences"
+
+# Rule-like terms for evidence scoring (policy language)
+RULE_TERMS = ("up to", "within", "must", "required", "prohibited",
+              "may", "cannot", "days", "hours", "approval")
+
+# Bump when _rule_bonus changes in a way RULE_TERMS does not show (e.g. the digit rule)
+SCORING_REVISION = 1
+SENTENCE_SCORING = f"{SCORING_REVISION}-" + hashlib.sha256("\n".join(RULE_TERMS).encode("utf-8")).hexdigest()[:12]
+
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_DIGIT_RE = re.compile(r"\d")
+_RULE_MATCHER = TermMatcher(RULE_TERMS)
+
+
+def _rule_bonus(text: str) -> int:
+    """Bonus points for digits and rule-like keywords (policy language)."""
+    bonus = 1 if _DIGIT_RE.search(text) else 0
+    return bonus + _RULE_MATCHER.count(text)
+
+
+def sentence_spans(text: str) -> list[tuple[int, int]]:
+    """
+    (start, end) of every non-blank sentence in text, whitespace-stripped: the pieces
+    of re.split(r"(?<=[.!?])\\s+|\\n+", text) after .strip(), as offsets.
+    """
+    spans = []
+    start = 0
+    for match in [*_SENTENCE_BREAK_RE.finditer(text), None]:
+        end = match.start() if match else len(text)
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            lead = len(piece) - len(piece.lstrip())
+            spans.append((start + lead, start + lead + len(stripped)))
+        if match:
+            start = match.end()
+    return spans
+
+
+def sentence_index(text: str) -> list[tuple[int, int, int]]:
+    """(start, end, _rule_bonus) per sentence of text, as stored at ingest."""
+    return [(s, e, _rule_bonus(text[s:e])) for s, e in sentence_spans(text)]
+
+
+def dump_sentence_index(text: str) -> str:
+    """sentence_index(text) as a compact JSON string for chunk metadata, tagged with SENTENCE_SCORING."""
+    return json.dumps({"scoring": SENTENCE_SCORING, "spans": sentence_index(text)}, separators=(",", ":"))
+
+
+def load_sentence_index(raw: str | None, text: str) -> list[tuple[int, int, int]] | None:
+    """
+    Parse a stored sentence index; None if missing, scored with other rules than
+    SENTENCE_SCORING, or not consistent with text.
+    """
+    if not raw:
+        return None
+    try:
+        stored = json.loads(raw)
+        if not isinstance(stored, dict) or stored.get("scoring") != SENTENCE_SCORING:
+            return None
+        spans = [(int(s), int(e), int(score)) for s, e, score in stored["spans"]]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if spans and (spans[-1][1] > len(text) or not text[spans[0][0]:spans[0][1]].strip()):
+        return None
+    return spans
@@ -0,0 +1,102 @@
+"""
+Multi-term substring matcher for keyword and rule-term scoring.
+A term set is built once per question (or once per process for the rule terms);
+matches(text) then reports every term that occurs in text.lower() (what
+`term in text.lower()` per term would report), lowercasing the text once.
+
+Small term sets (a short question's keywords plus the rule terms, ~16) are checked
+with one C-level `in` scan per term. From REGEX_MIN_TERMS terms on (long questions
+give that many keywords) the set is compiled into one prefix-trie regex and each
+text is scanned in a single pass, so the cost stops growing with the number of terms.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable
+
+# Per-term scans vs one trie-regex pass, per policy sentence: 5.1 vs 4.1 us at
+# 24 terms, 4.9 vs 5.4 us at 32, 7.6 vs 6.3 us at 48, 20.2 vs 8.4 us at 128
+REGEX_MIN_TERMS = 32
+
+
+def _overlaps(a: str, b: str) -> bool:
+    """True if a proper suffix of a is a proper prefix of b (a match of a could hide b)."""
+    return any(a.endswith(b[:k]) for k in range(1, min(len(a), len(b))))
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Regex matching any of terms, factored by shared prefixes so each position costs
+    one branch per character. Optional suffixes are greedy, so the longest term
+    starting at a position wins.
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return ("(?:" + body + ")" if len(body) > 1 else body) + "?"
+        return body
+
+    return build(trie)
+
+
+class TermMatcher:
+    """
+    Case-insensitive presence test for a fixed set of (lowercase) terms.
+    In regex mode each match also credits the terms it contains, so a term starting
+    at an unmatched position is always found. A term can only be missed if it starts
+    inside another term's match and runs past its end; those few candidates
+    (precomputed per term) are checked directly.
+    """
+
+    def __init__(self, terms: Iterable[str], regex_min_terms: int = REGEX_MIN_TERMS):
+        self.terms = frozenset(t for t in terms if t)
+        self._pattern = None
+        if self.terms and len(self.terms) >= regex_min_terms:
+            self._implied = {t: frozenset(u for u in self.terms if u in t) for t in self.terms}
+            self._hidden = {
+                t: tuple(u for u in self.terms if u not in self._implied[t] and _overlaps(t, u))
+                for t in self.terms
+            }
+            self._pattern = re.compile(_trie_pattern(self.terms))
+
+    def matches(self, text: str) -> set[str]:
+        """Terms occurring in text (case-insensitive)."""
+        if not self.terms or not text:
+            return set()
+        lower = text.lower()
+        if self._pattern is None:
+            return {t for t in self.terms if t in lower}
+        raw = set(self._pattern.findall(lower))
+        found: set[str] = set()
+        for term in raw:
+            found |= self._implied[term]
+        for term in raw:
+            for other in self._hidden[term]:
+                if other not in found and other in lower:
+                    found |= self._implied[other]
+        return found
+
+    def count(self, text: str) -> int:
+        """Number of distinct terms occurring in text."""
+        if not self.terms or not text:
+            return 0
+        if self._pattern is None:
+            lower = text.lower()
+            return sum(1 for t in self.terms if t in lower)
+        return len(self.matches(text))
+
+
+@lru_cache(maxsize=256)
+def term_matcher(terms: frozenset[str]) -> TermMatcher:
+    """Shared matcher for a term set (questions repeat, so keyword sets do too)."""
+    return TermMatcher(terms)
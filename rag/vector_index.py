@@ -0,0 +1,420 @@
+"""
+In-process vector index: the whole collection held in memory as a NumPy matrix.
+Loaded once (at app startup or on first query) and reloaded when the index on disk
+changes, so the /chat path never reopens Chroma per request.
+
+Two sources: the Chroma collection itself, or the compact export written by
+rag.ingest (memory-mapped, so several uvicorn workers share it via the page cache).
+Export layout in <index>/export/:
+  meta.json          format version, dtype, shape, embed model, digest of the
+                     ingest manifest it was built from, and the data directory
+                     of this version (replaced atomically, last)
+  v<ns>/             one directory per written version (the previous one is kept):
+    embeddings.npy     normalized vectors, float32 / float16 / int8 (N x dim)
+    scales.npy         int8 only: per-row dequantization scale (N,)
+    texts.bin          UTF-8 chunk texts, concatenated
+    text_offsets.npy   int64 byte offsets into texts.bin (N + 1,)
+    columns.json       ids and metadata as one list per field
+Format version 1 exports kept the data files next to meta.json; they still load.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Written by rag.ingest after every checkpoint; its mtime marks a new index version
+MANIFEST_NAME = "manifest.json"
+CHROMA_DB_NAME = "chroma.sqlite3"
+
+# Export format
+EXPORT_DIR_NAME = "export"
+EXPORT_META_NAME = "meta.json"
+EXPORT_FORMAT = "policy-rag-index"
+EXPORT_FORMAT_VERSION = 2
+# Data directories kept: the current one and the one before it, for readers still opening it
+EXPORT_KEEP_VERSIONS = 2
+_EXPORT_DATA_FILES = ("embeddings.npy", "scales.npy", "texts.bin", "text_offsets.npy", "columns.json")
+EXPORT_DTYPES = ("float32", "float16", "int8")
+
+# Backend: chroma, export, or auto (export when present, else chroma)
+INDEX_BACKENDS = ("auto", "chroma", "export")
+INDEX_BACKEND = os.environ.get("RAG_INDEX_BACKEND", "auto")
+
+# Rows scored per block when the matrix is not float32 (bounds the upcast copy)
+SCORE_BLOCK_ROWS = 8192
+
+
+def _stat_version(path: Path) -> tuple | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (path.name, st.st_mtime_ns, st.st_size)
+
+
+def index_version(persist_dir: str | Path) -> tuple | None:
+    """
+    Cheap on-disk version key for an index: (mtime_ns, size) of the ingest manifest,
+    or of the Chroma database for indexes built without one. None if neither exists.
+    """
+    persist_dir = Path(persist_dir)
+    for name in (MANIFEST_NAME, CHROMA_DB_NAME):
+        version = _stat_version(persist_dir / name)
+        if version is not None:
+            return version
+    return None
+
+
+def similarity_to_distance(similarity: float) -> float:
+    """Squared L2 distance between unit vectors with the given cosine similarity."""
+    return float(max(0.0, 2.0 - 2.0 * similarity))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length (zero rows stay zero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class _TextColumn:
+    """Read-only sequence of strings decoded on access from a memory-mapped blob."""
+
+    def __init__(self, blob: np.ndarray | bytes, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class VectorIndex:
+    """
+    Normalized embedding matrix plus per-row ids, texts and metadata.
+    Distances are squared L2 between unit vectors (2 - 2 * cosine), the same scale
+    Chroma reports for the collection built by rag.ingest.
+    `matrix` must already be row-normalized; int8 matrices come with per-row `scales`.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        matrix: np.ndarray,
+        texts,
+        metadatas: list[dict],
+        version: tuple | None = None,
+        scales: np.ndarray | None = None,
+        embed_model: str | None = None,
+    ):
+        self.ids = ids
+        self.matrix = matrix
+        self.scales = scales
+        self.texts = texts
+        self.metadatas = metadatas
+        self.version = version
+        # Embedding model the vectors came from, as recorded at ingest (None if unknown)
+        self.embed_model = embed_model
+        self._rows_by_id = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_chroma(cls, persist_dir: str | Path, collection_name: str) -> "VectorIndex":
+        """Read every row of a Chroma collection into memory."""
+        import chromadb
+
+        version = index_version(persist_dir)
+        client = chromadb.PersistentClient(path=str(persist_dir))
+        collection = client.get_collection(name=collection_name)
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            embeddings = np.zeros((0, 1), dtype=np.float32)
+        return cls(
+            ids=list(data["ids"]),
+            matrix=_normalize(np.asarray(embeddings, dtype=np.float32)),
+            texts=[t or "" for t in data["documents"]],
+            metadatas=[m or {} for m in data["metadatas"]],
+            version=version,
+            embed_model=(collection.metadata or {}).get("embed_model"),
+        )
+
+    @classmethod
+    def from_export(cls, export_dir: str | Path) -> "VectorIndex":
+        """
+        Open an export written by write_export(); vectors and texts are memory-mapped.
+        If a concurrent write_export() replaces meta.json while the files are being
+        opened, meta.json is read again and the new version is opened instead.
+        """
+        export_dir = Path(export_dir)
+        meta_path = export_dir / EXPORT_META_NAME
+        for attempt in range(3):
+            version = _stat_version(meta_path)
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            try:
+                return cls._open_export(export_dir, meta, version)
+            except (OSError, ValueError):
+                if attempt == 2 or _stat_version(meta_path) == version:
+                    raise
+
+    @classmethod
+    def _open_export(cls, export_dir: Path, meta: dict, version: tuple | None) -> "VectorIndex":
+        if meta.get("format") != EXPORT_FORMAT or meta.get("version") not in (1, EXPORT_FORMAT_VERSION):
+            raise ValueError(
+                f"Unsupported index export {meta.get('format')!r} v{meta.get('version')} in {export_dir}"
+            )
+        data_dir = export_dir / meta["data_dir"] if meta.get("data_dir") else export_dir
+        count = meta["count"]
+        matrix = np.load(data_dir / "embeddings.npy", mmap_mode="r")
+        if matrix.shape != (count, meta["dim"]) or str(matrix.dtype) != meta["dtype"]:
+            raise ValueError(f"Index export in {export_dir} is inconsistent with its meta.json")
+        scales = np.load(data_dir / "scales.npy", mmap_mode="r") if meta["dtype"] == "int8" else None
+        offsets = np.load(data_dir / "text_offsets.npy")
+        blob = np.memmap(data_dir / "texts.bin", dtype=np.uint8, mode="r") if offsets[-1] else b""
+        columns = json.loads((data_dir / "columns.json").read_text(encoding="utf-8"))
+        ids = columns.pop("id")
+        metadatas = [
+            {name: values[i] for name, values in columns.items() if values[i] is not None}
+            for i in range(count)
+        ]
+        return cls(
+            ids=ids,
+            matrix=matrix,
+            texts=_TextColumn(blob, offsets),
+            metadatas=metadatas,
+            version=version,
+            scales=scales,
+            embed_model=meta.get("embed_model"),
+        )
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row with a unit query vector, or with each column of a (dim, q) matrix of them."""
+        if self.matrix.dtype == np.float32:
+            scores = self.matrix @ query
+        else:
+            scores = np.empty((len(self.ids),) + query.shape[1:], dtype=np.float32)
+            for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+                block = np.asarray(self.matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query
+        if self.scales is not None:
+            scores = scores * self.scales.reshape((-1,) + (1,) * (query.ndim - 1))
+        return scores
+
+    def row_of(self, id_: str) -> int | None:
+        """Row holding chunk id_, or None."""
+        if self._rows_by_id is None:
+            self._rows_by_id = {id_: row for row, id_ in enumerate(self.ids)}
+        return self._rows_by_id.get(id_)
+
+    def similarities(self, query_embedding: list[float]) -> np.ndarray:
+        """Cosine similarity of every row with query_embedding."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        return self._scores(query)
+
+    def similarities_many(self, query_embeddings: list[list[float]]) -> np.ndarray:
+        """Cosine similarities for several queries in one matrix product. Returns (queries, rows)."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.size == 0:
+            return np.zeros((len(queries), len(self.ids)), dtype=np.float32)
+        queries = _normalize(queries)
+        return np.ascontiguousarray(self._scores(queries.T).T)
+
+    def search(self, query_embedding: list[float], k: int) -> list[tuple[int, float]]:
+        """Top-k rows by cosine similarity. Returns [(row, distance)] nearest first."""
+        n = len(self.ids)
+        if n == 0 or k <= 0:
+            return []
+        scores = self.similarities(query_embedding)
+        k = min(k, n)
+        if k < n:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [(int(i), similarity_to_distance(scores[i])) for i in top]
+
+
+def read_export_meta(persist_dir: str | Path) -> dict | None:
+    """meta.json of the export under persist_dir, or None if there is none."""
+    path = Path(persist_dir) / EXPORT_DIR_NAME / EXPORT_META_NAME
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _quantize_int8(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization: row ~= q * scale."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+def _write_atomic(path: Path, write) -> None:
+    """Write through a temp file in the same directory, then rename over path."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def write_export(
+    persist_dir: str | Path,
+    collection_name: str,
+    dtype: str = "float32",
+    embed_model: str | None = None,
+    source: VectorIndex | None = None,
+    source_digest: str | None = None,
+) -> dict:
+    """
+    Export a Chroma collection to the memory-mappable format under persist_dir/export.
+    Pass `source` to reuse an already loaded snapshot of the collection, and
+    `source_digest` to record which ingest manifest the snapshot belongs to.
+    The data files go to a new version directory and meta.json, replaced last and
+    atomically, switches readers over to it, so they never pick up a half-written
+    or mixed version. Returns the written meta.
+    """
+    if dtype not in EXPORT_DTYPES:
+        raise ValueError(f"Unknown export dtype {dtype!r}; expected one of {', '.join(EXPORT_DTYPES)}")
+    if source is None:
+        source = VectorIndex.from_chroma(persist_dir, collection_name)
+    export_dir = Path(persist_dir) / EXPORT_DIR_NAME
+    data_name = f"v{time.time_ns()}"
+    data_dir = export_dir / data_name
+    data_dir.mkdir(parents=True)
+
+    matrix = source.matrix
+    if dtype == "int8":
+        matrix, scales = _quantize_int8(matrix)
+        np.save(data_dir / "scales.npy", scales)
+    else:
+        matrix = matrix.astype(dtype)
+    np.save(data_dir / "embeddings.npy", matrix)
+
+    encoded = [t.encode("utf-8") for t in source.texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    (data_dir / "texts.bin").write_bytes(b"".join(encoded))
+    np.save(data_dir / "text_offsets.npy", offsets)
+
+    fields = sorted({name for meta in source.metadatas for name in meta})
+    columns = {"id": source.ids}
+    columns.update({name: [meta.get(name) for meta in source.metadatas] for name in fields})
+    (data_dir / "columns.json").write_text(json.dumps(columns), encoding="utf-8")
+
+    meta = {
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_FORMAT_VERSION,
+        "dtype": dtype,
+        "count": len(source.ids),
+        "dim": int(matrix.shape[1]),
+        "embed_model": embed_model or source.embed_model,
+        "source_digest": source_digest,
+        "data_dir": data_name,
+        "created_at": int(time.time()),
+    }
+    _write_atomic(export_dir / EXPORT_META_NAME, lambda f: f.write(json.dumps(meta, indent=2).encode("utf-8")))
+    _prune_export(export_dir)
+    return meta
+
+
+def _prune_export(export_dir: Path) -> None:
+    """Remove all but the newest EXPORT_KEEP_VERSIONS data directories, and version 1 data files."""
+    versions = sorted((p for p in export_dir.glob("v*") if p.name[1:].isdigit()), key=lambda p: int(p.name[1:]))
+    for old in versions[:-EXPORT_KEEP_VERSIONS]:
+        shutil.rmtree(old, ignore_errors=True)
+    for name in _EXPORT_DATA_FILES:
+        (export_dir / name).unlink(missing_ok=True)
+
+
+def _resolve_backend(persist_dir: str | Path, backend: str | None) -> str:
+    """Concrete backend ("chroma" or "export") for persist_dir."""
+    backend = backend or INDEX_BACKEND
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend {backend!r}; expected one of {', '.join(INDEX_BACKENDS)}")
+    if backend == "auto":
+        meta_path = Path(persist_dir) / EXPORT_DIR_NAME / EXPORT_META_NAME
+        return "export" if meta_path.exists() else "chroma"
+    return backend
+
+
+def _source_version(persist_dir: str | Path, backend: str) -> tuple | None:
+    if backend == "export":
+        return _stat_version(Path(persist_dir) / EXPORT_DIR_NAME / EXPORT_META_NAME)
+    return index_version(persist_dir)
+
+
+def current_version(persist_dir: str | Path, backend: str | None = None) -> tuple | None:
+    """On-disk version of the index get_index() would serve, without loading it."""
+    backend = _resolve_backend(persist_dir, backend)
+    return (backend,) + (_source_version(persist_dir, backend) or ())
+
+
+_indexes: dict[tuple[str, str, str], VectorIndex] = {}
+_lock = threading.Lock()
+# Held while an index is (re)loaded, per key: concurrent requests load it once
+_load_locks: dict[tuple[str, str, str], threading.Lock] = {}
+
+
+def load_index(persist_dir: str | Path, collection_name: str, backend: str | None = None) -> VectorIndex:
+    """(Re)load an index from disk and make it the shared in-process copy."""
+    backend = _resolve_backend(persist_dir, backend)
+    key = (str(Path(persist_dir).resolve()), collection_name, backend)
+    start = time.perf_counter()
+    if backend == "export":
+        index = VectorIndex.from_export(Path(persist_dir) / EXPORT_DIR_NAME)
+    else:
+        index = VectorIndex.from_chroma(persist_dir, collection_name)
+    with _lock:
+        _indexes[key] = index
+    logging.info(
+        f"Loaded vector index {collection_name!r} ({backend}): {len(index)} rows "
+        f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return index
+
+
+def get_index(persist_dir: str | Path, collection_name: str, backend: str | None = None) -> VectorIndex:
+    """
+    Shared in-process index for persist_dir. Loaded on first use and reloaded
+    whenever the source on disk changes (e.g. after python -m rag.ingest).
+    backend defaults to RAG_INDEX_BACKEND (auto: the export when present, else Chroma).
+    """
+    backend = _resolve_backend(persist_dir, backend)
+    key = (str(Path(persist_dir).resolve()), collection_name, backend)
+    index = _indexes.get(key)
+    if index is not None and index.version == _source_version(persist_dir, backend):
+        return index
+    with _lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+    # One thread per index loads; the others wait for it and reuse its result
+    with load_lock:
+        # Another thread may have reloaded while we waited
+        index = _indexes.get(key)
+        if index is not None and index.version == _source_version(persist_dir, backend):
+            return index
+        return load_index(persist_dir, collection_name, backend)
+
+
+def clear_indexes() -> None:
+    """Drop every loaded index (next get_index() reloads from disk)."""
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,48 @@
+"""
+Answer cache tests (exact and semantic tiers, TTL, LRU, index-version invalidation).
+"""
+
+from app.answer_cache import AnswerCache, normalize_question
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_exact_tier_matches_normalized_question():
+    cache = AnswerCache()
+    cache.put("How many PTO days carry over?", {"answer": "5"}, index_version=1)
+    assert normalize_question("  how many PTO  days carry over ") == "how many pto days carry over"
+    assert cache.get_exact("how many pto days carry over", 1) == {"answer": "5"}
+    assert cache.get_exact("Who approves remote work?", 1) is None
+
+
+def test_semantic_tier_uses_threshold_and_numbers():
+    cache = AnswerCache(similarity=0.9)
+    cache.put("Can I carry over 5 days?", {"answer": "yes"}, 1, embedding=[1.0, 0.0, 0.0])
+    assert cache.get_similar("Is carrying over 5 days allowed?", [0.99, 0.1, 0.0], 1) == {"answer": "yes"}
+    assert cache.get_similar("Can I expense a laptop?", [0.5, 0.8, 0.0], 1) is None
+    # Near-identical wording but a different number is a different question
+    assert cache.get_similar("Can I carry over 10 days?", [0.99, 0.1, 0.0], 1) is None
+
+
+def test_ttl_lru_and_index_version_invalidation():
+    clock = FakeClock()
+    cache = AnswerCache(max_entries=2, ttl_s=60, clock=clock)
+    cache.put("a question", {"answer": "a"}, 1)
+    cache.put("b question", {"answer": "b"}, 1)
+    cache.get_exact("a question", 1)
+    cache.put("c question", {"answer": "c"}, 1)
+    assert cache.get_exact("b question", 1) is None
+    assert cache.get_exact("a question", 1) == {"answer": "a"}
+
+    clock.now = 61
+    assert cache.get_exact("a question", 1) is None
+
+    cache.put("d question", {"answer": "d"}, 1)
+    assert cache.get_exact("d question", 2) is None
+    assert len(cache) == 0
@@ -0,0 +1,179 @@
+"""
+Async /chat and /chat/stream tests against the local fake OpenAI server.
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import main
+from eval.fake_openai import FAKE_ANSWER, FakeOpenAIServer
+
+CONTEXTS = [
+    {"doc_id": "pto.md", "title": "PTO", "section": None, "snippet": "Up to 5 days carry over.",
+     "text": "Employees may carry over up to 5 days of PTO with approval. " * 10, "distance": 0.2},
+    {"doc_id": "pto.md", "title": "PTO", "section": None, "snippet": "Requests need approval.",
+     "text": "PTO requests must be approved within 2 days. " * 10, "distance": 0.3},
+]
+
+
+def test_concurrent_chat_requests_overlap(monkeypatch):
+    with FakeOpenAIServer(chat_latency_ms=300) as fake:
+        monkeypatch.setenv("OPENAI_BASE_URL", fake.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        monkeypatch.setattr(main, "answer_cache", None)
+
+        async def run(n):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                return await asyncio.gather(*(
+                    client.post("/chat", json={"question": f"How many PTO days carry over? ({i})"})
+                    for i in range(n)
+                ))
+
+        with patch("app.main.index_ready", return_value=True), \
+                patch("app.main._aembed_query", AsyncMock(return_value=[1.0, 0.0])), \
+                patch("app.main.aretrieve", AsyncMock(return_value=CONTEXTS)):
+            responses = asyncio.run(run(8))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert all("[1]" in r.json()["answer"] for r in responses)
+    assert fake.chat_requests == 8
+    # Serialized, the fake server would never see more than one completion at a time
+    assert fake.max_in_flight >= 4
+
+
+def _parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_chat_stream_sends_citations_tokens_then_final(monkeypatch):
+    with FakeOpenAIServer() as fake:
+        monkeypatch.setenv("OPENAI_BASE_URL", fake.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        monkeypatch.setattr(main, "answer_cache", None)
+
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                return await client.post("/chat/stream", json={"question": "How many PTO days carry over?"})
+
+        with patch("app.main.index_ready", return_value=True), \
+                patch("app.main._aembed_query", AsyncMock(return_value=[1.0, 0.0])), \
+                patch("app.main.aretrieve", AsyncMock(return_value=CONTEXTS)):
+            resp = asyncio.run(run())
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    names = [name for name, _ in events]
+    assert names[0] == "citations" and names[-1] == "final"
+    assert set(names[1:-1]) == {"token"}
+    assert [c["doc_id"] for c in events[0][1]["citations"]] == ["pto.md", "pto.md"]
+    assert "".join(data["text"] for name, data in events if name == "token") == FAKE_ANSWER
+
+    final = events[-1][1]
+    assert final["answer"].startswith(FAKE_ANSWER)
+    assert '\nQuote: "' in final["answer"]
+    assert [c["doc_id"] for c in final["citations"]] == ["pto.md"]
+
+
+def test_chat_stream_computes_snippets_for_cited_chunks_only(monkeypatch):
+    read = []
+
+    class LazySnippet(dict):
+        def __missing__(self, key):
+            if key != "snippet":
+                raise KeyError(key)
+            read.append(self["text"])
+            self["snippet"] = self["text"][:40]
+            return self["snippet"]
+
+    contexts = [LazySnippet({k: v for k, v in c.items() if k != "snippet"}) for c in CONTEXTS]
+    with FakeOpenAIServer() as fake:
+        monkeypatch.setenv("OPENAI_BASE_URL", fake.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        monkeypatch.setattr(main, "answer_cache", None)
+        with patch("app.main.index_ready", return_value=True), \
+                patch("app.main._aembed_query", AsyncMock(return_value=[1.0, 0.0])), \
+                patch("app.main.aretrieve", AsyncMock(return_value=contexts)):
+            resp = TestClient(main.app).post("/chat/stream", json={"question": "How many PTO days carry over?"})
+
+    events = _parse_sse(resp.text)
+    assert all(set(c) == {"doc_id", "title", "section"} for c in events[0][1]["citations"])
+    # The answer cites [1] only; the second chunk's evidence is never extracted
+    assert read == [CONTEXTS[0]["text"]]
+    assert events[-1][1]["citations"][0]["snippet"]
+
+
+def test_chat_stream_refusal_is_a_single_final_event():
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main.answer_cache", None), \
+            patch("app.main._aembed_query", AsyncMock(return_value=[1.0, 0.0])), \
+            patch("app.main.aretrieve", AsyncMock(return_value=[])):
+        resp = TestClient(main.app).post("/chat/stream", json={"question": "What is on the cafeteria menu?"})
+
+    events = _parse_sse(resp.text)
+    assert [name for name, _ in events] == ["final"]
+    assert "cannot" in events[0][1]["answer"].lower()
+
+
+def test_chat_batch_embeds_once_and_bounds_completions(monkeypatch):
+    questions = [f"How many PTO days carry over? ({i})" for i in range(6)]
+    contexts = [CONTEXTS] * 6
+    contexts[2] = []  # refused without a completion
+    embed = AsyncMock(side_effect=lambda qs, **kwargs: [[1.0, 0.0]] * len(qs))
+    with FakeOpenAIServer(chat_latency_ms=100) as fake:
+        monkeypatch.setenv("OPENAI_BASE_URL", fake.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        monkeypatch.setattr(main, "answer_cache", None)
+        monkeypatch.setattr(main, "BATCH_CONCURRENCY", 2)
+
+        with patch("app.main.index_ready", return_value=True), \
+                patch("app.main._aembed_queries", embed), \
+                patch("app.main.aretrieve_many", AsyncMock(return_value=contexts)) as retrieve_many:
+            resp = TestClient(main.app).post("/chat/batch", json={"questions": [f"  {q} " for q in questions]})
+
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert len(results) == 6
+    assert embed.await_count == 1 and embed.await_args.args[0] == questions
+    assert retrieve_many.await_args.args[0] == questions
+    assert "cannot" in results[2]["answer"].lower()
+    assert all(r["answer"].startswith(FAKE_ANSWER) for i, r in enumerate(results) if i != 2)
+    assert fake.chat_requests == 5
+    assert fake.max_in_flight <= 2
+
+
+def test_chat_batch_keeps_other_answers_when_one_completion_fails(monkeypatch):
+    questions = [f"How many PTO days carry over? ({i})" for i in range(4)]
+    monkeypatch.setattr(main, "answer_cache", None)
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+
+    async def complete(question, contexts):
+        if question.endswith("(1)"):
+            raise RuntimeError("upstream 500")
+        return "You may carry over up to 5 days [1]."
+
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main._aembed_queries", AsyncMock(side_effect=lambda qs, **kwargs: [[1.0, 0.0]] * len(qs))), \
+            patch("app.main.aretrieve_many", AsyncMock(return_value=[CONTEXTS] * 4)), \
+            patch("app.main._complete", complete):
+        resp = TestClient(main.app).post("/chat/batch", json={"questions": questions})
+
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert results[1]["error"] == "RuntimeError: upstream 500" and results[1]["citations"] == []
+    assert all(r["error"] is None and r["citations"] for i, r in enumerate(results) if i != 1)
+
+
+def test_chat_batch_rejects_empty_and_short_questions():
+    client = TestClient(main.app)
+    assert client.post("/chat/batch", json={"questions": []}).status_code == 422
+    assert client.post("/chat/batch", json={"questions": ["What is PTO?", " a "]}).status_code == 422
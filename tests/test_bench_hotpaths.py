@@ -0,0 +1,38 @@
+"""
+Hot-path benchmark harness tests (workload shape and threshold checks; no timing assertions).
+"""
+
+from eval import bench_hotpaths
+
+DOCS = [
+    {"filename": "pto.md", "text": "# PTO\n\nEmployees may carry over up to 5 days with approval. " * 40, "pages": []},
+    {"filename": "remote.md", "text": "# Remote\n\nRemote work requires manager approval within 2 days. " * 40,
+     "pages": []},
+]
+
+
+def test_benchmarks_cover_every_hot_path():
+    questions = ["How many PTO days carry over?", "Who approves remote work?"]
+    scaled_docs = bench_hotpaths.synthetic_docs(DOCS, 3)
+    assert len(scaled_docs) == 6
+    assert "up to 7 days" in scaled_docs[4]["text"]
+
+    results = bench_hotpaths.run_benchmarks(bench_hotpaths.build_workload(scaled_docs, questions, all_pairs=False))
+    assert set(results) == set(bench_hotpaths.BENCHMARKS) | {"build_chunks"}
+    assert all(r["units"] > 0 and r["per_unit_us"] > 0 for r in results.values())
+
+
+def test_check_flags_budget_and_scaling_regressions():
+    def result(us):
+        return {"unit": "chunk", "units": 10, "per_unit_us": us, "total_ms": us / 100}
+
+    thresholds = {"max_scaling_ratio": 3.0, "per_unit_us": {"split_sentences": 50.0, "pick_verbatim_quote": 500.0}}
+    ok = {"real": {"split_sentences": result(20.0)}, "scaled": {"split_sentences": result(30.0)}}
+    assert bench_hotpaths.check(ok, thresholds, budgets=True) == []
+
+    slow = {"real": {"pick_verbatim_quote": result(100.0)}, "scaled": {"pick_verbatim_quote": result(450.0)}}
+    assert bench_hotpaths.check(slow, thresholds) == ["pick_verbatim_quote: scaled/real per-unit cost 4.50x > 3.00x"]
+    over = {"real": {"split_sentences": result(60.0)}}
+    assert bench_hotpaths.check(over, thresholds, budgets=True) == ["split_sentences (real): 60.0 us/chunk > budget 50.0"]
+    # Absolute budgets depend on the machine, so only --check-budgets applies them
+    assert bench_hotpaths.check(over, thresholds) == []
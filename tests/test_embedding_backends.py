@@ -0,0 +1,107 @@
+"""
+Embedding backend tests: the local backend, offline ingest + retrieval with it, and
+the model-identity check between an index and the query embeddings. No API keys required.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from eval import calibrate_refusal, run_eval
+from rag import bm25, embedding_backends, ingest, retriever, vector_index
+from rag.embedding_backends import LocalHashingBackend, get_backend
+
+
+def test_local_backend_is_deterministic_and_normalized():
+    backend = LocalHashingBackend(dim=128)
+    a, b = backend.embed(["Remote work needs manager approval.", "Remote work needs manager approval."])
+    assert len(a) == 128 and a == b
+    assert np.linalg.norm(a) == pytest.approx(1.0, abs=1e-5)
+    assert backend.embed([""])[0] == [0.0] * 128
+    assert backend.model_id == "local-hash-v1-d128"
+
+    query = np.array(backend.embed(["Who approves remote work?"])[0])
+    related, unrelated = np.array(backend.embed(["Remote work requires approval.", "Expense receipts are due monthly."]))
+    assert query @ related > query @ unrelated
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        get_backend("nope")
+
+
+def test_backend_base_requires_embed_and_openai_key_message_is_neutral(monkeypatch):
+    with pytest.raises(TypeError):
+        embedding_backends.EmbeddingBackend()
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(ValueError, match="must be set for OpenAI embeddings"):
+        get_backend("openai").embed(["Who approves remote work?"])
+
+
+def test_refusal_calibration_is_held_out_and_picks_a_separating_threshold():
+    def questions(path):
+        return {json.loads(line)["question"] for line in path.read_text(encoding="utf-8").splitlines() if line}
+
+    assert not questions(calibrate_refusal.CALIBRATION_PATH) & questions(run_eval.QUESTIONS_PATH)
+    threshold, accuracy = calibrate_refusal.best_threshold([1.2, 1.4, 1.5], [1.45, 1.7, 1.8])
+    assert threshold == pytest.approx(1.425) and accuracy == pytest.approx(5 / 6)
+
+
+@pytest.fixture
+def offline_corpus(tmp_path, monkeypatch):
+    data_dir = tmp_path / "policies"
+    data_dir.mkdir()
+    for i, topic in enumerate(["PTO", "Remote", "Expenses", "Security"]):
+        body = f"# {topic}\n\n" + f"{topic} rule {i}: {topic.lower()} requests need approval within {i + 2} days. " * 20
+        (data_dir / f"{topic.lower()}.md").write_text(body, encoding="utf-8")
+    monkeypatch.setattr(ingest, "DATA_DIR", data_dir)
+    monkeypatch.setattr(ingest, "INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(embedding_backends, "EMBED_BACKEND", "local")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("RAG_EMBED_CACHE", "0")
+    vector_index.clear_indexes()
+    bm25.clear_indexes()
+    yield tmp_path / "index"
+    vector_index.clear_indexes()
+    bm25.clear_indexes()
+
+
+@pytest.mark.parametrize("backend", ["chroma", "export"])
+def test_offline_ingest_and_retrieve_with_local_backend(offline_corpus, monkeypatch, backend):
+    ingest.run(chunk_tokens=60, overlap_tokens=10)
+    model_id = get_backend().model_id
+    assert ingest.load_manifest(offline_corpus)["params"]["embed_model"] == model_id
+    assert json.loads((offline_corpus / "export" / "meta.json").read_text())["embed_model"] == model_id
+    assert vector_index.get_index(offline_corpus, ingest.COLLECTION_NAME, backend=backend).embed_model == model_id
+
+    monkeypatch.setenv("RAG_INDEX_BACKEND", backend)
+    timings = retriever.warm_up(offline_corpus)
+    assert {"embedder", "index", "bm25", "search"} <= timings.keys()
+    results = retriever.retrieve("How many days for expenses approval?", k=3, persist_dir=offline_corpus)
+    assert results and results[0]["doc_id"] == "expenses.md"
+
+    # Queries embedded in another space are refused instead of silently mis-ranked
+    monkeypatch.setattr(embedding_backends, "EMBED_BACKEND", "openai")
+    with pytest.raises(ValueError, match="embedding model"):
+        retriever.retrieve_many(["expenses"], persist_dir=offline_corpus, query_embeddings=[[0.1] * 512])
+
+
+def test_changing_backend_rebuilds_the_index(offline_corpus, monkeypatch):
+    ingest.run(chunk_tokens=60, overlap_tokens=10)
+
+    embedded = []
+
+    def fake_openai_embed(chunks, **kwargs):
+        embedded.extend(c["doc_id"] for c in chunks)
+        return [[float(len(c["text"])), 1.0, 0.0] for c in chunks]
+
+    monkeypatch.setattr(embedding_backends, "EMBED_BACKEND", "openai")
+    monkeypatch.setattr(ingest, "embed_chunks", fake_openai_embed)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    ingest.run(chunk_tokens=60, overlap_tokens=10)
+
+    assert set(embedded) == {"pto.md", "remote.md", "expenses.md", "security.md"}
+    assert vector_index.get_index(offline_corpus, ingest.COLLECTION_NAME, backend="chroma").embed_model == \
+        get_backend("openai").model_id
@@ -0,0 +1,207 @@
+"""
+Embedding cache and batch executor tests. Uses a local fake server; no API keys required.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pytest
+from openai import OpenAI
+
+from eval.fake_openai import FakeOpenAIServer, fake_embedding
+from rag.embed_cache import EmbeddingCache, cached_embed
+from rag.embedder import EmbeddingExecutor, make_batches
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = EmbeddingCache(tmp_path / "embeddings.sqlite", max_entries=10)
+    yield c
+    c.close()
+
+
+def test_cached_embed_only_calls_api_for_misses(cache):
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+
+    first = cached_embed(["alpha", "beta", "alpha"], "m", embed, cache=cache)
+    assert calls == [["alpha", "beta"]]
+    assert first == [[5.0, 0.5], [4.0, 0.5], [5.0, 0.5]]
+
+    second = cached_embed(["beta", "gamma"], "m", embed, cache=cache)
+    assert calls[-1] == ["gamma"]
+    assert second == [[4.0, 0.5], [5.0, 0.5]]
+
+    # Same text under another model is a different key
+    cached_embed(["alpha"], "other-model", embed, cache=cache)
+    assert calls[-1] == ["alpha"]
+
+    # Hits and misses count input texts: a repeated uncached text is two misses
+    stats = {}
+    cached_embed(["delta", "delta", "beta"], "m", embed, cache=cache, stats=stats)
+    assert stats == {"hits": 1, "misses": 2}
+
+
+def test_cache_persists_across_instances(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    c1 = EmbeddingCache(path)
+    c1.put_many("m", ["hello"], [[0.25, -1.0]])
+    c1.close()
+
+    c2 = EmbeddingCache(path)
+    assert c2.get_many("m", ["hello", "missing"]) == [[0.25, -1.0], None]
+    c2.close()
+
+
+def test_cache_evicts_least_recently_used(cache):
+    cache.put_many("m", ["keep"], [[1.0]])
+    cache.put_many("m", [f"t{i}" for i in range(5)], [[float(i)] for i in range(5)])
+    time.sleep(0.01)
+    cache.get_many("m", ["keep"])
+    time.sleep(0.01)
+    cache.put_many("m", [f"u{i}" for i in range(6)], [[float(i)] for i in range(6)])
+
+    assert len(cache) <= cache.max_entries
+    assert cache.get_many("m", ["keep"]) == [[1.0]]
+    assert cache.get_many("m", ["t0"]) == [None]
+
+
+def test_inserts_do_not_count_the_table(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite", max_entries=1000)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for i in range(20):
+        cache.put_many("m", [f"t{i}"], [[float(i)]])
+    assert not [s for s in statements if "COUNT(*)" in s]
+
+    # Past max_entries the count is exact again and eviction still bounds the table
+    cache.max_entries = 10
+    cache.put_many("m", ["u"], [[1.0]])
+    assert len(cache) <= 10
+    cache.close()
+
+
+def test_cache_hits_buffer_lru_touches(cache):
+    cache.put_many("m", ["hello"], [[1.0]])
+
+    def last_used():
+        with sqlite3.connect(cache.path) as conn:
+            return conn.execute("SELECT last_used FROM embeddings").fetchone()[0]
+
+    written = last_used()
+    time.sleep(0.01)
+    assert cache.get_many("m", ["hello"]) == [[1.0]]
+    assert last_used() == written  # the read path does not write
+    cache.flush()
+    assert last_used() > written
+
+
+def test_hits_and_misses_return_the_same_values(cache, monkeypatch):
+    def embed(texts):
+        return [[0.1, 1 / 3] for _ in texts]
+
+    miss = cached_embed(["x"], "m", embed, cache=cache)
+    hit = cached_embed(["x"], "m", embed, cache=cache)
+    monkeypatch.setenv("RAG_EMBED_CACHE", "0")
+    disabled = cached_embed(["x"], "m", embed)
+    assert miss == hit == disabled == [np.float32([0.1, 1 / 3]).tolist()]
+
+
+def test_make_batches_respects_token_and_item_budgets():
+    assert make_batches([5, 5, 5, 5], max_batch_tokens=10, max_batch_items=10) == [[0, 1], [2, 3]]
+    assert make_batches([5, 5, 5], max_batch_tokens=100, max_batch_items=2) == [[0, 1], [2]]
+    # Oversized inputs still get sent, alone
+    assert make_batches([50, 1, 1], max_batch_tokens=10, max_batch_items=10) == [[0], [1, 2]]
+
+
+def test_executor_concurrent_batches_keep_input_order():
+    texts = [f"policy sentence number {i}" for i in range(40)]
+    with FakeOpenAIServer(latency_ms=50) as server:
+        executor = EmbeddingExecutor(
+            model="fake",
+            client=OpenAI(base_url=server.base_url, api_key="fake", max_retries=0),
+            max_concurrency=4,
+            max_batch_tokens=10,
+            count_tokens=lambda t: 5,
+        )
+        vectors = executor.embed(texts)
+
+    assert len(server.batch_sizes) == 20
+    assert server.max_in_flight > 1
+    for text, vec in zip(texts, vectors):
+        np.testing.assert_allclose(vec, fake_embedding(text, server.dim), rtol=1e-6)
+    assert executor.stats.texts == 40
+    assert executor.stats.requests == 20
+    assert executor.stats.texts_per_s > 0
+
+
+def test_executor_retries_rate_limits():
+    with FakeOpenAIServer(fail_first=2) as server:
+        executor = EmbeddingExecutor(
+            model="fake",
+            client=OpenAI(base_url=server.base_url, api_key="fake", max_retries=0),
+            max_concurrency=1,
+            sleep=lambda s: None,
+        )
+        vectors = executor.embed(["carryover limit is five days"])
+
+    assert executor.stats.retries == 2
+    assert server.requests == 3
+    np.testing.assert_allclose(vectors[0], fake_embedding("carryover limit is five days", server.dim), rtol=1e-6)
+
+
+def test_shared_client_reuses_pooled_connections(monkeypatch):
+    from rag import clients, retriever
+
+    with FakeOpenAIServer() as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "fake")
+        asyncio.run(clients.shutdown())
+        try:
+            for i in range(5):
+                retriever._embed_texts([f"question {i}"])
+
+            async def embed_async():
+                for i in range(5):
+                    await retriever._aembed_texts([f"async question {i}"])
+
+            asyncio.run(embed_async())
+            assert clients.get_client() is clients.get_client()
+        finally:
+            asyncio.run(clients.shutdown())
+
+    assert server.requests == 10
+    # One keep-alive connection per client, not one per request
+    assert server.connections == 2
+
+
+def test_async_client_replaced_from_another_loop_is_closed(monkeypatch):
+    from rag import clients
+
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    asyncio.run(clients.shutdown())
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def get_client():
+        return clients.get_async_client()
+
+    try:
+        first = asyncio.run_coroutine_threadsafe(get_client(), loop).result()
+        second = asyncio.run(get_client())
+        assert second is not first
+        # The close was scheduled on the first client's own (still running) loop
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), loop).result()
+        assert first.is_closed() and not second.is_closed()
+    finally:
+        asyncio.run(clients.shutdown())
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
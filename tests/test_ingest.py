@@ -0,0 +1,226 @@
+"""
+Ingestion tests. Embeddings are faked; no API keys required.
+"""
+
+import chromadb
+import pytest
+
+from rag import bm25, ingest, vector_index
+
+
+def _fake_embed(calls):
+    def embed(chunks, **kwargs):
+        calls.append([c["doc_id"] for c in chunks])
+        return [[float(len(c["text"])), 1.0, 0.0] for c in chunks]
+    return embed
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    data_dir = tmp_path / "policies"
+    data_dir.mkdir()
+    (data_dir / "pto.md").write_text("# PTO\n\nEmployees accrue 1.5 days per month.\n", encoding="utf-8")
+    (data_dir / "remote.md").write_text("# Remote\n\nRemote work requires approval.\n", encoding="utf-8")
+    (data_dir / "README.md").write_text("not a policy", encoding="utf-8")
+    monkeypatch.setattr(ingest, "DATA_DIR", data_dir)
+    monkeypatch.setattr(ingest, "INDEX_DIR", tmp_path / "index")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return data_dir
+
+
+def _indexed_doc_ids(index_dir):
+    collection = chromadb.PersistentClient(path=str(index_dir)).get_collection(ingest.COLLECTION_NAME)
+    return sorted({m["doc_id"] for m in collection.get(include=["metadatas"])["metadatas"]})
+
+
+def test_incremental_run_only_embeds_changed_files(corpus, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest, "embed_chunks", _fake_embed(calls))
+
+    ingest.run()
+    assert sorted({d for batch in calls for d in batch}) == ["pto.md", "remote.md"]
+
+    calls.clear()
+    ingest.run()
+    assert calls == []
+
+    (corpus / "pto.md").write_text("# PTO\n\nEmployees accrue 2 days per month.\n", encoding="utf-8")
+    ingest.run()
+    assert {d for batch in calls for d in batch} == {"pto.md"}
+
+    manifest = ingest.load_manifest(ingest.INDEX_DIR)
+    assert set(manifest["files"]) == {"pto.md", "remote.md"}
+    assert manifest["params"] == ingest.ingest_params()
+
+
+def test_rebuild_without_api_key_keeps_the_index(corpus, monkeypatch):
+    monkeypatch.setattr(ingest, "embed_chunks", _fake_embed([]))
+    ingest.run()
+
+    monkeypatch.delenv("OPENAI_API_KEY")
+    monkeypatch.setattr(ingest, "load_dotenv", lambda: None)
+    with pytest.raises(SystemExit, match="OPENAI_API_KEY"):
+        ingest.run(rebuild=True)
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md", "remote.md"]
+
+
+def test_removed_file_chunks_are_deleted(corpus, monkeypatch):
+    monkeypatch.setattr(ingest, "embed_chunks", _fake_embed([]))
+    ingest.run()
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md", "remote.md"]
+
+    (corpus / "remote.md").unlink()
+    ingest.run()
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md"]
+    assert set(ingest.load_manifest(ingest.INDEX_DIR)["files"]) == {"pto.md"}
+
+
+def test_changed_chunk_params_reindex_everything(corpus, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest, "embed_chunks", _fake_embed(calls))
+    ingest.run()
+
+    calls.clear()
+    ingest.run(chunk_tokens=200, overlap_tokens=40)
+    assert sorted({d for batch in calls for d in batch}) == ["pto.md", "remote.md"]
+
+
+def test_crashed_run_resumes_from_checkpoint(corpus, monkeypatch):
+    (corpus / "security.md").write_text("# Security\n\nReport incidents within 24 hours.\n", encoding="utf-8")
+    calls = []
+    ok = _fake_embed(calls)
+
+    def flaky(chunks, **kwargs):
+        if calls:
+            raise RuntimeError("embedding service down")
+        return ok(chunks)
+
+    monkeypatch.setattr(ingest, "embed_chunks", flaky)
+    with pytest.raises(RuntimeError):
+        ingest.run(window_chunks=1)
+    assert set(ingest.load_manifest(ingest.INDEX_DIR)["files"]) == {"pto.md"}
+
+    calls.clear()
+    monkeypatch.setattr(ingest, "embed_chunks", ok)
+    ingest.run(window_chunks=1)
+    assert sorted(d for batch in calls for d in batch) == ["remote.md", "security.md"]
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md", "remote.md", "security.md"]
+
+
+def test_crash_before_derived_indexes_is_repaired_on_next_run(corpus, monkeypatch):
+    monkeypatch.setattr(ingest, "embed_chunks", _fake_embed([]))
+    ingest.run()
+    (corpus / "security.md").write_text("# Security\n\nReport incidents within 24 hours.\n", encoding="utf-8")
+
+    # Every chunk is checkpointed, then the run dies before rewriting BM25 and the export
+    def interrupted(*args):
+        raise KeyboardInterrupt
+
+    write_derived = ingest._write_derived_indexes
+    monkeypatch.setattr(ingest, "_write_derived_indexes", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        ingest.run()
+    digest = ingest.manifest_digest(ingest.load_manifest(ingest.INDEX_DIR))
+    assert bm25.read_source_digest(ingest.INDEX_DIR) != digest
+
+    monkeypatch.setattr(ingest, "_write_derived_indexes", write_derived)
+    ingest.run()
+    assert bm25.read_source_digest(ingest.INDEX_DIR) == digest
+    assert vector_index.read_export_meta(ingest.INDEX_DIR)["source_digest"] == digest
+    export = vector_index.VectorIndex.from_export(ingest.INDEX_DIR / "export")
+    assert {m["doc_id"] for m in export.metadatas} == {"pto.md", "remote.md", "security.md"}
+
+    # Without an export the auto backend must not keep serving the stale one
+    (corpus / "pto.md").write_text("# PTO\n\nEmployees accrue 2 days per month.\n", encoding="utf-8")
+    ingest.run(export_dtype="none")
+    assert vector_index.read_export_meta(ingest.INDEX_DIR) is None
+
+
+def test_worker_pool_matches_serial_and_isolates_bad_files(corpus, monkeypatch):
+    (corpus / "broken.pdf").write_bytes(b"%PDF-1.4 this is not really a pdf")
+    paths, _ = ingest.discover_files(corpus)
+
+    serial = list(ingest.iter_chunked_files(paths, workers=1))
+    pooled = list(ingest.iter_chunked_files(paths, workers=2))
+    assert [r["filename"] for r in pooled] == [p.name for p in paths]
+    assert pooled == serial
+    assert [r["filename"] for r in pooled if r["error"]] == ["broken.pdf"]
+
+    monkeypatch.setattr(ingest, "embed_chunks", _fake_embed([]))
+    ingest.run(workers=2)
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md", "remote.md"]
+    assert "broken.pdf" not in ingest.load_manifest(ingest.INDEX_DIR)["files"]
+
+
+def test_file_that_now_fails_extraction_loses_its_chunks(corpus, monkeypatch):
+    monkeypatch.setattr(ingest, "embed_chunks", _fake_embed([]))
+    ingest.run()
+
+    (corpus / "remote.md").write_text("# Remote\n\nNow unreadable.\n", encoding="utf-8")
+    extract = ingest.extract_document
+
+    def failing(path, **kwargs):
+        if path.name == "remote.md":
+            raise ValueError("cannot decode")
+        return extract(path, **kwargs)
+
+    monkeypatch.setattr(ingest, "extract_document", failing)
+    ingest.run()
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md"]
+    assert set(ingest.load_manifest(ingest.INDEX_DIR)["files"]) == {"pto.md"}
+    # It is retried, and indexed again, once it extracts
+    monkeypatch.setattr(ingest, "extract_document", extract)
+    ingest.run()
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md", "remote.md"]
+
+    # Same when a params change re-indexes everything: the derived indexes drop it too
+    monkeypatch.setattr(ingest, "extract_document", failing)
+    ingest.run(chunk_tokens=200, overlap_tokens=40)
+    assert _indexed_doc_ids(ingest.INDEX_DIR) == ["pto.md"]
+    assert set(ingest.load_manifest(ingest.INDEX_DIR)["files"]) == {"pto.md"}
+    export = vector_index.VectorIndex.from_export(ingest.INDEX_DIR / "export")
+    assert {m["doc_id"] for m in export.metadatas} == {"pto.md"}
+
+
+def test_single_pass_chunking_matches_per_window_decode():
+    text = "# Policy\n\n" + "## Carryover ☃\nUp to 5 days may carry over with approval. " * 40
+    enc = ingest._get_encoder()
+    tokens = enc.encode(text)
+    expected = [enc.decode(tokens[s:e]) for s, e in ingest._token_windows(len(tokens), 50, 10)]
+
+    assert ingest.chunk_text(text, chunk_tokens=50, overlap_tokens=10) == expected
+
+    chunks, chars, n_tokens = ingest._chunk_document({"filename": "p.md", "text": text}, 50, 10)
+    assert [c["text"] for c in chunks] == expected
+    assert (chars, n_tokens) == (len(text), len(tokens))
+    assert chunks[0]["section"] == "Carryover ☃"
+
+
+def test_structure_chunks_are_verbatim_and_within_budget():
+    text = (
+        "# Leave Policy\n\n"
+        + "## Accrual\n\n" + "Employees accrue 1.5 days each month of service. " * 30 + "\n\n"
+        + "## Carryover\n\nUp to 5 days may carry over with manager approval.\n"
+    )
+    chunks, _ = ingest._structure_chunks({"filename": "leave.md", "text": text}, chunk_tokens=60)
+    enc = ingest._get_encoder()
+
+    assert all(c["text"] in text for c in chunks)
+    assert all(len(enc.encode(c["text"])) <= 60 for c in chunks)
+    # Headings stay with their body; the short trailing section is kept whole
+    assert chunks[0]["text"].startswith("# Leave Policy\n\n## Accrual\n\nEmployees")
+    assert chunks[0]["heading_path"] == "Leave Policy > Accrual"
+    assert chunks[-1]["text"].endswith("## Carryover\n\nUp to 5 days may carry over with manager approval.")
+    assert chunks[-1]["heading_path"] == "Leave Policy > Carryover"
+    assert chunks[-1]["section"] == "Carryover"
+
+
+@pytest.mark.parametrize("chunk_tokens", [20, 60])
+def test_structure_chunks_of_policy_corpus_stay_within_budget(chunk_tokens):
+    docs, _, _ = ingest.load_documents(ingest.DATA_DIR)
+    assert docs
+    for doc in docs:
+        chunks, _ = ingest._structure_chunks(doc, chunk_tokens)
+        for c in chunks:
+            assert c["text"] in doc["text"]
+            assert ingest.count_tokens(c["text"]) == c["tokens"] <= chunk_tokens
@@ -0,0 +1,46 @@
+"""
+Load test report tests (summary statistics and the results file). No server needed.
+"""
+
+import json
+
+from eval import load_test
+
+
+def test_summarize_reports_percentiles_and_error_rate():
+    results = [{"ok": True, "status": 200, "latency_s": (i + 1) / 1000} for i in range(99)]
+    results.append({"ok": False, "status": 500, "latency_s": 5.0})
+
+    summary = load_test.summarize(results, wall_s=2.0)
+    assert summary["requests"] == 100
+    assert summary["errors"] == 1
+    assert summary["error_rate"] == 0.01
+    assert summary["throughput_rps"] == 50.0
+    # Failed requests do not count towards latency
+    assert summary["latency_p50_ms"] == 50.0
+    assert summary["latency_p99_ms"] < summary["latency_max_ms"] == 99.0
+
+
+def test_save_result_appends_and_finds_previous_run(tmp_path):
+    path = tmp_path / "load_results.jsonl"
+    params = {"target": "local", "requests": 10, "concurrency": 2, "rps": None}
+
+    assert load_test.save_result(path, params, {"throughput_rps": 10.0}) is None
+    assert load_test.save_result(path, {**params, "concurrency": 4}, {"throughput_rps": 30.0}) is None
+    previous = load_test.save_result(path, params, {"throughput_rps": 12.0})
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 3
+    assert {"timestamp", "git_sha", "git_dirty", "params", "summary"} <= set(records[-1])
+    assert previous["summary"] == {"throughput_rps": 10.0}
+    assert load_test.compare(previous, {"throughput_rps": 12.0}) == ["  throughput_rps   10.0 -> 12.0 (+20%)"]
+
+
+def test_summarize_reports_client_queueing_separately():
+    results = [{"ok": True, "status": 200, "latency_s": 0.3, "queue_s": 0.2} for _ in range(10)]
+
+    summary = load_test.summarize(results, wall_s=1.0)
+    assert summary["latency_p50_ms"] == 300.0
+    assert summary["queue_p95_ms"] == 200.0
+    # Only time on the wire counts as in flight
+    assert summary["effective_concurrency"] == 1.0
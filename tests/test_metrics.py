@@ -0,0 +1,104 @@
+"""
+Stage timing and /metrics tests. No API keys required.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from app import main, metrics
+
+CONTEXTS = [
+    {"doc_id": "pto.md", "title": "PTO", "section": None, "snippet": "Carry over up to 5 days.",
+     "text": "Employees may carry over up to 5 days of PTO. " * 20, "distance": 0.3},
+    {"doc_id": "pto.md", "title": "PTO", "section": None, "snippet": "Carryover needs approval.",
+     "text": "Carryover beyond 5 days requires approval. " * 20, "distance": 0.4},
+]
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("t_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, stage="llm")
+
+    lines = hist.render().splitlines()
+    assert lines[:2] == ["# HELP t_seconds Test.", "# TYPE t_seconds histogram"]
+    assert 't_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="llm",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{stage="llm",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="llm"} 4' in lines
+    assert 't_seconds_sum{stage="llm"} 4.05' in lines
+
+
+def test_chat_timings_and_metrics_tag_cache_hits():
+    metrics.clear_metrics()
+    completion = MagicMock()
+    completion.choices[0].message.content = "You may carry over up to 5 days [1]."
+
+    async def embed(question, stats=None):
+        stats["misses"] = 1
+        return [0.6, 0.8]
+
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main.index_version", return_value=("test", 1)), \
+            patch("app.main.answer_cache", main.AnswerCache()), \
+            patch("app.main._aembed_query", embed), \
+            patch("app.main.aretrieve", AsyncMock(return_value=CONTEXTS)), \
+            patch("app.main.clients.get_async_client") as get_client, \
+            patch.dict("os.environ", {"OPENAI_API_KEY": "test"}):
+        get_client.return_value.chat.completions.create = AsyncMock(return_value=completion)
+        client = TestClient(main.app)
+        question = {"question": "How many PTO days carry over?", "include_timings": True}
+        first = client.post("/chat", json=question).json()
+        second = client.post("/chat", json=question).json()
+        plain = client.post("/chat", json={"question": "How many PTO days carry over?"}).json()
+
+    stages = {t["stage"]: t for t in first["timings"]}
+    assert list(stages) == ["index_check", "answer_cache_exact", "embed", "answer_cache_similar", "llm", "quote"]
+    assert stages["answer_cache_exact"]["cache"] == "miss"
+    assert stages["embed"]["cache"] == "miss"
+    assert all(t["ms"] >= 0 for t in first["timings"])
+    assert [(t["stage"], t["cache"]) for t in second["timings"]] == [
+        ("index_check", None), ("answer_cache_exact", "hit")
+    ]
+    assert plain["timings"] is None
+
+    text = TestClient(main.app).get("/metrics").text
+    assert "# TYPE rag_stage_seconds histogram" in text
+    assert 'rag_stage_seconds_count{endpoint="chat",stage="answer_cache_exact",cache="hit"} 2' in text
+    assert 'rag_stage_seconds_count{endpoint="chat",stage="llm",cache="none"} 1' in text
+    assert 'rag_request_seconds_count{endpoint="chat",outcome="cache_hit"} 2' in text
+    assert 'rag_request_seconds_count{endpoint="chat",outcome="answered"} 1' in text
+
+
+def test_batch_timings_count_cache_hits_per_question():
+    completion = MagicMock()
+    completion.choices[0].message.content = "You may carry over up to 5 days [1]."
+    vectors = {"How many PTO days carry over?": [0.6, 0.8], "Who approves carryover?": [0.8, -0.6]}
+
+    async def embed(questions, stats=None):
+        return [vectors[q] for q in questions]
+
+    def batch(questions):
+        resp = TestClient(main.app).post("/chat/batch", json={"questions": questions, "include_timings": True})
+        return {t["stage"]: t for t in resp.json()["timings"]}
+
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main.index_version", return_value=("test", 1)), \
+            patch("app.main._aembed_queries", embed), \
+            patch("app.main.aretrieve_many", AsyncMock(side_effect=lambda qs, **kw: [CONTEXTS] * len(qs))), \
+            patch("app.main.clients.get_async_client") as get_client, \
+            patch.dict("os.environ", {"OPENAI_API_KEY": "test"}):
+        get_client.return_value.chat.completions.create = AsyncMock(return_value=completion)
+        with patch("app.main.answer_cache", main.AnswerCache()):
+            batch(["How many PTO days carry over?"])
+            stages = batch(["How many PTO days carry over?", "Who approves carryover?"])
+        with patch("app.main.answer_cache", None):
+            uncached = batch(["How many PTO days carry over?", "Who approves carryover?"])
+
+    exact = stages["answer_cache_exact"]
+    assert (exact["cache"], exact["hits"], exact["misses"]) == ("mixed", 1, 1)
+    similar = stages["answer_cache_similar"]
+    assert (similar["cache"], similar["hits"], similar["misses"]) == ("miss", 0, 1)
+    assert "answer_cache_exact" not in uncached and "answer_cache_similar" not in uncached
+    assert "embed" in uncached
@@ -0,0 +1,100 @@
+"""
+pick_verbatim_quote equivalence tests: the one-pass span selection must return exactly
+what the original all-spans-then-sort implementation (copied below) returned.
+"""
+
+import random
+import re
+
+import pytest
+
+from rag import ingest
+from rag.retriever import (
+    QUOTE_RULE_TERMS,
+    _extract_keywords,
+    _keyword_score,
+    _rule_bonus,
+    pick_verbatim_quote,
+    split_sentences,
+)
+
+
+def _reference_span_score(span: str) -> int:
+    score = 1 if re.search(r"\d", span) else 0
+    span_lower = span.lower()
+    score += sum(1 for t in QUOTE_RULE_TERMS if t in span_lower)
+    return score
+
+
+def reference_pick_verbatim_quote(text, question_keywords=None, min_words=5, max_words=15):
+    """pick_verbatim_quote before the one-pass rewrite."""
+    if not text or not text.strip():
+        return ""
+    sentences = split_sentences(text)
+    if not sentences:
+        return ""
+    keywords = question_keywords or set()
+    scored = [(s, _keyword_score(s, keywords) + _rule_bonus(s)) for s in sentences]
+    scored.sort(key=lambda x: (-x[1], abs(len(x[0]) - 60)))
+    best_sentence = scored[0][0]
+    words = list(re.finditer(r"\b\w+\b", best_sentence))
+    if len(words) < min_words:
+        return ""
+    best_spans = []
+    for start in range(len(words)):
+        max_n = min(max_words, len(words) - start)
+        for n in range(min_words, max_n + 1):
+            end_idx = start + n - 1
+            if end_idx >= len(words):
+                continue
+            span = best_sentence[words[start].start(): words[end_idx].end()]
+            best_spans.append((span, _reference_span_score(span)))
+    if not best_spans:
+        return ""
+    best_spans.sort(key=lambda x: (-x[1], -len(x[0])))
+    return best_spans[0][0].strip()
+
+
+QUESTIONS = [
+    "How many PTO days can I carry over?",
+    "Who must approve remote work?",
+    "What expenses are prohibited?",
+    "",
+]
+
+
+def test_matches_reference_on_policy_corpus():
+    docs, _, _ = ingest.load_documents(ingest.DATA_DIR)
+    chunks = ingest.build_chunks(docs)[0]
+    assert chunks
+    for chunk in chunks:
+        for question in QUESTIONS:
+            keywords = _extract_keywords(question)
+            assert pick_verbatim_quote(chunk["text"], question_keywords=keywords) == \
+                reference_pick_verbatim_quote(chunk["text"], question_keywords=keywords)
+
+
+@pytest.mark.parametrize("text", [
+    "Employees must submit requests within 10 business days for approval by a manager.",
+    "Short one. Another short sentence here without much.",
+    "Setup tomorrow: the backup to disk is required; holidays and mustard days are prohibited.",
+    "Up to 5 days " + "and more words " * 60 + "with approval within 3 days.",
+    "ΣΟΦΙΑ ΚΑΙ ΟΔΟΣ must be approved within ΣΑΣ days by the ΣΥΜΒΟΥΛΙΟ.",
+    "İstanbul office staff MUST obtain approval within 2 days for İZMIR travel requests.",
+    "Room ² and ³ are required; within\nthe 4th floor approval of up\tto 9 people.",
+    "word_one word_two 3_days up-to within-range required.approval must!",
+])
+@pytest.mark.parametrize("min_words,max_words", [(5, 15), (1, 3), (5, 5), (6, 4), (40, 60)])
+def test_matches_reference_on_edge_cases(text, min_words, max_words):
+    assert pick_verbatim_quote(text, {"approval"}, min_words, max_words) == \
+        reference_pick_verbatim_quote(text, {"approval"}, min_words, max_words)
+
+
+def test_matches_reference_on_random_sentences():
+    rng = random.Random(7)
+    vocab = ["must", "Required", "prohibited", "up", "to", "within", "days", "approval", "the", "staff",
+             "10", "3rd", "PTO", "Σ", "İ", "setup", "toward", "holidays", "a", "manager", "of"]
+    for _ in range(500):
+        n = rng.randint(3, 60)
+        text = " ".join(rng.choice(vocab) + rng.choice(["", "", ",", ";"]) for _ in range(n)) + "."
+        assert pick_verbatim_quote(text) == reference_pick_verbatim_quote(text), text
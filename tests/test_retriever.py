@@ -0,0 +1,246 @@
+"""
+Retrieval tests against a small index built with fake embeddings. No API keys required.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+import pytest
+
+from eval.fake_openai import fake_embedding
+from rag import bm25, ingest, retriever, vector_index
+from rag.sentences import sentence_index
+
+
+def _embed(chunks, **kwargs):
+    return [fake_embedding(c["text"]).tolist() for c in chunks]
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    data_dir = tmp_path / "policies"
+    data_dir.mkdir()
+    for i, topic in enumerate(["PTO", "Remote", "Expenses", "Security", "Benefits"]):
+        body = f"# {topic}\n\n" + f"{topic} rule {i}: requests need approval within {i + 2} days. " * 20
+        (data_dir / f"{topic.lower()}.md").write_text(body, encoding="utf-8")
+    monkeypatch.setattr(ingest, "DATA_DIR", data_dir)
+    monkeypatch.setattr(ingest, "INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(ingest, "embed_chunks", _embed)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(retriever, "_embed_query", lambda q: fake_embedding(q).tolist())
+    ingest.run(chunk_tokens=60, overlap_tokens=10)
+    vector_index.clear_indexes()
+    bm25.clear_indexes()
+    yield tmp_path / "index"
+    vector_index.clear_indexes()
+    bm25.clear_indexes()
+
+
+def _chroma_top(index_dir, query, k):
+    collection = chromadb.PersistentClient(path=str(index_dir)).get_collection(ingest.COLLECTION_NAME)
+    return collection.query(query_embeddings=[fake_embedding(query).tolist()], n_results=k)
+
+
+@pytest.mark.parametrize("backend", ["chroma", "export"])
+def test_in_memory_search_matches_chroma(index_dir, backend):
+    query = "Expenses rule 2: requests need approval within 4 days."
+    expected = _chroma_top(index_dir, query, 5)
+
+    index = vector_index.get_index(index_dir, ingest.COLLECTION_NAME, backend=backend)
+    hits = index.search(fake_embedding(query).tolist(), 5)
+    assert [index.ids[row] for row, _ in hits] == expected["ids"][0]
+    assert [d for _, d in hits] == pytest.approx(expected["distances"][0], abs=1e-4)
+    assert [index.texts[row] for row, _ in hits] == expected["documents"][0]
+    assert [index.metadatas[row] for row, _ in hits] == expected["metadatas"][0]
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compact_export_dtypes(index_dir, dtype):
+    meta = vector_index.write_export(index_dir, ingest.COLLECTION_NAME, dtype=dtype)
+    assert meta["dtype"] == dtype
+
+    index = vector_index.get_index(index_dir, ingest.COLLECTION_NAME, backend="export")
+    assert index.matrix.dtype == dtype
+    # Chunk texts are their own nearest neighbours; distances stay close to float32
+    for row in range(0, len(index), 7):
+        hits = index.search(fake_embedding(index.texts[row]).tolist(), 3)
+        assert hits[0][0] == row
+        assert hits[0][1] == pytest.approx(0.0, abs=0.02)
+
+
+def test_export_readers_never_mix_versions(index_dir, monkeypatch):
+    export_dir = index_dir / "export"
+    first = vector_index.read_export_meta(index_dir)
+    vector_index.write_export(index_dir, ingest.COLLECTION_NAME, dtype="float16")
+    # The previous version stays readable for a reader that already has its meta.json
+    assert (export_dir / first["data_dir"]).is_dir()
+    assert not (export_dir / "embeddings.npy").exists()
+
+    # New versions land while a reader is opening files: it moves on to the newest meta.json
+    open_export = vector_index.VectorIndex._open_export
+    calls = []
+
+    def racing(export_dir, meta, version):
+        calls.append(meta["data_dir"])
+        if len(calls) == 1:
+            vector_index.write_export(index_dir, ingest.COLLECTION_NAME, dtype="int8")
+            vector_index.write_export(index_dir, ingest.COLLECTION_NAME, dtype="int8")
+        return open_export(export_dir, meta, version)
+
+    monkeypatch.setattr(vector_index.VectorIndex, "_open_export", staticmethod(racing))
+    index = vector_index.VectorIndex.from_export(export_dir)
+    latest = vector_index.read_export_meta(index_dir)
+    # The version it started on was pruned, so it failed once and re-read meta.json
+    assert len(calls) == 2 and calls[1] == latest["data_dir"] != calls[0]
+    assert index.matrix.dtype == "int8" and len(index) == latest["count"]
+    assert len([p for p in export_dir.iterdir() if p.is_dir()]) == vector_index.EXPORT_KEEP_VERSIONS
+
+
+def test_index_loaded_once_and_reloaded_after_ingest(index_dir, monkeypatch):
+    first = vector_index.get_index(index_dir, ingest.COLLECTION_NAME)
+    retriever.retrieve("PTO approval", persist_dir=index_dir)
+    assert vector_index.get_index(index_dir, ingest.COLLECTION_NAME) is first
+
+    travel = "# Travel\n\nBook flights through the portal.\n"
+    (ingest.DATA_DIR / "travel.md").write_text(travel, encoding="utf-8")
+    ingest.run(chunk_tokens=60, overlap_tokens=10)
+    reloaded = vector_index.get_index(index_dir, ingest.COLLECTION_NAME)
+    assert reloaded is not first
+    assert len(reloaded) == len(first) + 1
+    results = retriever.retrieve(travel, persist_dir=index_dir)
+    assert results[0]["doc_id"] == "travel.md"
+
+
+def test_concurrent_requests_load_the_index_once(index_dir, monkeypatch):
+    from_export = vector_index.VectorIndex.from_export
+    loads = []
+
+    def slow_load(export_dir):
+        loads.append(export_dir)
+        time.sleep(0.1)
+        return from_export(export_dir)
+
+    monkeypatch.setattr(vector_index.VectorIndex, "from_export", staticmethod(slow_load))
+    with ThreadPoolExecutor(8) as pool:
+        indexes = list(pool.map(
+            lambda _: vector_index.get_index(index_dir, ingest.COLLECTION_NAME, backend="export"), range(8)
+        ))
+    assert len(loads) == 1
+    assert all(index is indexes[0] for index in indexes)
+
+
+def test_bm25_ranks_exact_terms():
+    index = bm25.BM25Index.build(
+        ["a", "b", "c"],
+        [
+            "Submit form HR-217 within 10 days.",
+            "Remote work requires manager approval.",
+            "Approval is required for remote work over 10 days.",
+        ],
+    )
+    assert index.search("What is form HR-217?", 3)[0][0] == 0
+    assert [row for row, _ in index.search("remote approval", 3)][:2] == [1, 2]
+    assert index.search("cafeteria", 3) == []
+
+
+def test_hybrid_retrieval_surfaces_exact_term_matches(index_dir, monkeypatch):
+    (ingest.DATA_DIR / "forms.md").write_text(
+        "# Forms\n\nReimbursement claims use form EXP-4471 and are filed in the finance portal.\n",
+        encoding="utf-8",
+    )
+    ingest.run(chunk_tokens=60, overlap_tokens=10)
+    query = "Where do I find form EXP-4471?"
+    # Pin the query vector onto an unrelated chunk so vector search alone misses the form
+    pto_text = vector_index.get_index(index_dir, ingest.COLLECTION_NAME).texts[0]
+    monkeypatch.setattr(retriever, "_embed_query", lambda q: fake_embedding(pto_text).tolist())
+
+    monkeypatch.setattr(retriever, "HYBRID_SEARCH", False)
+    vector_only = [r["doc_id"] for r in retriever.retrieve(query, k=1, persist_dir=index_dir)]
+    monkeypatch.setattr(retriever, "HYBRID_SEARCH", True)
+    hybrid = retriever.retrieve(query, k=1, persist_dir=index_dir)
+
+    assert vector_only != ["forms.md"]
+    assert hybrid[0]["doc_id"] == "forms.md"
+    assert hybrid[0]["distance"] > 0
+
+
+def test_retrieve_many_matches_retrieve(index_dir, monkeypatch):
+    queries = [
+        "PTO rule 0: requests need approval within 2 days.",
+        "Security rule 3: requests need approval within 5 days.",
+        "How many days for expenses approval?",
+    ]
+    calls = []
+
+    def embed_queries(texts):
+        calls.append(list(texts))
+        return [fake_embedding(t).tolist() for t in texts]
+
+    monkeypatch.setattr(retriever, "_embed_queries", embed_queries)
+    batched = retriever.retrieve_many(queries, k=4, persist_dir=index_dir)
+
+    assert calls == [queries]
+    for results, query in zip(batched, queries):
+        single = retriever.retrieve(query, k=4, persist_dir=index_dir)
+        assert [(r["doc_id"], r["chunk_id"], r["snippet"]) for r in results] == \
+            [(r["doc_id"], r["chunk_id"], r["snippet"]) for r in single]
+        assert [r["distance"] for r in results] == pytest.approx([r["distance"] for r in single], abs=1e-5)
+    assert retriever.retrieve_many([], persist_dir=index_dir) == []
+
+
+def test_query_analysis_is_built_once_and_changes_nothing(index_dir, monkeypatch):
+    query = "How many days for expenses approval?"
+    expected = retriever.retrieve(query, k=4, persist_dir=index_dir)
+
+    built = []
+    original = retriever.QueryAnalysis.__init__
+
+    def counting_init(self, question):
+        built.append(question)
+        original(self, question)
+
+    monkeypatch.setattr(retriever.QueryAnalysis, "__init__", counting_init)
+    analysis = retriever.QueryAnalysis(query)
+    results = retriever.retrieve(query, k=4, persist_dir=index_dir, analysis=analysis)
+    assert built == [query]
+    assert results == expected
+
+    text = results[0]["text"]
+    assert retriever.pick_verbatim_quote(text, analysis=analysis) == \
+        retriever.pick_verbatim_quote(text, question_keywords=retriever._extract_keywords(query))
+    assert built == [query]
+
+
+def test_snippets_are_computed_on_first_read(index_dir, monkeypatch):
+    query = "How many days for expenses approval?"
+    calls = []
+    extract = retriever.extract_evidence_sentences
+
+    def counting_extract(text, question, *args, **kwargs):
+        calls.append(text)
+        return extract(text, question, *args, **kwargs)
+
+    monkeypatch.setattr(retriever, "extract_evidence_sentences", counting_extract)
+    results = retriever.retrieve(query, k=4, persist_dir=index_dir)
+    assert calls == []
+
+    first = results[0]
+    assert "snippet" in first
+    assert first["snippet"] == extract(first["text"], query)
+    assert first.get("snippet") == first["snippet"]
+    assert calls == [first["text"]]
+
+    # Plain-dict views see every key, computing the remaining snippets once each
+    assert all(set(r) >= {"doc_id", "snippet", "text", "distance"} for r in results)
+    assert len(calls) == len(results)
+    assert results[1]["snippet"] == dict(results[1])["snippet"]
+    assert len(calls) == len(results)
+
+
+def test_results_use_the_ingest_time_sentence_index(index_dir):
+    query = "How many days for expenses approval?"
+    results = retriever.retrieve(query, k=4, persist_dir=index_dir)
+    for r in results:
+        assert r.sentences == sentence_index(r["text"])
+        assert r["snippet"] == retriever.extract_evidence_sentences(r["text"], query)
@@ -0,0 +1,65 @@
+"""
+Ingest-time sentence index tests: stored offsets and rule scores must reproduce the
+query-time split and scoring exactly.
+"""
+
+import json
+import re
+
+import pytest
+
+from rag import ingest, sentences
+from rag.retriever import QueryAnalysis, extract_evidence_sentences, pick_verbatim_quote
+from rag.sentences import _rule_bonus, dump_sentence_index, load_sentence_index, sentence_index, sentence_spans
+
+EDGE_CASES = [
+    "",
+    "   \n\n  ",
+    "One sentence without a break",
+    "  Leading space. Trailing space.  \n",
+    "Up to 5 days!  Must be approved?\tYes.\n\n\nNew paragraph within 3 hours.",
+    "No space after.Period here. Ellipsis... then more\r\nCRLF line.",
+    "Unicode space.  Em space before this one. Ünïcode İ must be kept.",
+]
+
+
+def _corpus_texts():
+    docs, _, _ = ingest.load_documents(ingest.DATA_DIR)
+    return [c["text"] for c in ingest.build_chunks(docs)[0]]
+
+
+def test_spans_match_regex_split():
+    for text in _corpus_texts() + EDGE_CASES:
+        expected = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if s.strip()]
+        assert [text[s:e] for s, e in sentence_spans(text)] == expected
+        assert [bonus for _, _, bonus in sentence_index(text)] == [_rule_bonus(s) for s in expected]
+
+
+@pytest.mark.parametrize("question", ["How many PTO days can I carry over?", "Who approves remote work?", ""])
+def test_stored_index_gives_same_evidence_and_quote(question):
+    analysis = QueryAnalysis(question)
+    for text in _corpus_texts() + EDGE_CASES:
+        stored = load_sentence_index(dump_sentence_index(text), text)
+        assert extract_evidence_sentences(text, question, analysis=analysis, sentences=stored) == \
+            extract_evidence_sentences(text, question, analysis=analysis)
+        assert pick_verbatim_quote(text, analysis=analysis, sentences=stored) == \
+            pick_verbatim_quote(text, question_keywords=analysis.keywords)
+
+
+def test_load_rejects_missing_or_mismatched_index():
+    text = "Requests need approval within 5 days. Managers must respond."
+    assert load_sentence_index(None, text) is None
+    assert load_sentence_index("not json", text) is None
+    assert load_sentence_index(dump_sentence_index(text + " Extra sentence here."), text[:20]) is None
+    assert load_sentence_index(dump_sentence_index(text), text) == sentence_index(text)
+
+
+def test_index_scored_under_other_rules_is_ignored(monkeypatch):
+    text = "Requests need approval within 5 days. Managers must respond."
+    stored = dump_sentence_index(text)
+    # A scoring change invalidates every chunk, so incremental ingest re-indexes them
+    assert ingest.ingest_params()["sentence_scoring"] == sentences.SENTENCE_SCORING
+    monkeypatch.setattr(sentences, "SENTENCE_SCORING", "2-other")
+    assert load_sentence_index(stored, text) is None
+    # Indexes written before the scoring was recorded are ignored too
+    assert load_sentence_index(json.dumps(sentence_index(text)), text) is None
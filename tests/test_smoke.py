@@ -2,7 +2,11 @@
 Smoke tests for the Policy RAG app. No API keys required.
 """
 
-from unittest.mock import patch
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
 
@@ -27,7 +31,9 @@ def test_root_returns_chat_ui():
 
 def test_chat_unanswerable_returns_refusal():
     """POST /chat with unanswerable question returns refusal, empty citations/snippets."""
-    with patch("app.main.index_ready", return_value=True), patch("app.main.retrieve", return_value=[]):
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main._aembed_query", AsyncMock(return_value=[1.0, 0.0])), \
+            patch("app.main.aretrieve", AsyncMock(return_value=[])):
         resp = client.post(
             "/chat",
             json={"question": "What is today's cafeteria menu?"},
@@ -37,3 +43,70 @@ def test_chat_unanswerable_returns_refusal():
     assert data["citations"] == []
     assert data["snippets"] == []
     assert "cannot" in data["answer"].lower()
+
+
+def test_chat_repeated_question_served_from_answer_cache():
+    """A repeated (or reworded) question is answered from the cache without retrieval."""
+    contexts = [
+        {"doc_id": "pto.md", "title": "PTO", "section": None, "snippet": "Carry over up to 5 days.",
+         "text": "Employees may carry over up to 5 days of PTO. " * 20, "distance": 0.3},
+        {"doc_id": "pto.md", "title": "PTO", "section": None, "snippet": "Carryover needs approval.",
+         "text": "Carryover beyond 5 days requires approval. " * 20, "distance": 0.4},
+    ]
+    completion = MagicMock()
+    completion.choices[0].message.content = "You may carry over up to 5 days [1]."
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main.index_version", return_value=("test", 1)), \
+            patch("app.main._aembed_query", AsyncMock(return_value=[0.6, 0.8])), \
+            patch("app.main.aretrieve", AsyncMock(return_value=contexts)) as retrieve, \
+            patch("app.main.clients.get_async_client") as get_client, \
+            patch.dict("os.environ", {"OPENAI_API_KEY": "test"}):
+        create = get_client.return_value.chat.completions.create = AsyncMock(return_value=completion)
+        first = client.post("/chat", json={"question": "How many PTO days can I carry over?"}).json()
+        second = client.post("/chat", json={"question": "how many PTO days can I carry over"}).json()
+        third = client.post("/chat", json={"question": "How many days of PTO carry over?"}).json()
+
+    assert retrieve.call_count == 1
+    assert create.call_count == 1
+    assert first["citations"] and second["citations"] == first["citations"] == third["citations"]
+    assert second["answer"] == third["answer"] == first["answer"]
+
+
+def test_importing_app_defers_heavy_sdks():
+    """app.main imports without the OpenAI SDK or Chroma; the startup warmup loads them."""
+    code = "import sys, app.main; print(sorted(m for m in ('openai', 'chromadb') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).resolve().parent.parent,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_ready_turns_green_after_warmup():
+    """/ready turns 200 once the background warmup has run; /health answers throughout."""
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main.warm_up", return_value={"index": 1.0}) as warm_up, \
+            patch("app.main.clients.startup", AsyncMock()):
+        with TestClient(app) as started:
+            for _ in range(100):
+                resp = started.get("/ready")
+                if resp.status_code == 200:
+                    break
+                time.sleep(0.01)
+            assert started.get("/health").json() == {"status": "ok"}
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "ready" and resp.json()["timings_ms"] == {"index": 1.0}
+    warm_up.assert_called_once()
+
+
+def test_ready_reports_failed_warmup():
+    """A warmup error (e.g. index built with another embedding model) keeps /ready at 503."""
+    with patch("app.main.index_ready", return_value=True), \
+            patch("app.main.warm_up", side_effect=ValueError("embedding model mismatch")), \
+            patch("app.main.clients.startup", AsyncMock()):
+        with TestClient(app) as started:
+            for _ in range(100):
+                resp = started.get("/ready")
+                if resp.json()["status"] != "warming":
+                    break
+                time.sleep(0.01)
+    assert resp.status_code == 503
+    assert resp.json()["status"] == "failed" and "mismatch" in resp.json()["error"]
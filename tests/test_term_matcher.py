@@ -0,0 +1,73 @@
+"""
+TermMatcher tests: matching must agree with a per-term `in` check on the raw text,
+in both the per-term and the single-pass trie-regex mode.
+"""
+
+import random
+import re
+
+from rag import ingest
+from rag.retriever import RULE_TERMS, _extract_keywords, _sentence_scorer, split_sentences
+from rag.term_matcher import REGEX_MIN_TERMS, TermMatcher, term_matcher
+
+
+def _naive(terms, text):
+    lower = text.lower()
+    return {t for t in terms if t and t in lower}
+
+
+def test_overlapping_and_nested_terms():
+    terms = ["days", "holidays", "up to", "setup", "up", "aa", "within", "a", "", "abc", "cde", "bcd", "p t"]
+    for min_terms in (0, 10**6):
+        matcher = TermMatcher(terms, regex_min_terms=min_terms)
+        assert (matcher._pattern is not None) == (min_terms == 0)
+        for text in ["Holidays", "SETUP TO", "setup tomorrow", "aaa", "up", "within 5 days", "", "nothing here",
+                     "abcde", "xbcdex", "setup to 5 holidays"]:
+            assert matcher.matches(text) == _naive(terms, text), (min_terms, text)
+            assert matcher.count(text) == len(_naive(terms, text)), (min_terms, text)
+    assert TermMatcher([], regex_min_terms=0).count("anything") == 0
+
+
+def test_single_pass_mode_matches_the_per_term_loop_on_policy_text():
+    docs, _, _ = ingest.load_documents(ingest.DATA_DIR)
+    sentences = [s for c in ingest.build_chunks(docs)[0] for s in split_sentences(c["text"])]
+    vocab = sorted({w for s in sentences for w in re.findall(r"[a-z]+", s.lower())})
+    rng = random.Random(0)
+    for size in (REGEX_MIN_TERMS, 200):
+        # Whole words, word fragments and two-word phrases, so terms nest and straddle
+        terms = set(rng.sample(vocab, size // 2))
+        terms |= {w[rng.randrange(len(w)):][:4] for w in rng.sample(vocab, size // 4)}
+        terms |= {f"{a[-3:]} {b[:3]}" for a, b in zip(rng.sample(vocab, size // 4), rng.sample(vocab, size // 4))}
+        matcher = TermMatcher(terms)
+        assert matcher._pattern is not None
+        for s in sentences:
+            assert matcher.matches(s) == _naive(terms, s), s
+
+
+def test_sentence_scorer_matches_per_term_scoring():
+    docs, _, _ = ingest.load_documents(ingest.DATA_DIR)
+    sentences = [s for c in ingest.build_chunks(docs)[0] for s in split_sentences(c["text"])]
+    for question in ["How many PTO days can I carry over?", "Is remote work within policy hours?", ""]:
+        keywords = _extract_keywords(question)
+        score = _sentence_scorer(keywords)
+        for s in sentences:
+            expected = len(_naive(keywords, s)) + len(_naive(RULE_TERMS, s)) + (1 if re.search(r"\d", s) else 0)
+            assert score(s) == expected, s
+    assert term_matcher(frozenset({"days"})) is term_matcher(frozenset({"days"}))
+
+
+def test_long_questions_score_sentences_in_one_pass():
+    question = (
+        "Employees requesting remote work from another country while traveling internationally "
+        "should understand which approvals, security requirements, equipment obligations, expense "
+        "reimbursements, timezone expectations, collaboration schedules, payroll withholding, benefits "
+        "eligibility, confidentiality safeguards and termination consequences apply during extended stays abroad"
+    )
+    keywords = _extract_keywords(question)
+    assert term_matcher(frozenset(keywords) | frozenset(RULE_TERMS))._pattern is not None
+    score = _sentence_scorer(keywords)
+    docs, _, _ = ingest.load_documents(ingest.DATA_DIR)
+    for s in [s for c in ingest.build_chunks(docs)[0] for s in split_sentences(c["text"])]:
+        expected = len(_naive(keywords, s)) + len(_naive(RULE_TERMS, s)) + (1 if re.search(r"\d", s) else 0)
+        assert score(s) == expected, s
+